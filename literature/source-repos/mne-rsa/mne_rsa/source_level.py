@@ -13,6 +13,9 @@ Annika Hultén <annika.hulten@aalto.fi>
 Ossi Lehtonen <ossi.lehtonen@aalto.fi>
 """
 
+import hashlib
+import os
+import tempfile
 from copy import deepcopy
 from warnings import warn
 
@@ -750,6 +753,7 @@ def rsa_nifti(
     roi_mask=None,
     brain_mask=None,
     n_jobs=1,
+    cache_dir=None,
     verbose=False,
 ):
     """Perform RSA in a searchlight pattern on Nibabel Nifti-like images.
@@ -850,6 +854,15 @@ def rsa_nifti(
     n_jobs : int
         The number of processes (=number of CPU cores) to use. Specify -1 to
         use all available cores. Defaults to 1.
+    cache_dir : str | None
+        When set, the voxel-to-voxel distances are cached in this directory, keyed
+        by a hash of the brain mask, the image shape and affine, and the
+        ``spatial_radius``. Subsequent calls with the same geometry (for example,
+        other subjects in the same template space) load the cached distances as
+        memory maps instead of recomputing them. Defaults to ``None``, in which
+        case nothing is cached.
+
+        .. versionadded:: 1.1
     verbose : bool
         Whether to display a progress bar. In order for this to work, you need
         the tqdm python module installed. Defaults to False.
@@ -933,18 +946,9 @@ def rsa_nifti(
 
     # Compute distances between voxels
     if spatial_radius is not None:
-        # Find voxel positions
-        voxels = np.array(list(np.ndindex(image.shape[:-1])))
-        voxel_loc = voxels @ image.affine[:3, :3]
-        voxel_loc /= 1000  # convert position from mm to meters
-        if brain_mask is not None:
-            voxel_loc = voxel_loc[brain_mask]
-
-        logger.info("Computing distances...")
-        from sklearn.neighbors import NearestNeighbors
-
-        nn = NearestNeighbors(radius=spatial_radius, n_jobs=n_jobs).fit(voxel_loc)
-        dist = nn.radius_neighbors_graph(mode="distance")
+        dist = _get_voxel_distances(
+            image, brain_mask, spatial_radius, n_jobs=n_jobs, cache_dir=cache_dir
+        )
     else:
         dist = None
 
@@ -999,6 +1003,7 @@ def rdm_nifti(
     roi_mask=None,
     brain_mask=None,
     n_jobs=1,
+    cache_dir=None,
     verbose=False,
 ):
     """Generate RDMs in a searchlight pattern on Nibabel Nifty-like images.
@@ -1065,6 +1070,15 @@ def rdm_nifti(
     n_jobs : int
         The number of processes (=number of CPU cores) to use. Specify -1 to
         use all available cores. Defaults to 1.
+    cache_dir : str | None
+        When set, the voxel-to-voxel distances are cached in this directory, keyed
+        by a hash of the brain mask, the image shape and affine, and the
+        ``spatial_radius``. Subsequent calls with the same geometry (for example,
+        other subjects in the same template space) load the cached distances as
+        memory maps instead of recomputing them. Defaults to ``None``, in which
+        case nothing is cached.
+
+        .. versionadded:: 1.1
     verbose : bool
         Whether to display a progress bar. In order for this to work, you need
         the tqdm python module installed. Defaults to False.
@@ -1087,11 +1101,6 @@ def rdm_nifti(
     if labels is None and y is not None:
         labels = y
 
-    # Find voxel positions
-    voxels = np.array(list(np.ndindex(image.shape[:-1])))
-    voxel_loc = voxels @ image.affine[:3, :3]
-    voxel_loc /= 1000  # convert position from mm to meters
-
     # Apply masks
     if brain_mask is not None:
         if brain_mask.ndim != 3 or brain_mask.shape != image.shape[:3]:
@@ -1103,7 +1112,6 @@ def rdm_nifti(
         brain_mask = brain_mask.get_fdata() != 0
         brain_mask = brain_mask.ravel()
         X = X[:, brain_mask]
-        voxel_loc = voxel_loc[brain_mask, :]
     if roi_mask is not None:
         if roi_mask.ndim != 3 or roi_mask.shape != image.shape[:3]:
             raise ValueError(
@@ -1118,13 +1126,13 @@ def rdm_nifti(
         roi_mask = np.flatnonzero(roi_mask)
 
     # Compute distances between voxels
-    logger.info("Computing distances...")
-    from sklearn.neighbors import NearestNeighbors
-
-    nn = NearestNeighbors(
-        radius=1e6 if spatial_radius is None else spatial_radius, n_jobs=n_jobs
-    ).fit(voxel_loc)
-    dist = nn.radius_neighbors_graph(mode="distance")
+    dist = _get_voxel_distances(
+        image,
+        brain_mask,
+        1e6 if spatial_radius is None else spatial_radius,
+        n_jobs=n_jobs,
+        cache_dir=cache_dir,
+    )
 
     # Compute RDMs
     patches = searchlight(
@@ -1145,6 +1153,96 @@ def rdm_nifti(
     )
 
 
+def _get_voxel_distances(image, brain_mask, spatial_radius, n_jobs=1, cache_dir=None):
+    """Get the voxel-to-voxel distances within a radius for a Nifti-like image.
+
+    Parameters
+    ----------
+    image : Nifti-like image
+        The image defining the voxel grid (through its shape and affine).
+    brain_mask : ndarray of bool, shape (n_voxels,) | None
+        The flattened brain mask. Only voxels inside the mask are included.
+    spatial_radius : float
+        Maximum distance in meters. Voxels further apart are not connected.
+    n_jobs : int
+        Number of CPU cores to use for the nearest neighbor search. Defaults to 1.
+    cache_dir : str | None
+        Directory in which to cache the distances. Defaults to ``None``, which
+        means no caching.
+
+    Returns
+    -------
+    dist : scipy.sparse.csr_matrix, shape (n_voxels, n_voxels)
+        The distances between voxels that are within ``spatial_radius`` of each
+        other.
+
+    """
+    from scipy.sparse import csr_matrix
+
+    if cache_dir is not None:
+        sha = hashlib.sha1()
+        if brain_mask is not None:
+            sha.update(np.packbits(brain_mask).tobytes())
+        sha.update(
+            repr(
+                (
+                    tuple(image.shape[:3]),
+                    np.asarray(image.affine, dtype=float).round(6).tolist(),
+                    float(spatial_radius),
+                    brain_mask is None,
+                )
+            ).encode()
+        )
+        cache_path = os.path.join(cache_dir, f"voxel_distances_{sha.hexdigest()}")
+        if os.path.isdir(cache_path):
+            logger.info("Loading cached distances...")
+            arrays = {
+                name: np.load(os.path.join(cache_path, f"{name}.npy"), mmap_mode="r")
+                for name in ["data", "indices", "indptr", "shape"]
+            }
+            return csr_matrix(
+                (arrays["data"], arrays["indices"], arrays["indptr"]),
+                shape=tuple(arrays["shape"]),
+                copy=False,
+            )
+
+    # Find voxel positions
+    voxels = np.array(list(np.ndindex(image.shape[:3])))
+    voxel_loc = voxels @ image.affine[:3, :3]
+    voxel_loc /= 1000  # convert position from mm to meters
+    if brain_mask is not None:
+        voxel_loc = voxel_loc[brain_mask]
+
+    logger.info("Computing distances...")
+    from sklearn.neighbors import NearestNeighbors
+
+    nn = NearestNeighbors(radius=spatial_radius, n_jobs=n_jobs).fit(voxel_loc)
+    dist = nn.radius_neighbors_graph(mode="distance").tocsr()
+
+    if cache_dir is not None:
+        # Write to a temporary directory first, so concurrent readers never see a
+        # partially written cache entry.
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=cache_dir)
+        arrays = dict(
+            data=dist.data,
+            indices=dist.indices,
+            indptr=dist.indptr,
+            shape=np.array(dist.shape),
+        )
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+        try:
+            os.rename(tmp_path, cache_path)
+        except OSError:
+            # Another process cached the same distances in the meantime.
+            for name in arrays:
+                os.remove(os.path.join(tmp_path, f"{name}.npy"))
+            os.rmdir(tmp_path)
+
+    return dist
+
+
 def _check_stcs_compatibility(stcs):
     """Check for compatibility of the source estimates."""
     for stc in stcs:
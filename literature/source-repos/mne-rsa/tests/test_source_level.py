@@ -787,6 +787,35 @@ class TestNiftiRSA:
         with pytest.raises(ValueError, match="Brain mask"):
             rsa_result = rsa_nifti(bold, model_rdm, brain_mask=mask.slicer[:5, :5, :5])
 
+    def test_rsa_spatial_cache_dir(self, tmp_path):
+        """Test caching the searchlight distances on disk."""
+        bold, mask = make_nifti()
+        model_rdm = np.array([0.5, 1, 1, 1, 1, 0.5])
+        expected = rsa_nifti(bold, model_rdm, spatial_radius=0.01, brain_mask=mask)
+        rsa_result = rsa_nifti(
+            bold, model_rdm, spatial_radius=0.01, brain_mask=mask, cache_dir=tmp_path
+        )
+        assert len(list(tmp_path.iterdir())) == 1
+        assert_equal(rsa_result.get_fdata(), expected.get_fdata())
+
+        # Second run loads the cached distances.
+        rsa_result = rsa_nifti(
+            bold, model_rdm, spatial_radius=0.01, brain_mask=mask, cache_dir=tmp_path
+        )
+        assert len(list(tmp_path.iterdir())) == 1
+        assert_equal(rsa_result.get_fdata(), expected.get_fdata())
+
+        # A different radius or mask is a different cache entry.
+        rsa_nifti(
+            bold, model_rdm, spatial_radius=0.02, brain_mask=mask, cache_dir=tmp_path
+        )
+        rsa_nifti(bold, model_rdm, spatial_radius=0.01, cache_dir=tmp_path)
+        assert len(list(tmp_path.iterdir())) == 3
+
+        rdms = list(rdm_nifti(bold, spatial_radius=0.01, cache_dir=tmp_path))
+        assert len(rdms) == 10 * 10 * 10
+        assert len(list(tmp_path.iterdir())) == 3
+
 
 def test_restrict_src_to_vertices():
     """Test restricting a source space."""
@@ -167,7 +167,8 @@ class DatasetBase:
         raise NotImplementedError(
             "subset_channel function not implemented in used Dataset class!")
 
-    def save(self, filename, file_type='hdf5', overwrite=False):
+    def save(self, filename, file_type='hdf5', overwrite=False,
+             group=None, compression=None):
         """ Saves the dataset object to a file
 
         Args:
@@ -177,13 +178,19 @@ class DatasetBase:
                 hdf5: hdf5 file
                 pkl: pickle file
             overwrite(Boolean): overwrites file if it already exists
+            group(String): hdf5 only, group to save the dataset to. This
+                allows storing many datasets in one file, which can
+                then be loaded one at a time with load_dataset
+            compression(String): hdf5 only, compression filter for the
+                measurements and descriptors, e.g. 'gzip'
 
         """
         data_dict = self.to_dict()
         if overwrite:
             remove_file(filename)
         if file_type == 'hdf5':
-            write_dict_hdf5(filename, data_dict)
+            write_dict_hdf5(filename, data_dict, group=group,
+                            compression=compression)
         elif file_type == 'pkl':
             write_dict_pkl(filename, data_dict)
 
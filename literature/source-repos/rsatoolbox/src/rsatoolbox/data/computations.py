@@ -41,3 +41,42 @@ def average_dataset_by(dataset, by):
         average[i_v] = np.mean(measurements, axis=0)
         n_obs[i_v] = measurements.shape[0]
     return average, unique_values, n_obs
+
+
+def bin_time_axis(measurements, time, bins):
+    """
+    averages the last (time) axis of an array within time-bins
+
+    Bins made of consecutive time-points, the usual case, are averaged
+    as differences of one cumulative sum over time; other bins are
+    averaged directly.
+
+    Args:
+        measurements(numpy.ndarray): array with time as last axis
+        time(array-like): time-coordinate of each time-point
+        bins(array-like): list of bins, with bins[i] containing the vector
+            of time-points for the i-th bin
+
+    Returns:
+        numpy.ndarray: binned: measurements averaged per bin
+        numpy.ndarray: binned_time: average time of each bin
+    """
+    time = np.asarray(time)
+    indices = [np.flatnonzero(np.isin(time, b)) for b in bins]
+    binned = np.empty(measurements.shape[:-1] + (len(bins),))
+    contiguous = np.array([
+        len(idx) > 0 and idx[-1] - idx[0] + 1 == len(idx)
+        for idx in indices], dtype=bool)
+    if contiguous.any():
+        cumsum = np.zeros(measurements.shape[:-1] + (len(time) + 1,))
+        np.cumsum(measurements, axis=-1, out=cumsum[..., 1:])
+        i_bins = np.flatnonzero(contiguous)
+        starts = np.array([indices[i][0] for i in i_bins])
+        ends = np.array([indices[i][-1] + 1 for i in i_bins])
+        binned[..., i_bins] = (cumsum[..., ends] - cumsum[..., starts]) \
+            / (ends - starts)
+    for i_bin in np.flatnonzero(~contiguous):
+        binned[..., i_bin] = np.mean(
+            measurements[..., indices[i_bin]], axis=-1)
+    binned_time = np.array([np.mean(time[idx]) for idx in indices])
+    return binned, binned_time
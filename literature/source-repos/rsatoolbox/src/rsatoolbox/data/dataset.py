@@ -13,6 +13,7 @@ from copy import deepcopy
 import numpy as np
 from pandas import DataFrame
 from rsatoolbox.data.ops import merge_datasets
+from rsatoolbox.data.computations import bin_time_axis
 from rsatoolbox.util.data_utils import get_unique_unsorted
 from rsatoolbox.util.data_utils import get_unique_inverse
 from rsatoolbox.util.descriptor_utils import check_descriptor_length_error
@@ -531,12 +532,14 @@ class TemporalDataset(Dataset):
             list of TemporalDataset,  splitted by the selected time_descriptor
         """
 
-        time = get_unique_unsorted(self.time_descriptors[by])
         dataset_list = []
-        for v in time:
-            selection = [i for i, val in enumerate(self.time_descriptors[by])
-                         if val == v]
-            measurements = self.measurements[:, :, selection]
+        for selection in self._time_groups(by):
+            if selection[-1] - selection[0] + 1 == len(selection):
+                # consecutive time-points: a view instead of a copy
+                measurements = self.measurements[
+                    :, :, selection[0]:selection[-1] + 1]
+            else:
+                measurements = self.measurements[:, :, selection]
             descriptors = self.descriptors
             obs_descriptors = self.obs_descriptors
             channel_descriptors = self.channel_descriptors
@@ -566,17 +569,8 @@ class TemporalDataset(Dataset):
                 binned time-points.
         """
 
-        time = self.time_descriptors[by]
-        n_bins = len(bins)
-
-        binned_measurements = np.zeros((self.n_obs, self.n_channel, n_bins))
-        binned_time = np.zeros(n_bins)
-
-        for t in range(n_bins):
-            t_idx = np.isin(time, bins[t])
-            binned_measurements[:, :, t] = np.mean(
-                self.measurements[:, :, t_idx], axis=2)
-            binned_time[t] = np.mean(time[t_idx])
+        binned_measurements, binned_time = bin_time_axis(
+            self.measurements, self.time_descriptors[by], bins)
 
         time_descriptors = self.time_descriptors.copy()
         time_descriptors[by] = binned_time
@@ -704,6 +698,20 @@ class TemporalDataset(Dataset):
         self.measurements = self.measurements[order]
         self.obs_descriptors = subset_descriptor(self.obs_descriptors, order)
 
+    def _time_groups(self, by):
+        """ indices of the time-points of each value of a time_descriptor
+
+        Args:
+            by(String): the time_descriptor to group by
+
+        Returns:
+            list of numpy.ndarray, one per value in order of appearance
+        """
+        values, inverse = get_unique_inverse(self.time_descriptors[by])
+        order = np.argsort(inverse, kind='stable')
+        counts = np.bincount(inverse, minlength=len(values))
+        return np.split(order, np.cumsum(counts)[:-1])
+
     def time_as_channels(self) -> Dataset:
         """Converts this to a standard Dataset "long format",
         where timepoints are represented as additional channels.
@@ -738,37 +746,27 @@ class TemporalDataset(Dataset):
         Returns:
             Dataset
         """
-        time = get_unique_unsorted(self.time_descriptors[by])
+        order = np.concatenate(self._time_groups(by))
+        n_time = len(order)
 
         descriptors = self.descriptors
         channel_descriptors = self.channel_descriptors.copy()
 
-        measurements = np.empty([0, self.n_channel])
-        obs_descriptors = dict.fromkeys(self.obs_descriptors, [])
-
-        for key in self.time_descriptors:
-            obs_descriptors[key] = np.array([])
-
-        for v in time:
-            selection = [i for i, val in enumerate(self.time_descriptors[by])
-                         if val == v]
-
-            measurements = np.concatenate((
-                measurements, self.measurements[:, :, selection].squeeze()),
-                axis=0)
-
-            for key in self.obs_descriptors:
-                obs_descriptors[key] = np.concatenate((
-                    obs_descriptors[key], self.obs_descriptors[key].copy()),
-                    axis=0)
-
-            for key in self.time_descriptors:
-                obs_descriptors[key] = np.concatenate((
-                    obs_descriptors[key], np.repeat(
-                        [self.time_descriptors[key][s]
-                         for s in selection],
-                        self.n_obs)),
-                    axis=0)
+        measurements = self.measurements
+        if np.any(order != np.arange(n_time)):
+            measurements = measurements[:, :, order]
+        # time x obs x channel, one copy into the long format
+        measurements = np.moveaxis(measurements, 2, 0).reshape(
+            n_time * self.n_obs, self.n_channel)
+
+        obs_descriptors = {}
+        for key, value in self.obs_descriptors.items():
+            value = np.asarray(value)
+            obs_descriptors[key] = np.tile(
+                value, (n_time,) + (1,) * (value.ndim - 1))
+        for key, value in self.time_descriptors.items():
+            obs_descriptors[key] = np.repeat(
+                np.asarray(value)[order], self.n_obs, axis=0)
 
         dataset = Dataset(measurements=measurements,
                           descriptors=descriptors,
@@ -812,11 +810,13 @@ class TemporalDataset(Dataset):
         return data_dict
 
 
-def load_dataset(filename, file_type=None):
+def load_dataset(filename, file_type=None, group=None):
     """ loads a Dataset object from disc
 
     Args:
         filename(String): path to file to load
+        group(String): hdf5 only, group the dataset was saved to,
+            see Dataset.save
 
     """
     if file_type is None:
@@ -826,7 +826,7 @@ def load_dataset(filename, file_type=None):
             elif filename[-3:] == '.h5' or filename[-4:] == 'hdf5':
                 file_type = 'hdf5'
     if file_type == 'hdf5':
-        data_dict = read_dict_hdf5(filename)
+        data_dict = read_dict_hdf5(filename, group=group)
     elif file_type == 'pkl':
         data_dict = read_dict_pkl(filename)
     else:
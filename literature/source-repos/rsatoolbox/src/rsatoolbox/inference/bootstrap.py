@@ -7,7 +7,8 @@ import numpy as np
 from rsatoolbox.util.rdm_utils import add_pattern_index
 
 
-def bootstrap_sample(rdms, rdm_descriptor='index', pattern_descriptor='index'):
+def bootstrap_sample(rdms, rdm_descriptor='index', pattern_descriptor='index',
+                     rng=None):
     """Draws a bootstrap_sample from the data.
 
     This function generates a bootstrap sample of RDMs resampled over
@@ -27,6 +28,9 @@ def bootstrap_sample(rdms, rdm_descriptor='index', pattern_descriptor='index'):
             descriptor to group the patterns by. Each group of patterns will
             be in or out of the sample as a whole
 
+        rng(numpy.random.Generator): random number generator to draw the
+            sample with. By default the global numpy random state is used
+
     Returns:
         rsatoolbox.rdm.rdms.RDMs: rdms
             subsampled dataset with equal number of groups in both patterns
@@ -42,19 +46,15 @@ def bootstrap_sample(rdms, rdm_descriptor='index', pattern_descriptor='index'):
     rdm_select = np.unique(rdms.rdm_descriptors[rdm_descriptor])
     pattern_descriptor, pattern_select = \
         add_pattern_index(rdms, pattern_descriptor)
-    rdm_idx = np.random.randint(0, len(rdm_select),
-                                size=len(rdm_select))
-    rdm_idx = rdm_select[rdm_idx]
+    rdm_idx = rdm_select[_draw_index(len(rdm_select), rng)]
     rdms = rdms.subsample(rdm_descriptor, rdm_idx)
-    pattern_idx = np.random.randint(0, len(pattern_select),
-                                    size=len(pattern_select))
-    pattern_idx = pattern_select[pattern_idx]
+    pattern_idx = pattern_select[_draw_index(len(pattern_select), rng)]
     rdms = rdms.subsample_pattern(pattern_descriptor,
                                   pattern_idx)
     return rdms, rdm_idx, pattern_idx
 
 
-def bootstrap_sample_rdm(rdms, rdm_descriptor='index'):
+def bootstrap_sample_rdm(rdms, rdm_descriptor='index', rng=None):
     """Draws a bootstrap_sample from the data.
 
     This function generates a bootstrap sample of RDMs resampled over
@@ -69,6 +69,9 @@ def bootstrap_sample_rdm(rdms, rdm_descriptor='index'):
             the descriptor each sample will either contain all RDMs with
             this value or none
 
+        rng(numpy.random.Generator): random number generator to draw the
+            sample with. By default the global numpy random state is used
+
     Returns:
         rsatoolbox.rdm.rdms.RDMs: rdm_idx
             subsampled dataset with equal number of groups of rdms
@@ -81,14 +84,12 @@ def bootstrap_sample_rdm(rdms, rdm_descriptor='index'):
 
     """
     rdm_select = np.unique(rdms.rdm_descriptors[rdm_descriptor])
-    rdm_sample = np.random.randint(0, len(rdm_select),
-                                   size=len(rdm_select))
-    rdm_idx = rdm_select[rdm_sample]
+    rdm_idx = rdm_select[_draw_index(len(rdm_select), rng)]
     rdms = rdms.subsample(rdm_descriptor, rdm_idx)
     return rdms, rdm_idx
 
 
-def bootstrap_sample_pattern(rdms, pattern_descriptor='index'):
+def bootstrap_sample_pattern(rdms, pattern_descriptor='index', rng=None):
     """Draws a bootstrap_sample from the data.
 
     This function generates a bootstrap sample of RDMs resampled over
@@ -102,6 +103,9 @@ def bootstrap_sample_pattern(rdms, pattern_descriptor='index'):
             descriptor to group the patterns by. Each group of patterns will
             be in or out of the sample as a whole
 
+        rng(numpy.random.Generator): random number generator to draw the
+            sample with. By default the global numpy random state is used
+
     Returns:
         rsatoolbox.rdm.rdms.RDMs: rdm_idx
             subsampled dataset with equal number of pattern groups
@@ -111,9 +115,14 @@ def bootstrap_sample_pattern(rdms, pattern_descriptor='index'):
     """
     pattern_descriptor, pattern_select = \
         add_pattern_index(rdms, pattern_descriptor)
-    pattern_idx = np.random.randint(0, len(pattern_select),
-                                    size=len(pattern_select))
-    pattern_idx = pattern_select[pattern_idx]
+    pattern_idx = pattern_select[_draw_index(len(pattern_select), rng)]
     rdms = rdms.subsample_pattern(pattern_descriptor,
                                   pattern_idx)
     return rdms, pattern_idx
+
+
+def _draw_index(n, rng=None):
+    """draws n indices from range(n) with replacement"""
+    if rng is None:
+        return np.random.randint(0, n, size=n)
+    return rng.integers(0, n, size=n)
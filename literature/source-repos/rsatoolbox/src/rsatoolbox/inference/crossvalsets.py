@@ -86,7 +86,8 @@ def sets_leave_one_out_rdm(rdms, rdm_descriptor='index'):
 
 
 def sets_k_fold(rdms, k_rdm=None, k_pattern=None, random=True,
-                pattern_descriptor='index', rdm_descriptor='index'):
+                pattern_descriptor='index', rdm_descriptor='index',
+                rng=None):
     """ generates training and test set combinations by splitting into k
     similar sized groups. This version splits both over rdms and over patterns
     resulting in k_rdm * k_pattern (training, test) pairs.
@@ -100,6 +101,8 @@ def sets_k_fold(rdms, k_rdm=None, k_pattern=None, random=True,
         k_rdm(int): number of rdm groups
         k_pattern(int): number of pattern groups
         random(bool): whether the assignment shall be randomized
+        rng(numpy.random.Generator): random number generator for the
+            assignment. By default the global numpy random state is used
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -118,7 +121,7 @@ def sets_k_fold(rdms, k_rdm=None, k_pattern=None, random=True,
     assert k_rdm <= len(rdm_select), \
         'Can make at most as many groups as rdms'
     if random:
-        np.random.shuffle(rdm_select)
+        _shuffle(rdm_select, rng)
     group_size_rdm = np.floor(len(rdm_select) / k_rdm)
     additional_rdms = len(rdm_select) % k_rdm
     train_set = []
@@ -142,7 +145,7 @@ def sets_k_fold(rdms, k_rdm=None, k_pattern=None, random=True,
                                     rdm_idx_train)
         train_new, test_new, _ = sets_k_fold_pattern(
             rdms_train, k=k_pattern,
-            pattern_descriptor=pattern_descriptor, random=random)
+            pattern_descriptor=pattern_descriptor, random=random, rng=rng)
         ceil_new = deepcopy(test_new)
         for i_pattern in range(k_pattern):
             test_new[i_pattern][0] = rdms_test.subset_pattern(
@@ -154,7 +157,8 @@ def sets_k_fold(rdms, k_rdm=None, k_pattern=None, random=True,
     return train_set, test_set, ceil_set
 
 
-def sets_k_fold_rdm(rdms, k_rdm=None, random=True, rdm_descriptor='index'):
+def sets_k_fold_rdm(rdms, k_rdm=None, random=True, rdm_descriptor='index',
+                    rng=None):
     """ generates training and test set combinations by splitting into k
     similar sized groups. This version splits both over rdms and over patterns
     resulting in k_rdm * k_pattern (training, test) pairs.
@@ -164,6 +168,8 @@ def sets_k_fold_rdm(rdms, k_rdm=None, random=True, rdm_descriptor='index'):
         rdm_descriptor(String): descriptor to select rdm groups
         k_rdm(int): number of rdm groups
         random(bool): whether the assignment shall be randomized
+        rng(numpy.random.Generator): random number generator for the
+            assignment. By default the global numpy random state is used
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -177,7 +183,7 @@ def sets_k_fold_rdm(rdms, k_rdm=None, random=True, rdm_descriptor='index'):
     assert k_rdm <= len(rdm_select), \
         'Can make at most as many groups as rdms'
     if random:
-        np.random.shuffle(rdm_select)
+        _shuffle(rdm_select, rng)
     group_size_rdm = np.floor(len(rdm_select) / k_rdm)
     additional_rdms = len(rdm_select) % k_rdm
     train_set = []
@@ -202,7 +208,7 @@ def sets_k_fold_rdm(rdms, k_rdm=None, random=True, rdm_descriptor='index'):
 
 
 def sets_k_fold_pattern(rdms, pattern_descriptor='index',
-                        k=None, random=False):
+                        k=None, random=False, rng=None):
     """ generates training and test set combinations by splitting into k
     similar sized groups. This version splits in the given order or
     randomizes the order. For k=1 training and test_set are whole dataset,
@@ -219,6 +225,8 @@ def sets_k_fold_pattern(rdms, pattern_descriptor='index',
         pattern_descriptor(String): descriptor to select groups
         k(int): number of groups
         random(bool): whether the assignment shall be randomized
+        rng(numpy.random.Generator): random number generator for the
+            assignment. By default the global numpy random state is used
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -233,7 +241,7 @@ def sets_k_fold_pattern(rdms, pattern_descriptor='index',
     assert k <= len(pattern_select), \
         'Can make at most as many groups as conditions'
     if random:
-        np.random.shuffle(pattern_select)
+        _shuffle(pattern_select, rng)
     group_size = np.floor(len(pattern_select) / k)
     additional_patterns = len(pattern_select) % k
     train_set = []
@@ -314,7 +322,8 @@ def sets_of_k_pattern(rdms, pattern_descriptor=None, k=5, random=False):
 
 
 def sets_random(rdms, n_rdm=None, n_pattern=None, n_cv=2,
-                pattern_descriptor='index', rdm_descriptor='index'):
+                pattern_descriptor='index', rdm_descriptor='index',
+                rng=None):
     """ generates training and test set combinations by selecting random
     test sets of n_rdm RDMs and n_pattern patterns and using the rest of
     the data as the training set.
@@ -327,6 +336,8 @@ def sets_random(rdms, n_rdm=None, n_pattern=None, n_cv=2,
         rdm_descriptor(String): descriptor to select rdm groups
         n_rdm(int): number of rdms per test set
         n_pattern(int): number of patterns per test set
+        rng(numpy.random.Generator): random number generator for the
+            assignment. By default the global numpy random state is used
 
     Returns:
         train_set(list): list of tuples (rdms, pattern_idx)
@@ -349,8 +360,8 @@ def sets_random(rdms, n_rdm=None, n_pattern=None, n_cv=2,
     ceil_set = []
     for _i_group in range(n_cv):
         # shuffle
-        np.random.shuffle(rdm_select)
-        np.random.shuffle(pattern_select)
+        _shuffle(rdm_select, rng)
+        _shuffle(pattern_select, rng)
         # choose indices based on n_rdm
         if n_rdm == 0:
             train_idx = np.arange(len(rdm_select))
@@ -384,3 +395,11 @@ def sets_random(rdms, n_rdm=None, n_pattern=None, n_cv=2,
         train_set.append([rdms_train, pattern_idx_train])
         ceil_set.append([rdms_ceil, pattern_idx_test])
     return train_set, test_set, ceil_set
+
+
+def _shuffle(x, rng=None):
+    """shuffles x in place with rng or the global numpy random state"""
+    if rng is None:
+        np.random.shuffle(x)
+    else:
+        rng.shuffle(x)
@@ -4,15 +4,22 @@
 evaluate model performance
 """
 
+import hashlib
+import os
+import types
 import numpy as np
 import tqdm
+from joblib import Parallel, delayed
+from rsatoolbox.rdm import RDMs
 from rsatoolbox.rdm import compare
+from rsatoolbox.rdm import prepare_rdms
 from rsatoolbox.inference import bootstrap_sample
 from rsatoolbox.inference import bootstrap_sample_rdm
 from rsatoolbox.inference import bootstrap_sample_pattern
 from rsatoolbox.model import Model
 from rsatoolbox.util.inference_util import input_check_model
 from rsatoolbox.util.inference_util import default_k_pattern, default_k_rdm
+from rsatoolbox.util.rdm_utils import subsample_index
 from .result import Result
 from .crossvalsets import sets_k_fold, sets_random
 from .noise_ceiling import boot_noise_ceiling
@@ -23,7 +30,7 @@ def eval_dual_bootstrap(
         models, data, method='cosine', fitter=None,
         k_pattern=1, k_rdm=1, N=1000, n_cv=2,
         pattern_descriptor='index', rdm_descriptor='index',
-        use_correction=True):
+        use_correction=True, n_jobs=1, seed=None, checkpoint=None):
     """dual bootstrap evaluation of models
     i.e. models are evaluated in a bootstrap over rdms, one over patterns
     and a bootstrap over both using the same bootstrap samples for each.
@@ -82,6 +89,14 @@ def eval_dual_bootstrap(
             alternatives: 'rdm', 'pattern'
         use_correction(bool): switch for the correction for the
             variance caused by crossvalidation (default: True)
+        n_jobs(int): number of processes to distribute the bootstrap
+            samples over (default: 1)
+        seed(int): seed for the bootstrap samples. Each sample gets its own
+            random generator spawned from this seed, such that results do
+            not depend on n_jobs. By default the seed is drawn from the
+            global numpy random state
+        checkpoint(String): directory to store completed samples in.
+            A run with the same directory resumes from the stored samples
 
     Returns:
         numpy.ndarray: matrix of evaluations (N x k)
@@ -100,44 +115,13 @@ def eval_dual_bootstrap(
         use_correction = False
     if isinstance(models, Model):
         models = [models]
-    evaluations = np.zeros((N, len(models), k_pattern * k_rdm, n_cv, 3))
-    noise_ceil = np.zeros((2, N, n_cv, 3))
-    for i_sample in tqdm.trange(N):
-        sample, rdm_idx, pattern_idx = bootstrap_sample(
-            data,
-            rdm_descriptor=rdm_descriptor,
-            pattern_descriptor=pattern_descriptor)
-        sample_rdm = data.subsample(rdm_descriptor, rdm_idx)
-        sample_pattern = data.subsample_pattern(
-            pattern_descriptor, pattern_idx)
-        if len(np.unique(rdm_idx)) >= k_rdm \
-           and len(np.unique(pattern_idx)) >= 3 * k_pattern:
-            for i_rep in range(n_cv):
-                evals, cv_nc = _internal_cv(
-                    models, sample,
-                    pattern_descriptor, rdm_descriptor, pattern_idx,
-                    k_pattern, k_rdm,
-                    method, fitter)
-                noise_ceil[:, i_sample, i_rep, 0] = cv_nc
-                evaluations[i_sample, :, :, i_rep, 0] = evals[0]
-                evals, cv_nc = _internal_cv(
-                    models, sample_rdm,
-                    pattern_descriptor, rdm_descriptor,
-                    np.unique(data.pattern_descriptors[pattern_descriptor]),
-                    k_pattern, k_rdm,
-                    method, fitter)
-                noise_ceil[:, i_sample, i_rep, 1] = cv_nc
-                evaluations[i_sample, :, :, i_rep, 1] = evals[0]
-                evals, cv_nc = _internal_cv(
-                    models, sample_pattern,
-                    pattern_descriptor, rdm_descriptor, pattern_idx,
-                    k_pattern, k_rdm,
-                    method, fitter)
-                noise_ceil[:, i_sample, i_rep, 2] = cv_nc
-                evaluations[i_sample, :, :, i_rep, 2] = evals[0]
-        else:  # sample does not allow desired crossvalidation
-            evaluations[i_sample, :, :, :, :] = np.nan
-            noise_ceil[:, i_sample, :, :] = np.nan
+    samples = _run_bootstrap_samples(
+        _dual_bootstrap_sample,
+        (models, data, method, fitter, k_pattern, k_rdm, n_cv,
+         pattern_descriptor, rdm_descriptor),
+        N, seed=seed, n_jobs=n_jobs, checkpoint=checkpoint)
+    evaluations = np.array([sample[0] for sample in samples])
+    noise_ceil = np.array([sample[1] for sample in samples]).swapaxes(0, 1)
     cv_method = 'dual_bootstrap'
     dof = min(data.n_rdm, data.n_cond) - 1
     eval_ok = ~np.isnan(evaluations[:, 0, 0, 0, 0])
@@ -218,7 +202,7 @@ def eval_fixed(models, data, theta=None, method='cosine'):
 
 def eval_bootstrap(models, data, theta=None, method='cosine', N=1000,
                    pattern_descriptor='index', rdm_descriptor='index',
-                   boot_noise_ceil=True):
+                   boot_noise_ceil=True, batched=False):
     """evaluates models on data
     performs bootstrapping to get a sampling distribution
 
@@ -230,6 +214,9 @@ def eval_bootstrap(models, data, theta=None, method='cosine', N=1000,
         N(int): number of samples
         pattern_descriptor(string): descriptor to group patterns for bootstrap
         rdm_descriptor(string): descriptor to group rdms for bootstrap
+        batched(bool): draw all bootstrap samples up front and evaluate
+            them on index arrays instead of resampled RDMs objects
+            (default: False)
 
     Returns:
         numpy.ndarray: vector of evaluations
@@ -237,28 +224,33 @@ def eval_bootstrap(models, data, theta=None, method='cosine', N=1000,
     """
     models, evaluations, theta, _ = \
         input_check_model(models, theta, None, N)
-    noise_min = []
-    noise_max = []
-    for i in tqdm.trange(N):
-        sample, _, pattern_idx = \
-            bootstrap_sample(data, rdm_descriptor=rdm_descriptor,
-                             pattern_descriptor=pattern_descriptor)
-        if len(np.unique(pattern_idx)) >= 3:
-            for j, mod in enumerate(models):
-                rdm_pred = mod.predict_rdm(theta=theta[j])
-                rdm_pred = rdm_pred.subsample_pattern(pattern_descriptor,
-                                                      pattern_idx)
-                evaluations[i, j] = np.mean(compare(rdm_pred, sample,
-                                                    method))
-            if boot_noise_ceil:
-                noise_min_sample, noise_max_sample = boot_noise_ceiling(
-                    sample, method=method, rdm_descriptor=rdm_descriptor)
-                noise_min.append(noise_min_sample)
-                noise_max.append(noise_max_sample)
-        else:
-            evaluations[i, :] = np.nan
-            noise_min.append(np.nan)
-            noise_max.append(np.nan)
+    if batched:
+        evaluations, noise_min, noise_max = _eval_bootstrap_batched(
+            models, data, theta, method, N, pattern_descriptor,
+            rdm_descriptor, 'both', boot_noise_ceil)
+    else:
+        noise_min = []
+        noise_max = []
+        for i in tqdm.trange(N):
+            sample, _, pattern_idx = \
+                bootstrap_sample(data, rdm_descriptor=rdm_descriptor,
+                                 pattern_descriptor=pattern_descriptor)
+            if len(np.unique(pattern_idx)) >= 3:
+                for j, mod in enumerate(models):
+                    rdm_pred = mod.predict_rdm(theta=theta[j])
+                    rdm_pred = rdm_pred.subsample_pattern(pattern_descriptor,
+                                                          pattern_idx)
+                    evaluations[i, j] = np.mean(compare(rdm_pred, sample,
+                                                        method))
+                if boot_noise_ceil:
+                    noise_min_sample, noise_max_sample = boot_noise_ceiling(
+                        sample, method=method, rdm_descriptor=rdm_descriptor)
+                    noise_min.append(noise_min_sample)
+                    noise_max.append(noise_max_sample)
+            else:
+                evaluations[i, :] = np.nan
+                noise_min.append(np.nan)
+                noise_max.append(np.nan)
     if boot_noise_ceil:
         eval_ok = np.isfinite(evaluations[:, 0])
         noise_ceil = np.array([noise_min, noise_max])
@@ -279,7 +271,7 @@ def eval_bootstrap(models, data, theta=None, method='cosine', N=1000,
 
 def eval_bootstrap_pattern(models, data, theta=None, method='cosine', N=1000,
                            pattern_descriptor='index', rdm_descriptor='index',
-                           boot_noise_ceil=True):
+                           boot_noise_ceil=True, batched=False):
     """evaluates a models on data
     performs bootstrapping over patterns to get a sampling distribution
 
@@ -292,6 +284,9 @@ def eval_bootstrap_pattern(models, data, theta=None, method='cosine', N=1000,
         pattern_descriptor(string): descriptor to group patterns for bootstrap
         rdm_descriptor(string): descriptor to group patterns for noise
             ceiling calculation
+        batched(bool): draw all bootstrap samples up front and evaluate
+            them on index arrays instead of resampled RDMs objects
+            (default: False)
 
     Returns:
         numpy.ndarray: vector of evaluations
@@ -299,27 +294,32 @@ def eval_bootstrap_pattern(models, data, theta=None, method='cosine', N=1000,
     """
     models, evaluations, theta, _ = \
         input_check_model(models, theta, None, N)
-    noise_min = []
-    noise_max = []
-    for i in tqdm.trange(N):
-        sample, pattern_idx = \
-            bootstrap_sample_pattern(data, pattern_descriptor)
-        if len(np.unique(pattern_idx)) >= 3:
-            for j, mod in enumerate(models):
-                rdm_pred = mod.predict_rdm(theta=theta[j])
-                rdm_pred = rdm_pred.subsample_pattern(pattern_descriptor,
-                                                      pattern_idx)
-                evaluations[i, j] = np.mean(compare(rdm_pred, sample,
-                                                    method))
-            if boot_noise_ceil:
-                noise_min_sample, noise_max_sample = boot_noise_ceiling(
-                    sample, method=method, rdm_descriptor=rdm_descriptor)
-                noise_min.append(noise_min_sample)
-                noise_max.append(noise_max_sample)
-        else:
-            evaluations[i, :] = np.nan
-            noise_min.append(np.nan)
-            noise_max.append(np.nan)
+    if batched:
+        evaluations, noise_min, noise_max = _eval_bootstrap_batched(
+            models, data, theta, method, N, pattern_descriptor,
+            rdm_descriptor, 'pattern', boot_noise_ceil)
+    else:
+        noise_min = []
+        noise_max = []
+        for i in tqdm.trange(N):
+            sample, pattern_idx = \
+                bootstrap_sample_pattern(data, pattern_descriptor)
+            if len(np.unique(pattern_idx)) >= 3:
+                for j, mod in enumerate(models):
+                    rdm_pred = mod.predict_rdm(theta=theta[j])
+                    rdm_pred = rdm_pred.subsample_pattern(pattern_descriptor,
+                                                          pattern_idx)
+                    evaluations[i, j] = np.mean(compare(rdm_pred, sample,
+                                                        method))
+                if boot_noise_ceil:
+                    noise_min_sample, noise_max_sample = boot_noise_ceiling(
+                        sample, method=method, rdm_descriptor=rdm_descriptor)
+                    noise_min.append(noise_min_sample)
+                    noise_max.append(noise_max_sample)
+            else:
+                evaluations[i, :] = np.nan
+                noise_min.append(np.nan)
+                noise_max.append(np.nan)
     if boot_noise_ceil:
         eval_ok = np.isfinite(evaluations[:, 0])
         noise_ceil = np.array([noise_min, noise_max])
@@ -340,7 +340,8 @@ def eval_bootstrap_pattern(models, data, theta=None, method='cosine', N=1000,
 
 
 def eval_bootstrap_rdm(models, data, theta=None, method='cosine', N=1000,
-                       rdm_descriptor='index', boot_noise_ceil=True):
+                       rdm_descriptor='index', boot_noise_ceil=True,
+                       batched=False):
     """evaluates models on data
     performs bootstrapping to get a sampling distribution
 
@@ -351,25 +352,34 @@ def eval_bootstrap_rdm(models, data, theta=None, method='cosine', N=1000,
         method(string): comparison method to use
         N(int): number of samples
         rdm_descriptor(string): rdm_descriptor to group rdms for bootstrap
+        batched(bool): draw all bootstrap samples up front and evaluate
+            them from the per RDM model scores (default: False)
 
     Returns:
         numpy.ndarray: vector of evaluations
 
     """
     models, evaluations, theta, _ = input_check_model(models, theta, None, N)
-    noise_min = []
-    noise_max = []
-    for i in tqdm.trange(N):
-        sample, _ = bootstrap_sample_rdm(data, rdm_descriptor)
-        for j, mod in enumerate(models):
-            rdm_pred = mod.predict_rdm(theta=theta[j])
-            evaluations[i, j] = np.mean(compare(rdm_pred, sample,
-                                                method))
-        if boot_noise_ceil:
-            noise_min_sample, noise_max_sample = boot_noise_ceiling(
-                sample, method=method, rdm_descriptor=rdm_descriptor)
-            noise_min.append(noise_min_sample)
-            noise_max.append(noise_max_sample)
+    if batched:
+        evaluations, noise_min, noise_max = _eval_bootstrap_batched(
+            models, data, theta, method, N, 'index',
+            rdm_descriptor, 'rdm', boot_noise_ceil)
+    else:
+        # the predictions do not change across samples, prepare them once
+        rdm_preds = [prepare_rdms(mod.predict_rdm(theta=theta[j]), method)
+                     for j, mod in enumerate(models)]
+        noise_min = []
+        noise_max = []
+        for i in tqdm.trange(N):
+            sample, _ = bootstrap_sample_rdm(data, rdm_descriptor)
+            for j, rdm_pred in enumerate(rdm_preds):
+                evaluations[i, j] = np.mean(compare(rdm_pred, sample,
+                                                    method))
+            if boot_noise_ceil:
+                noise_min_sample, noise_max_sample = boot_noise_ceiling(
+                    sample, method=method, rdm_descriptor=rdm_descriptor)
+                noise_min.append(noise_min_sample)
+                noise_max.append(noise_max_sample)
     if boot_noise_ceil:
         eval_ok = np.isfinite(evaluations[:, 0])
         noise_ceil = np.array([noise_min, noise_max])
@@ -390,6 +400,108 @@ def eval_bootstrap_rdm(models, data, theta=None, method='cosine', N=1000,
     return result
 
 
+def _eval_bootstrap_batched(models, data, theta, method, N,
+                            pattern_descriptor, rdm_descriptor, boot_type,
+                            boot_noise_ceil):
+    """batched backend of the bootstrap evaluations of fixed models
+
+    All bootstrap samples are drawn up front as (N x n_rdm) and
+    (N x n_cond) count arrays. Without pattern bootstrap and with NaNs in
+    the same positions in all RDMs, the model scores are computed once per
+    RDM and the evaluations of all samples are a single matrix product.
+    Otherwise each sample is cut from the RDM vectors by index arrays.
+    The noise ceiling still requires one leave-one-out pooling per sample.
+
+    Args:
+        boot_type(String): which dimension to bootstrap over:
+            'both', 'rdm' or 'pattern'
+
+    Returns:
+        numpy.ndarray: evaluations (N x n_models)
+        numpy.ndarray or list: lower noise ceiling per sample
+        numpy.ndarray or list: upper noise ceiling per sample
+
+    """
+    if pattern_descriptor is None:
+        pattern_descriptor = 'index'
+    if rdm_descriptor is None:
+        rdm_descriptor = 'index'
+    evaluations = np.zeros((N, len(models)))
+    vectors = data.get_vectors()
+    rdm_desc = np.array(data.rdm_descriptors[rdm_descriptor])
+    if boot_type in ('both', 'rdm'):
+        rdm_counts, _ = _bootstrap_counts(rdm_desc, N)
+    else:
+        rdm_counts = np.ones((N, data.n_rdm), int)
+    if boot_type in ('both', 'pattern'):
+        pattern_counts, n_groups = _bootstrap_counts(
+            data.pattern_descriptors[pattern_descriptor], N)
+    else:
+        pattern_counts = None
+    preds = [mod.predict_rdm(theta=theta[j]).get_vectors()
+             for j, mod in enumerate(models)]
+    nan_vectors = np.isnan(vectors)
+    per_rdm = pattern_counts is None and np.all(nan_vectors == nan_vectors[0])
+    if per_rdm:
+        for j, pred in enumerate(preds):
+            scores = np.mean(compare(pred, vectors, method), axis=0)
+            evaluations[:, j] = rdm_counts @ scores / rdm_counts.sum(1)
+        if not boot_noise_ceil:
+            return evaluations, [], []
+    noise_min = np.full(N, np.nan)
+    noise_max = np.full(N, np.nan)
+    for i in tqdm.trange(N):
+        rows = np.repeat(np.arange(data.n_rdm), rdm_counts[i])
+        sample = vectors[rows]
+        if pattern_counts is not None:
+            if n_groups[i] < 3:
+                evaluations[i] = np.nan
+                continue
+            idx, valid = subsample_index(
+                data.n_cond, np.repeat(np.arange(data.n_cond),
+                                       pattern_counts[i]))
+            sample = sample[:, idx]
+            sample[:, ~valid] = np.nan
+        if not per_rdm:
+            sample_prep = prepare_rdms(sample, method)
+            for j, pred in enumerate(preds):
+                if pattern_counts is not None:
+                    pred = pred[:, idx]
+                    pred[:, ~valid] = np.nan
+                evaluations[i, j] = np.mean(compare(pred, sample_prep,
+                                                    method))
+        if boot_noise_ceil:
+            sample_rdms = RDMs(
+                sample, dissimilarity_measure=data.dissimilarity_measure,
+                rdm_descriptors={rdm_descriptor: rdm_desc[rows]})
+            noise_min[i], noise_max[i] = boot_noise_ceiling(
+                sample_rdms, method=method, rdm_descriptor=rdm_descriptor)
+    if not boot_noise_ceil:
+        return evaluations, [], []
+    return evaluations, noise_min, noise_max
+
+
+def _bootstrap_counts(descriptor, N):
+    """draws N bootstrap samples over the groups of a descriptor at once
+
+    Args:
+        descriptor(numpy.ndarray): descriptor values of the elements
+        N(int): number of samples
+
+    Returns:
+        numpy.ndarray: counts (N x n_elements), how often each element
+            is contained in each sample
+        numpy.ndarray: number of distinct groups in each sample
+
+    """
+    select, inverse = np.unique(np.asarray(descriptor), return_inverse=True)
+    n_select = len(select)
+    idx = np.random.randint(0, n_select, size=(N, n_select))
+    counts = np.zeros((N, n_select), int)
+    np.add.at(counts, (np.arange(N)[:, None], idx), 1)
+    return counts[:, inverse.ravel()], np.count_nonzero(counts, axis=1)
+
+
 def crossval(models, rdms, train_set, test_set, ceil_set=None, method='cosine',
              fitter=None, pattern_descriptor='index', calc_noise_ceil=True):
     """evaluates models on cross-validation sets
@@ -457,7 +569,8 @@ def crossval(models, rdms, train_set, test_set, ceil_set=None, method='cosine',
 def bootstrap_crossval(models, data, method='cosine', fitter=None,
                        k_pattern=None, k_rdm=None, N=1000, n_cv=2,
                        pattern_descriptor='index', rdm_descriptor='index',
-                       boot_type='both', use_correction=True):
+                       boot_type='both', use_correction=True,
+                       n_jobs=1, seed=None, checkpoint=None):
     """evaluates a set of models by k-fold crossvalidation within a bootstrap
 
     Crossvalidation creates variance in the results for a single bootstrap
@@ -513,6 +626,14 @@ def bootstrap_crossval(models, data, method='cosine', fitter=None,
             alternatives: 'rdm', 'pattern'
         use_correction(bool): switch for the correction for the
             variance caused by crossvalidation (default: True)
+        n_jobs(int): number of processes to distribute the bootstrap
+            samples over (default: 1)
+        seed(int): seed for the bootstrap samples. Each sample gets its own
+            random generator spawned from this seed, such that results do
+            not depend on n_jobs. By default the seed is drawn from the
+            global numpy random state
+        checkpoint(String): directory to store completed samples in.
+            A run with the same directory resumes from the stored samples
 
     Returns:
         numpy.ndarray: matrix of evaluations (N x k)
@@ -531,40 +652,15 @@ def bootstrap_crossval(models, data, method='cosine', fitter=None,
             k_rdm = default_k_rdm((1 - 1 / np.exp(1)) * n_rdm)
     if isinstance(models, Model):
         models = [models]
-    evaluations = np.empty((N, len(models), k_pattern * k_rdm, n_cv))
-    noise_ceil = np.empty((2, N, n_cv))
-    for i_sample in tqdm.trange(N):
-        if boot_type == 'both':
-            sample, rdm_idx, pattern_idx = bootstrap_sample(
-                data,
-                rdm_descriptor=rdm_descriptor,
-                pattern_descriptor=pattern_descriptor)
-        elif boot_type == 'pattern':
-            sample, pattern_idx = bootstrap_sample_pattern(
-                data,
-                pattern_descriptor=pattern_descriptor)
-            rdm_idx = np.unique(data.rdm_descriptors[rdm_descriptor])
-        elif boot_type == 'rdm':
-            sample, rdm_idx = bootstrap_sample_rdm(
-                data,
-                rdm_descriptor=rdm_descriptor)
-            pattern_idx = np.unique(
-                data.pattern_descriptors[pattern_descriptor])
-        else:
-            raise ValueError('boot_type not understood')
-        if len(np.unique(rdm_idx)) >= k_rdm \
-           and len(np.unique(pattern_idx)) >= 3 * k_pattern:
-            for i_rep in range(n_cv):
-                evals, cv_nc = _internal_cv(
-                    models, sample,
-                    pattern_descriptor, rdm_descriptor, pattern_idx,
-                    k_pattern, k_rdm,
-                    method, fitter)
-                noise_ceil[:, i_sample, i_rep] = cv_nc
-                evaluations[i_sample, :, :, i_rep] = evals[0]
-        else:  # sample does not allow desired crossvalidation
-            evaluations[i_sample, :, :] = np.nan
-            noise_ceil[:, i_sample] = np.nan
+    if boot_type not in ('both', 'pattern', 'rdm'):
+        raise ValueError('boot_type not understood')
+    samples = _run_bootstrap_samples(
+        _bootstrap_crossval_sample,
+        (models, data, method, fitter, k_pattern, k_rdm, n_cv,
+         pattern_descriptor, rdm_descriptor, boot_type),
+        N, seed=seed, n_jobs=n_jobs, checkpoint=checkpoint)
+    evaluations = np.array([sample[0] for sample in samples])
+    noise_ceil = np.array([sample[1] for sample in samples]).swapaxes(0, 1)
     if boot_type == 'both':
         cv_method = 'bootstrap_crossval'
         dof = min(data.n_rdm, data.n_cond) - 1
@@ -616,7 +712,8 @@ def eval_dual_bootstrap_random(
         models, data, method='cosine', fitter=None,
         n_pattern=None, n_rdm=None, N=1000, n_cv=2,
         pattern_descriptor='index', rdm_descriptor='index',
-        boot_type='both', use_correction=True):
+        boot_type='both', use_correction=True,
+        n_jobs=1, seed=None, checkpoint=None):
     """evaluates a set of models by a evaluating a few random crossvalidation
     folds per bootstrap.
 
@@ -647,6 +744,14 @@ def eval_dual_bootstrap_random(
             alternatives: 'rdm', 'pattern'
         use_correction(bool): switch for the correction for the
             variance caused by crossvalidation (default: True)
+        n_jobs(int): number of processes to distribute the bootstrap
+            samples over (default: 1)
+        seed(int): seed for the bootstrap samples. Each sample gets its own
+            random generator spawned from this seed, such that results do
+            not depend on n_jobs. By default the seed is drawn from the
+            global numpy random state
+        checkpoint(String): directory to store completed samples in.
+            A run with the same directory resumes from the stored samples
 
     Returns:
         numpy.ndarray: matrix of evaluations (N x k)
@@ -664,59 +769,15 @@ def eval_dual_bootstrap_random(
         n_rdm = int(np.floor(n_rdm_all / k_rdm))
     if isinstance(models, Model):
         models = [models]
-    evaluations = np.zeros((N, len(models), n_cv))
-    noise_ceil = np.zeros((2, N, n_cv))
-    for i_sample in tqdm.trange(N):
-        if boot_type == 'both':
-            sample, rdm_idx, pattern_idx = bootstrap_sample(
-                data,
-                rdm_descriptor=rdm_descriptor,
-                pattern_descriptor=pattern_descriptor)
-        elif boot_type == 'pattern':
-            sample, pattern_idx = bootstrap_sample_pattern(
-                data,
-                pattern_descriptor=pattern_descriptor)
-            rdm_idx = np.unique(data.rdm_descriptors[rdm_descriptor])
-        elif boot_type == 'rdm':
-            sample, rdm_idx = bootstrap_sample_rdm(
-                data,
-                rdm_descriptor=rdm_descriptor)
-            pattern_idx = np.unique(
-                data.pattern_descriptors[pattern_descriptor])
-        else:
-            raise ValueError('boot_type not understood')
-        if len(np.unique(rdm_idx)) > n_rdm \
-           and len(np.unique(pattern_idx)) >= 3 + n_pattern:
-            train_set, test_set, ceil_set = sets_random(
-                sample,
-                pattern_descriptor=pattern_descriptor,
-                rdm_descriptor=rdm_descriptor,
-                n_pattern=n_pattern, n_rdm=n_rdm, n_cv=n_cv)
-            if n_rdm > 0 or n_pattern > 0:
-                nc = cv_noise_ceiling(
-                    sample, ceil_set, test_set,
-                    method=method,
-                    pattern_descriptor=pattern_descriptor)
-            else:
-                nc = boot_noise_ceiling(
-                    sample,
-                    method=method,
-                    rdm_descriptor=rdm_descriptor)
-            noise_ceil[:, i_sample] = nc
-            for test_s in test_set:
-                test_s[1] = _concat_sampling(pattern_idx, test_s[1])
-            for train_s in train_set:
-                train_s[1] = _concat_sampling(pattern_idx, train_s[1])
-            cv_result = crossval(
-                models, sample,
-                train_set, test_set,
-                method=method, fitter=fitter,
-                pattern_descriptor=pattern_descriptor,
-                calc_noise_ceil=False)
-            evaluations[i_sample, :, :] = cv_result.evaluations[0]
-        else:  # sample does not allow desired crossvalidation
-            evaluations[i_sample, :, :] = np.nan
-            noise_ceil[:, i_sample] = np.nan
+    if boot_type not in ('both', 'pattern', 'rdm'):
+        raise ValueError('boot_type not understood')
+    samples = _run_bootstrap_samples(
+        _dual_bootstrap_random_sample,
+        (models, data, method, fitter, n_pattern, n_rdm, n_cv,
+         pattern_descriptor, rdm_descriptor, boot_type),
+        N, seed=seed, n_jobs=n_jobs, checkpoint=checkpoint)
+    evaluations = np.array([sample[0] for sample in samples])
+    noise_ceil = np.array([sample[1] for sample in samples]).swapaxes(0, 1)
     if boot_type == 'both':
         cv_method = 'bootstrap_crossval'
         dof = min(data.n_rdm, data.n_cond) - 1
@@ -758,6 +819,300 @@ def eval_dual_bootstrap_random(
     return result
 
 
+def _bootstrap_crossval_sample(models, data, method, fitter, k_pattern, k_rdm,
+                               n_cv, pattern_descriptor, rdm_descriptor,
+                               boot_type, rng=None):
+    """ evaluates one bootstrap sample of bootstrap_crossval
+
+    Returns:
+        numpy.ndarray: evaluations (n_models x k_pattern * k_rdm x n_cv)
+        numpy.ndarray: noise ceiling (2 x n_cv)
+
+    """
+    evaluations = np.zeros((len(models), k_pattern * k_rdm, n_cv))
+    noise_ceil = np.zeros((2, n_cv))
+    if boot_type == 'both':
+        sample, rdm_idx, pattern_idx = bootstrap_sample(
+            data,
+            rdm_descriptor=rdm_descriptor,
+            pattern_descriptor=pattern_descriptor,
+            rng=rng)
+    elif boot_type == 'pattern':
+        sample, pattern_idx = bootstrap_sample_pattern(
+            data,
+            pattern_descriptor=pattern_descriptor,
+            rng=rng)
+        rdm_idx = np.unique(data.rdm_descriptors[rdm_descriptor])
+    elif boot_type == 'rdm':
+        sample, rdm_idx = bootstrap_sample_rdm(
+            data,
+            rdm_descriptor=rdm_descriptor,
+            rng=rng)
+        pattern_idx = np.unique(
+            data.pattern_descriptors[pattern_descriptor])
+    if len(np.unique(rdm_idx)) < k_rdm \
+       or len(np.unique(pattern_idx)) < 3 * k_pattern:
+        # sample does not allow desired crossvalidation
+        evaluations[:] = np.nan
+        noise_ceil[:] = np.nan
+        return evaluations, noise_ceil
+    for i_rep in range(n_cv):
+        evals, cv_nc = _internal_cv(
+            models, sample,
+            pattern_descriptor, rdm_descriptor, pattern_idx,
+            k_pattern, k_rdm,
+            method, fitter, rng=rng)
+        noise_ceil[:, i_rep] = cv_nc
+        evaluations[:, :, i_rep] = evals[0]
+    return evaluations, noise_ceil
+
+
+def _dual_bootstrap_sample(models, data, method, fitter, k_pattern, k_rdm,
+                           n_cv, pattern_descriptor, rdm_descriptor,
+                           rng=None):
+    """ evaluates one bootstrap sample of eval_dual_bootstrap
+
+    Returns:
+        numpy.ndarray: evaluations (n_models x k_pattern * k_rdm x n_cv x 3)
+        numpy.ndarray: noise ceiling (2 x n_cv x 3)
+
+    """
+    evaluations = np.zeros((len(models), k_pattern * k_rdm, n_cv, 3))
+    noise_ceil = np.zeros((2, n_cv, 3))
+    sample, rdm_idx, pattern_idx = bootstrap_sample(
+        data,
+        rdm_descriptor=rdm_descriptor,
+        pattern_descriptor=pattern_descriptor,
+        rng=rng)
+    if len(np.unique(rdm_idx)) < k_rdm \
+       or len(np.unique(pattern_idx)) < 3 * k_pattern:
+        # sample does not allow desired crossvalidation
+        evaluations[:] = np.nan
+        noise_ceil[:] = np.nan
+        return evaluations, noise_ceil
+    sample_rdm = data.subsample(rdm_descriptor, rdm_idx)
+    sample_pattern = data.subsample_pattern(
+        pattern_descriptor, pattern_idx)
+    all_patterns = np.unique(data.pattern_descriptors[pattern_descriptor])
+    for i_rep in range(n_cv):
+        for i_boot, (boot_sample, boot_pattern_idx) in enumerate([
+                (sample, pattern_idx),
+                (sample_rdm, all_patterns),
+                (sample_pattern, pattern_idx)]):
+            evals, cv_nc = _internal_cv(
+                models, boot_sample,
+                pattern_descriptor, rdm_descriptor, boot_pattern_idx,
+                k_pattern, k_rdm,
+                method, fitter, rng=rng)
+            noise_ceil[:, i_rep, i_boot] = cv_nc
+            evaluations[:, :, i_rep, i_boot] = evals[0]
+    return evaluations, noise_ceil
+
+
+def _dual_bootstrap_random_sample(models, data, method, fitter,
+                                  n_pattern, n_rdm, n_cv,
+                                  pattern_descriptor, rdm_descriptor,
+                                  boot_type, rng=None):
+    """ evaluates one bootstrap sample of eval_dual_bootstrap_random
+
+    Returns:
+        numpy.ndarray: evaluations (n_models x n_cv)
+        numpy.ndarray: noise ceiling (2 x n_cv)
+
+    """
+    evaluations = np.zeros((len(models), n_cv))
+    noise_ceil = np.zeros((2, n_cv))
+    if boot_type == 'both':
+        sample, rdm_idx, pattern_idx = bootstrap_sample(
+            data,
+            rdm_descriptor=rdm_descriptor,
+            pattern_descriptor=pattern_descriptor,
+            rng=rng)
+    elif boot_type == 'pattern':
+        sample, pattern_idx = bootstrap_sample_pattern(
+            data,
+            pattern_descriptor=pattern_descriptor,
+            rng=rng)
+        rdm_idx = np.unique(data.rdm_descriptors[rdm_descriptor])
+    elif boot_type == 'rdm':
+        sample, rdm_idx = bootstrap_sample_rdm(
+            data,
+            rdm_descriptor=rdm_descriptor,
+            rng=rng)
+        pattern_idx = np.unique(
+            data.pattern_descriptors[pattern_descriptor])
+    if len(np.unique(rdm_idx)) <= n_rdm \
+       or len(np.unique(pattern_idx)) < 3 + n_pattern:
+        # sample does not allow desired crossvalidation
+        evaluations[:] = np.nan
+        noise_ceil[:] = np.nan
+        return evaluations, noise_ceil
+    train_set, test_set, ceil_set = sets_random(
+        sample,
+        pattern_descriptor=pattern_descriptor,
+        rdm_descriptor=rdm_descriptor,
+        n_pattern=n_pattern, n_rdm=n_rdm, n_cv=n_cv, rng=rng)
+    if n_rdm > 0 or n_pattern > 0:
+        nc = cv_noise_ceiling(
+            sample, ceil_set, test_set,
+            method=method,
+            pattern_descriptor=pattern_descriptor)
+    else:
+        nc = boot_noise_ceiling(
+            sample,
+            method=method,
+            rdm_descriptor=rdm_descriptor)
+    noise_ceil[:] = nc
+    for test_s in test_set:
+        test_s[1] = _concat_sampling(pattern_idx, test_s[1])
+    for train_s in train_set:
+        train_s[1] = _concat_sampling(pattern_idx, train_s[1])
+    cv_result = crossval(
+        models, sample,
+        train_set, test_set,
+        method=method, fitter=fitter,
+        pattern_descriptor=pattern_descriptor,
+        calc_noise_ceil=False)
+    evaluations[:] = cv_result.evaluations[0]
+    return evaluations, noise_ceil
+
+
+def _run_bootstrap_samples(sample_func, args, N, seed=None, n_jobs=1,
+                           checkpoint=None):
+    """ runs N bootstrap samples of sample_func, optionally in parallel and
+    stored in a checkpoint directory
+
+    Sample i gets the random generator spawned as child i of
+    SeedSequence(seed), such that the results depend only on seed.
+    The global numpy random state, which the fitters use, is seeded
+    from the same sequence while the sample runs and restored afterwards.
+
+    A checkpoint directory stores the seed and a hash of sample_func, args
+    and N. Resuming with different arguments raises a ValueError.
+
+    Args:
+        sample_func(function): evaluates one sample, called as
+            sample_func(*args, rng=rng)
+        args(tuple): arguments for sample_func
+        N(int): number of samples
+        seed(int): seed for the samples, drawn from the global numpy
+            random state if None
+        n_jobs(int): number of processes
+        checkpoint(String): directory for completed samples
+
+    Returns:
+        list: results of sample_func for each sample
+
+    """
+    samples = [None] * N
+    if checkpoint is not None:
+        os.makedirs(checkpoint, exist_ok=True)
+        seed_file = os.path.join(checkpoint, 'seed.txt')
+        hash_file = os.path.join(checkpoint, 'arguments.txt')
+        arg_hash = _hash_arguments(sample_func.__name__, args, N)
+        if os.path.isfile(hash_file):
+            with open(hash_file, 'r', encoding='utf-8') as f:
+                stored_hash = f.read().strip()
+        elif os.path.isfile(seed_file):
+            stored_hash = None
+        else:
+            stored_hash = arg_hash
+            with open(hash_file, 'w', encoding='utf-8') as f:
+                f.write(arg_hash)
+        if stored_hash != arg_hash:
+            raise ValueError(
+                'checkpoint ' + checkpoint + ' was created with different'
+                ' models, data or settings')
+        if os.path.isfile(seed_file):
+            with open(seed_file, 'r', encoding='utf-8') as f:
+                stored_seed = int(f.read())
+            if seed is not None and seed != stored_seed:
+                raise ValueError(
+                    'checkpoint was created with seed %d' % stored_seed)
+            seed = stored_seed
+        for i_sample in range(N):
+            sample_file = _checkpoint_file(checkpoint, i_sample)
+            if os.path.isfile(sample_file):
+                with np.load(sample_file) as stored:
+                    samples[i_sample] = tuple(
+                        stored['arr_%d' % i] for i in range(len(stored.files)))
+    if seed is None:
+        seed = int(np.random.randint(2 ** 31 - 1))
+    if checkpoint is not None and not os.path.isfile(seed_file):
+        with open(seed_file, 'w', encoding='utf-8') as f:
+            f.write(str(seed))
+    seed_seqs = np.random.SeedSequence(seed).spawn(N)
+    todo = [i for i in range(N) if samples[i] is None]
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_run_bootstrap_sample)(
+            sample_func, args, seed_seqs[i_sample], i_sample, checkpoint)
+        for i_sample in tqdm.tqdm(todo))
+    for i_sample, result in zip(todo, results):
+        samples[i_sample] = result
+    return samples
+
+
+def _run_bootstrap_sample(sample_func, args, seed_seq, i_sample, checkpoint):
+    """ runs one sample for _run_bootstrap_samples and stores it """
+    state = np.random.get_state()
+    try:
+        np.random.seed(seed_seq.generate_state(1))
+        result = sample_func(*args, rng=np.random.default_rng(seed_seq))
+    finally:
+        np.random.set_state(state)
+    if checkpoint is not None:
+        sample_file = _checkpoint_file(checkpoint, i_sample)
+        tmp_file = sample_file[:-4] + '.tmp.npz'
+        np.savez(tmp_file, *result)
+        os.replace(tmp_file, sample_file)
+    return result
+
+
+def _checkpoint_file(checkpoint, i_sample):
+    return os.path.join(checkpoint, 'sample_%06d.npz' % i_sample)
+
+
+def _hash_arguments(*args):
+    """ sha256 of the arguments of a bootstrap run for its checkpoint
+
+    Arrays are hashed by content, functions by name and bytecode and other
+    objects (models, RDMs) by their attributes.
+    """
+    sha = hashlib.sha256()
+    _update_hash(sha, args)
+    return sha.hexdigest()
+
+
+def _update_hash(sha, obj):
+    sha.update(type(obj).__qualname__.encode())
+    if isinstance(obj, np.ndarray):
+        sha.update(str((obj.dtype, obj.shape)).encode())
+        if obj.dtype == object:
+            _update_hash(sha, obj.tolist())
+        else:
+            sha.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        sha.update(str(len(obj)).encode())
+        for item in obj:
+            _update_hash(sha, item)
+    elif isinstance(obj, dict):
+        sha.update(str(len(obj)).encode())
+        for key in sorted(obj, key=repr):
+            _update_hash(sha, key)
+            _update_hash(sha, obj[key])
+    elif hasattr(obj, '__code__'):
+        sha.update((obj.__module__ + '.' + obj.__qualname__).encode())
+        _update_hash(sha, obj.__code__)
+        _update_hash(sha, obj.__defaults__)
+    elif isinstance(obj, types.CodeType):
+        sha.update(obj.co_code)
+        _update_hash(sha, obj.co_consts)
+    elif hasattr(obj, '__dict__'):
+        _update_hash(sha, vars(obj))
+    else:
+        sha.update(repr(obj).encode())
+
+
 def _concat_sampling(sample1, sample2):
     """ computes an index vector for the sequential sampling with sample1
     and sample2
@@ -770,13 +1125,13 @@ def _concat_sampling(sample1, sample2):
 def _internal_cv(models, sample,
                  pattern_descriptor, rdm_descriptor, pattern_idx,
                  k_pattern, k_rdm,
-                 method, fitter):
+                 method, fitter, rng=None):
     """ runs a crossvalidation for use in bootstrap"""
     train_set, test_set, ceil_set = sets_k_fold(
         sample,
         pattern_descriptor=pattern_descriptor,
         rdm_descriptor=rdm_descriptor,
-        k_pattern=k_pattern, k_rdm=k_rdm, random=True)
+        k_pattern=k_pattern, k_rdm=k_rdm, random=True, rng=rng)
     if k_rdm > 1 or k_pattern > 1:
         nc = cv_noise_ceiling(
             sample, ceil_set, test_set,
@@ -0,0 +1,264 @@
+"""Reading AFNI BRIK/HEAD datasets without AFNI
+
+The HEAD file is a plain text list of attributes. The BRIK file holds the
+sub-bricks one after the other, each a Fortran ordered volume. This module
+parses the attributes and memory-maps the BRIK file, such that single
+sub-bricks are accessed without reading the whole dataset.
+
+write_dataset writes float sub-bricks back out, copying the grid of an
+existing dataset.
+
+## Usage
+```
+dset = AfniDataset('stats.958+tlrc')
+coefs = dset.get_coefs(['FBM.Mean60.r1', 'FBN.Mean60.r1'])
+write_dataset('mean.958+tlrc', [coefs['FBM.Mean60.r1']], ['FBM'],
+              header=dset.header)
+```
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple, Union
+import gzip
+import os
+import re
+import sys
+import uuid
+import numpy as np
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+
+BRICK_DTYPES = {
+    0: np.uint8,
+    1: np.int16,
+    2: np.int32,
+    3: np.float32,
+    4: np.float64,
+    5: np.complex64,
+}
+
+# attributes describing the sub-bricks or time axis of a dataset, which are
+# not copied from the template header by write_dataset
+_PER_BRICK = ('BRICK_', 'TAXIS_', 'IDCODE_', 'DATASET_RANK')
+
+# AFNI statistic code of a t-statistic, for BRICK_STATAUX
+FUNC_TT_TYPE = 3
+
+_ATTRIBUTE = re.compile(
+    r'type\s*=\s*(\S+)\s*\n\s*name\s*=\s*(\S+)\s*\n\s*count\s*=\s*(\d+)\s*\n')
+
+
+def read_head(filename: str) -> Dict[str, Union[str, NDArray]]:
+    """Parses the attributes of an AFNI HEAD file
+
+    Args:
+        filename (str): path to the HEAD file
+
+    Returns:
+        dict: attribute name to value. String attributes are returned as
+            str with the trailing '~' removed, numeric attributes as
+            numpy arrays
+    """
+    with open(filename, 'r', encoding='latin-1') as head_file:
+        text = head_file.read()
+    matches = list(_ATTRIBUTE.finditer(text))
+    attributes = {}
+    for i_match, match in enumerate(matches):
+        attr_type, name, count = match.group(1), match.group(2), int(match.group(3))
+        end = matches[i_match + 1].start() if i_match + 1 < len(matches) else len(text)
+        body = text[match.end():end]
+        if attr_type == 'string-attribute':
+            body = body[body.index("'") + 1:]
+            attributes[name] = body[:count].rstrip('\n').rstrip('~')
+        elif attr_type == 'integer-attribute':
+            attributes[name] = np.array(body.split()[:count], dtype=int)
+        else:
+            attributes[name] = np.array(body.split()[:count], dtype=float)
+    return attributes
+
+
+def write_head(filename: str, attributes: Dict[str, Union[str, NDArray]]):
+    """Writes attributes in the AFNI HEAD format, the inverse of read_head
+
+    Args:
+        filename (str): path to the HEAD file
+        attributes (dict): attribute name to str (written as a
+            string-attribute) or array of integers or floats
+    """
+    with open(filename, 'w', encoding='latin-1') as head_file:
+        for name, value in attributes.items():
+            if isinstance(value, str):
+                value += '~'
+                head_file.write(
+                    "\ntype = string-attribute\nname = %s\ncount = %d\n'%s\n"
+                    % (name, len(value), value))
+                continue
+            value = np.asarray(value).ravel()
+            if np.issubdtype(value.dtype, np.integer):
+                attr_type, text = 'integer-attribute', [str(int(v)) for v in value]
+            else:
+                attr_type, text = 'float-attribute', ['%.9g' % v for v in value]
+            head_file.write('\ntype = %s\nname = %s\ncount = %d\n' % (
+                attr_type, name, len(value)))
+            for start in range(0, len(text), 5):
+                head_file.write(' ' + ' '.join(text[start:start + 5]) + '\n')
+
+
+def write_dataset(prefix: str, bricks: Sequence[NDArray], labels: List[str],
+                  header: Optional[Dict[str, Union[str, NDArray]]] = None,
+                  stataux: Optional[List[Tuple[int, int, List[float]]]] = None):
+    """Writes (x, y, z) volumes as float32 sub-bricks of an AFNI dataset
+
+    Args:
+        prefix (str): dataset prefix including the view, e.g. 'glt.958+tlrc'
+        bricks (list): (x, y, z) arrays, all of the same shape
+        labels (list): one sub-brick label per brick
+        header (dict): attributes of a dataset on the same grid (e.g.
+            AfniDataset.header); its geometry is copied, while sub-brick
+            and time axis attributes are replaced
+        stataux (list): (brick index, statistic code, parameters) for
+            statistic sub-bricks, e.g. (1, FUNC_TT_TYPE, [dof]) for a t map
+    """
+    for suffix in ('.HEAD', '.BRIK'):
+        if prefix.endswith(suffix):
+            prefix = prefix[:-len(suffix)]
+    bricks = [np.asarray(brick, dtype=np.float32) for brick in bricks]
+    if len(labels) != len(bricks):
+        raise ValueError('Need one label per sub-brick')
+    attributes = {}
+    if header is not None:
+        attributes = {name: value for name, value in header.items()
+                      if not name.startswith(_PER_BRICK)}
+    attributes['DATASET_RANK'] = np.array([3, len(bricks), 0, 0, 0, 0, 0, 0])
+    attributes.setdefault('DATASET_DIMENSIONS',
+                          np.array(list(bricks[0].shape) + [0, 0]))
+    attributes['IDCODE_STRING'] = 'RSA_' + uuid.uuid4().hex[:22].upper()
+    attributes['BRICK_TYPES'] = np.full(len(bricks), 3)
+    attributes['BRICK_FLOAT_FACS'] = np.zeros(len(bricks))
+    attributes['BRICK_STATS'] = np.array(
+        [[brick.min(), brick.max()] if brick.size else [0, 0] for brick in bricks],
+        dtype=float)
+    attributes['BRICK_LABS'] = '~'.join(labels)
+    if stataux:
+        attributes['BRICK_STATAUX'] = np.array(
+            [v for i_brick, code, params in stataux
+             for v in (i_brick, code, len(params), *params)], dtype=float)
+    attributes['BYTEORDER_STRING'] = (
+        'LSB_FIRST' if sys.byteorder == 'little' else 'MSB_FIRST')
+    write_head(prefix + '.HEAD', attributes)
+    with open(prefix + '.BRIK', 'wb') as brik_file:
+        for brick in bricks:
+            brik_file.write(brick.tobytes(order='F'))
+
+
+class AfniDataset:
+    """An AFNI dataset with memory-mapped access to its sub-bricks
+
+    Sub-bricks are returned as views into the memory-mapped BRIK file,
+    unless they have a scaling factor, in which case the scaled values
+    are computed, or the BRIK is gzip compressed, in which case the whole
+    file is read once.
+
+    Attributes:
+        header (dict): the parsed HEAD attributes
+        labels (list): sub-brick labels from BRICK_LABS
+        shape (tuple): number of voxels along x, y and z
+        n_bricks (int): number of sub-bricks
+    """
+
+    def __init__(self, prefix: str):
+        for suffix in ('.HEAD', '.BRIK', '.BRIK.gz'):
+            if prefix.endswith(suffix):
+                prefix = prefix[:-len(suffix)]
+        self.prefix = prefix
+        self.header = read_head(prefix + '.HEAD')
+        self.shape = tuple(int(d) for d in self.header['DATASET_DIMENSIONS'][:3])
+        self.n_bricks = int(self.header['DATASET_RANK'][1])
+        self.brick_types = self.header.get(
+            'BRICK_TYPES', np.full(self.n_bricks, 3))
+        self.scale_factors = self.header.get(
+            'BRICK_FLOAT_FACS', np.zeros(self.n_bricks))
+        labels = self.header.get('BRICK_LABS', '')
+        self.labels = labels.split('~') if labels else []
+        self.labels += [''] * (self.n_bricks - len(self.labels))
+        self.label_index = {}
+        for i_brick, label in enumerate(self.labels):
+            self.label_index.setdefault(label, i_brick)
+        byteorder = self.header.get('BYTEORDER_STRING', 'LSB_FIRST')
+        self.byteorder = '>' if byteorder == 'MSB_FIRST' else '<'
+        self._brik = None
+
+    @property
+    def affine(self) -> Optional[NDArray]:
+        """voxel to DICOM (RAI) coordinate transform, if stored"""
+        ijk_to_xyz = self.header.get('IJK_TO_DICOM_REAL')
+        if ijk_to_xyz is None:
+            return None
+        return np.vstack([ijk_to_xyz.reshape(3, 4), [0, 0, 0, 1]])
+
+    def _brick_dtype(self, i_brick: int) -> np.dtype:
+        return np.dtype(
+            BRICK_DTYPES[int(self.brick_types[i_brick])]).newbyteorder(
+                self.byteorder)
+
+    def _open_brik(self) -> np.ndarray:
+        """memory-maps (or reads, if compressed) the BRIK file as bytes"""
+        if self._brik is None:
+            if os.path.isfile(self.prefix + '.BRIK'):
+                self._brik = np.memmap(
+                    self.prefix + '.BRIK', dtype=np.uint8, mode='r')
+            elif os.path.isfile(self.prefix + '.BRIK.gz'):
+                with gzip.open(self.prefix + '.BRIK.gz', 'rb') as brik_file:
+                    self._brik = np.frombuffer(brik_file.read(), np.uint8)
+            else:
+                raise FileNotFoundError(
+                    'No BRIK file found for ' + self.prefix)
+        return self._brik
+
+    def index(self, label: Union[str, int]) -> int:
+        """sub-brick index of a label (integers are passed through)"""
+        if isinstance(label, (int, np.integer)):
+            return int(label)
+        return self.label_index[label]
+
+    def get_subbrick(self, label: Union[str, int]) -> NDArray:
+        """Returns one sub-brick as a (x, y, z) array
+
+        Args:
+            label (str or int): sub-brick label or index
+
+        Returns:
+            numpy.ndarray: read-only view into the BRIK file, or the
+                scaled values if the sub-brick has a scaling factor
+        """
+        i_brick = self.index(label)
+        n_voxel = int(np.prod(self.shape))
+        offset = 0
+        for i_previous in range(i_brick):
+            offset += self._brick_dtype(i_previous).itemsize * n_voxel
+        dtype = self._brick_dtype(i_brick)
+        brik = self._open_brik()
+        data = brik[offset:offset + dtype.itemsize * n_voxel].view(dtype)
+        data = data.reshape(self.shape, order='F')
+        factor = self.scale_factors[i_brick]
+        if factor not in (0, 1):
+            return data * np.float32(factor)
+        return data
+
+    def get_subbricks(self, labels: List[Union[str, int]]) -> List[NDArray]:
+        """Returns several sub-bricks, see get_subbrick"""
+        return [self.get_subbrick(label) for label in labels]
+
+    def get_coefs(self, conditions: List[str]) -> Dict[str, NDArray]:
+        """Returns the '#0_Coef' sub-bricks of the conditions present
+
+        Args:
+            conditions (list): regressor labels, e.g. 'FBM.Mean60.r1'
+
+        Returns:
+            dict: condition to (x, y, z) beta volume, only for the
+                conditions which have a coefficient in this dataset
+        """
+        return {
+            cond: self.get_subbrick(cond + '#0_Coef')
+            for cond in conditions if cond + '#0_Coef' in self.label_index}
@@ -2,7 +2,7 @@
 saving to and reading from HDF5 files
 """
 from __future__ import annotations
-from typing import Union, Dict, List, IO
+from typing import Union, Dict, List, IO, Optional
 import os
 from collections.abc import Iterable
 try:  # drop:py37 (backport)
@@ -13,24 +13,41 @@ from h5py import File, Group, Empty
 import numpy as np
 
 
-def write_dict_hdf5(fhandle: Union[str, IO], dictionary: Dict) -> None:
+def write_dict_hdf5(fhandle: Union[str, IO], dictionary: Dict,
+                    group: Optional[str] = None,
+                    compression: Optional[str] = None) -> None:
     """ writes a nested dictionary containing strings & arrays as data into
     a hdf5 file
 
     Args:
         file: a filename or opened writable file
         dictionary(dict): the dict to be saved
+        group(str): path of a group to write into, such that several
+            dictionaries can be stored in one file. The file may exist
+            already in this case, the group may not.
+        compression(str): h5py compression filter (e.g. 'gzip') for the
+            numeric arrays, which are then stored in chunks
 
     """
     if isinstance(fhandle, str):
-        if os.path.exists(fhandle):
+        if group is None and os.path.exists(fhandle):
             raise ValueError('File already exists!')
     file = File(fhandle, 'a')
-    file.attrs['rsatoolbox_version'] = version('rsatoolbox')
-    _write_to_group(file, dictionary)
-
-
-def _write_to_group(group: Group, dictionary: Dict) -> None:
+    if group is None:
+        file.attrs['rsatoolbox_version'] = version('rsatoolbox')
+        _write_to_group(file, dictionary, compression)
+    else:
+        if group in file:
+            file.close()
+            raise ValueError('Group already exists!')
+        target = file.create_group(group)
+        target.attrs['rsatoolbox_version'] = version('rsatoolbox')
+        _write_to_group(target, dictionary, compression)
+    file.close()
+
+
+def _write_to_group(group: Group, dictionary: Dict,
+                    compression: Optional[str] = None) -> None:
     """ writes a dictionary to a hdf5 group, which can recurse"""
     for key in dictionary.keys():
         value = dictionary[key]
@@ -41,13 +58,16 @@ def _write_to_group(group: Group, dictionary: Dict) -> None:
         elif isinstance(value, np.ndarray):
             if str(value.dtype)[:2] == '<U':
                 group[key] = value.astype('S')
+            elif compression is not None and value.size > 1:
+                group.create_dataset(key, data=value, chunks=True,
+                                     compression=compression)
             else:
                 group[key] = value
         elif isinstance(value, list):
             _write_list(group, key, value)
         elif isinstance(value, dict):
             subgroup = group.create_group(key)
-            _write_to_group(subgroup, value)
+            _write_to_group(subgroup, value, compression)
         elif value is None:
             group[key] = Empty("f")
         elif isinstance(value, Iterable):
@@ -82,19 +102,24 @@ def _write_list(group: Group, key: str, value: List) -> None:
             l_group[str(i)] = v
 
 
-def read_dict_hdf5(fhandle: Union[str, IO]) -> Dict:
+def read_dict_hdf5(fhandle: Union[str, IO],
+                   group: Optional[str] = None) -> Dict:
     """ writes a nested dictionary containing strings & arrays as data into
     a hdf5 file
 
     Args:
         file: a filename or opened readable file
+        group(str): path of the group to read, when the file holds
+            several dictionaries. Only this group is read from disk.
 
     Returns:
         dictionary(dict): the loaded dict
 
     """
     file = File(fhandle, 'r')
-    return _read_group(file)
+    if group is None:
+        return _read_group(file)
+    return _read_group(file[group])
 
 
 def _read_group(group: Group) -> Dict:
@@ -18,6 +18,8 @@ from .calc import calc_rdm_crossnobis
 from .calc import calc_rdm_correlation
 from .calc_unbalanced import calc_rdm_unbalanced
 from .compare import compare
+from .compare import prepare_rdms
+from .compare import PreparedRDMs
 from .compare import compare_correlation
 from .compare import compare_cosine
 from .compare import compare_kendall_tau
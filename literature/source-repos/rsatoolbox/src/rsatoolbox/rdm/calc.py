@@ -9,15 +9,17 @@ from collections.abc import Iterable
 from copy import deepcopy
 from typing import TYPE_CHECKING, Optional, Tuple, List, Union
 import numpy as np
-from rsatoolbox.rdm.rdms import concat
+from scipy.linalg import cho_factor, cho_solve
+from rsatoolbox.rdm.rdms import concat, RDMs
 from rsatoolbox.rdm.calc_unbalanced import calc_rdm_unbalanced
 from rsatoolbox.rdm.combine import from_partials
-from rsatoolbox.data import average_dataset_by
+from rsatoolbox.data import average_dataset_by, Dataset, TemporalDataset
+from rsatoolbox.data.computations import bin_time_axis
+from rsatoolbox.util.descriptor_utils import subset_descriptor
 from rsatoolbox.util.rdm_utils import _extract_triu_
-from rsatoolbox.util.build_rdm import _build_rdms
+from rsatoolbox.util.build_rdm import _build_rdms, _build_rdms_stacked
 
 if TYPE_CHECKING:
-    from rsatoolbox.rdm.rdms import RDMs
     from rsatoolbox.data.base import DatasetBase
     from numpy.typing import NDArray
 
@@ -57,14 +59,23 @@ def calc_rdm(
     Returns:
         rsatoolbox.rdm.rdms.RDMs: RDMs object with the one RDM
 
+    If a list of datasets is passed, the result holds one RDM per dataset.
+    When all datasets have the same shape, descriptor values and descriptor
+    names, their measurements are stacked and all RDMs are computed
+    together (see _calc_rdm_stacked); otherwise they are computed one by
+    one and merged.
+
     """
     if isinstance(dataset, Iterable):
+        datasets = list(dataset)
+        noises = [noise[i_dat] if isinstance(noise, Iterable) else noise
+                  for i_dat in range(len(datasets))]
+        if _can_stack(datasets, method, descriptor, noises, cv_descriptor):
+            return _calc_rdm_stacked(datasets, method, descriptor, noises,
+                                     cv_descriptor, prior_lambda,
+                                     prior_weight, remove_mean)
         rdms: List[RDMs] = []
-        for i_dat, ds_i in enumerate(dataset):
-            if isinstance(noise, Iterable):
-                noise_i = noise[i_dat]
-            else:
-                noise_i = noise
+        for ds_i, noise_i in zip(datasets, noises):
             rdms.append(_calc_rdm_single(ds_i, method, descriptor, noise_i,
                                          cv_descriptor, prior_lambda,
                                          prior_weight, remove_mean))
@@ -114,6 +125,147 @@ def _calc_rdm_single(
     return rdm
 
 
+def _can_stack(datasets, method, descriptor, noises, cv_descriptor) -> bool:
+    """whether _calc_rdm_stacked can compute the RDMs of these datasets"""
+    if len(datasets) < 2 or descriptor is None or method == 'poisson_cv':
+        return False
+    first = datasets[0]
+    if not all(isinstance(ds, Dataset) and ds.measurements.ndim == 2
+               for ds in datasets):
+        return False
+    n_channel = first.n_channel
+    if any(noise is not None for noise in noises) and not all(
+            isinstance(noise, np.ndarray)
+            and noise.shape == (n_channel, n_channel) for noise in noises):
+        return False
+    desc = np.asarray(first.obs_descriptors[descriptor])
+    cv_desc = None
+    if method == 'crossnobis' and cv_descriptor is not None:
+        cv_desc = np.asarray(first.obs_descriptors[cv_descriptor])
+    for ds in datasets[1:]:
+        if ds.measurements.shape != first.measurements.shape \
+                or ds.descriptors.keys() != first.descriptors.keys() \
+                or not np.array_equal(ds.obs_descriptors[descriptor], desc):
+            return False
+        if cv_desc is not None and not np.array_equal(
+                ds.obs_descriptors[cv_descriptor], cv_desc):
+            return False
+    return True
+
+
+def _calc_rdm_stacked(
+        datasets: List[Dataset],
+        method: str,
+        descriptor: str,
+        noises: List[Optional[NDArray]],
+        cv_descriptor: Optional[str],
+        prior_lambda: float,
+        prior_weight: float,
+        remove_mean: bool) -> RDMs:
+    """RDMs of datasets with equal shapes and descriptor values
+
+    The measurements are stacked into one n_dataset x n_obs x n_channel
+    array and the RDMs of all datasets are computed together by
+    _calc_utvs_batched. The result equals merging the _calc_rdm_single
+    results with from_partials.
+    """
+    measurements = np.stack([ds.measurements for ds in datasets])
+    n_channel = measurements.shape[-1]
+    noise = None if noises[0] is None else np.stack(noises)
+    cv_desc = None
+    if method == 'crossnobis':
+        if cv_descriptor is None:
+            cv_desc = _gen_default_cv_descriptor(datasets[0], descriptor)
+            cv_descriptor = 'cv_desc'
+        else:
+            cv_desc = datasets[0].obs_descriptors[cv_descriptor]
+        if noise is None:
+            noises = [np.eye(n_channel)] * len(datasets)
+    utvs, conds, measure = _calc_utvs_batched(
+        measurements, method, datasets[0].obs_descriptors[descriptor], noise,
+        cv_desc, prior_lambda, prior_weight, remove_mean)
+    if measure not in ('squared mahalanobis', 'crossnobis'):
+        noises = None
+    return _build_rdms_stacked(
+        utvs, datasets, measure, descriptor, conds,
+        cv=cv_descriptor if method == 'crossnobis' else None, noises=noises)
+
+
+def _calc_utvs_batched(measurements, method, desc, noise, cv_desc,
+                       prior_lambda, prior_weight, remove_mean):
+    """ RDM vectors for a batch of measurements with the same observations
+
+    The observations are averaged per condition with one matrix product
+    and the kernels of the whole batch are computed with one einsum.
+
+    Args:
+        measurements (numpy.ndarray): n_batch x n_obs x n_channel
+        method (String): as in calc_rdm, except poisson_cv
+        desc (array-like): condition of each observation, or None for
+            one pattern per observation (not for crossnobis)
+        noise (numpy.ndarray): None, one n_channel x n_channel precision
+            or n_batch x n_channel x n_channel precisions
+        cv_desc (array-like): crossvalidation fold of each observation,
+            used by crossnobis
+
+    Returns:
+        numpy.ndarray: utvs, n_batch x n_cond * (n_cond - 1) / 2
+        numpy.ndarray: the conditions (sorted), None if desc is None
+        String: the dissimilarity measure
+    """
+    n_channel = measurements.shape[-1]
+    if method == 'crossnobis':
+        fold_means, train_means, conds = _calc_fold_means(
+            measurements, desc, cv_desc)
+        if remove_mean:
+            fold_means -= fold_means.mean(axis=-1, keepdims=True)
+            train_means -= train_means.mean(axis=-1, keepdims=True)
+        if noise is not None:
+            # one precision per batch entry applies to all its folds
+            train_means = train_means @ (
+                noise[:, None] if noise.ndim == 3 else noise)
+        kernels = np.einsum('...cq,...dq->...cd', train_means, fold_means)
+        rdms = _kernels_to_rdms(kernels, n_channel)
+        return rdms.sum(axis=-2) / rdms.shape[-2], conds, 'crossnobis'
+    if desc is None:
+        conds, ma = None, measurements
+        n_cond = measurements.shape[-2]
+    else:
+        conds, i_cond = np.unique(np.asarray(desc), return_inverse=True)
+        indicator = np.zeros((len(conds), len(i_cond)))
+        indicator[i_cond.ravel(), np.arange(len(i_cond))] = 1
+        indicator /= indicator.sum(axis=1, keepdims=True)
+        ma = indicator @ measurements
+        n_cond = len(conds)
+    if (remove_mean and method != 'poisson') or method == 'correlation':
+        ma = ma - ma.mean(axis=-1, keepdims=True)
+    if method == 'mahalanobis' and noise is None:
+        method = 'euclidean'
+    if method == 'euclidean':
+        kernels = np.einsum('dcp,dep->dce', ma, ma)
+        measure = 'squared euclidean'
+    elif method == 'mahalanobis':
+        kernels = np.einsum('dcq,deq->dce', ma @ noise, ma)
+        measure = 'squared mahalanobis'
+    elif method == 'correlation':
+        ma /= np.sqrt(np.einsum('dcp,dcp->dc', ma, ma))[..., None]
+        kernels = 1 - np.einsum('dcp,dep->dce', ma, ma)
+        measure = 'correlation'
+    elif method == 'poisson':
+        ma = (ma + prior_lambda * prior_weight) / (1 + prior_weight)
+        kernels = np.einsum('dcp,dep->dce', ma, np.log(ma))
+        measure = 'poisson'
+    else:
+        raise NotImplementedError
+    i_row, i_col = np.triu_indices(n_cond, k=1)
+    if method == 'correlation':
+        return kernels[:, i_row, i_col], conds, measure
+    diag = np.einsum('dcc->dc', kernels)
+    utvs = (diag[:, i_row] + diag[:, i_col] - kernels[:, i_row, i_col]
+            - kernels[:, i_col, i_row]) / n_channel
+    return utvs, conds, measure
+
+
 def calc_rdm_movie(
         dataset, method='euclidean', descriptor=None, noise=None,
         cv_descriptor=None, prior_lambda=1, prior_weight=0.1,
@@ -142,6 +294,10 @@ def calc_rdm_movie(
 
     Returns:
         rsatoolbox.rdm.rdms.RDMs: RDMs object with RDM movie
+
+    Unless unbalanced is set or the method is poisson_cv or a list of
+    noises is passed, the RDMs of all time points are computed at once
+    (see _calc_rdm_movie_vectorized).
     """
 
     if isinstance(dataset, Iterable):
@@ -162,6 +318,11 @@ def calc_rdm_movie(
                     descriptor=descriptor,
                     noise=noise[i_dat]))
         rdm = concat(rdms)
+    elif not unbalanced and _can_vectorize_movie(
+            dataset, method, noise, time_descriptor, bins):
+        rdm = _calc_rdm_movie_vectorized(
+            dataset, method, descriptor, noise, cv_descriptor, prior_lambda,
+            prior_weight, time_descriptor, bins)
     else:
         if bins is not None:
             binned_data = dataset.bin_time(time_descriptor, bins)
@@ -195,6 +356,75 @@ def calc_rdm_movie(
     return rdm
 
 
+def _can_vectorize_movie(dataset, method, noise, time_descriptor,
+                         bins) -> bool:
+    """whether _calc_rdm_movie_vectorized can compute this RDM movie"""
+    if method not in ('euclidean', 'correlation', 'mahalanobis',
+                      'crossnobis', 'poisson'):
+        return False
+    if noise is not None and not (
+            isinstance(noise, np.ndarray) and noise.ndim == 2):
+        return False
+    if not isinstance(dataset, TemporalDataset):
+        return False
+    time = np.asarray(dataset.time_descriptors[time_descriptor])
+    if bins is not None:
+        time = np.array([np.mean(time[np.isin(time, b)]) for b in bins])
+    # split_time pools repeated time points into one RDM
+    return len(time) > 1 and len(np.unique(time)) == len(time)
+
+
+def _calc_rdm_movie_vectorized(
+        dataset, method, descriptor, noise, cv_descriptor, prior_lambda,
+        prior_weight, time_descriptor, bins):
+    """ RDM movie with all time points computed at once
+
+    The measurements are binned along time with one cumulative sum, and
+    time becomes the batch axis of _calc_utvs_batched: the conditions are
+    averaged once and all time points' RDMs come from one einsum. The
+    descriptors are those calc_rdm gives the first time point, so the
+    result equals concatenating the RDMs of the single time points.
+    """
+    time = dataset.time_descriptors[time_descriptor]
+    measurements = dataset.measurements
+    if bins is not None:
+        measurements, time = bin_time_axis(measurements, time, bins)
+        first = dataset.bin_time(time_descriptor, bins[:1])
+    else:
+        first = TemporalDataset(
+            measurements=measurements[:, :, :1],
+            descriptors=dataset.descriptors,
+            obs_descriptors=dataset.obs_descriptors,
+            channel_descriptors=dataset.channel_descriptors,
+            time_descriptors=subset_descriptor(dataset.time_descriptors, [0]),
+            check_dims=False)
+    template = calc_rdm(
+        first.time_as_observations(time_descriptor), method=method,
+        descriptor=descriptor, noise=noise, cv_descriptor=cv_descriptor,
+        prior_lambda=prior_lambda, prior_weight=prior_weight)
+    desc = None if descriptor is None \
+        else dataset.obs_descriptors[descriptor]
+    cv_desc = None
+    if method == 'crossnobis':
+        cv_desc = _gen_default_cv_descriptor(dataset, descriptor) \
+            if cv_descriptor is None \
+            else dataset.obs_descriptors[cv_descriptor]
+    utvs, _, _ = _calc_utvs_batched(
+        np.moveaxis(measurements, -1, 0), method, desc, noise, cv_desc,
+        prior_lambda, prior_weight, False)
+    rdm_descriptors = {
+        name: [values[0]] * len(time)
+        for name, values in template.rdm_descriptors.items()
+        if name != 'index'}
+    rdm_descriptors[time_descriptor] = time
+    return RDMs(
+        dissimilarities=utvs,
+        dissimilarity_measure=template.dissimilarity_measure,
+        descriptors=template.descriptors,
+        rdm_descriptors=rdm_descriptors,
+        pattern_descriptors=template.pattern_descriptors)
+
+
 def calc_rdm_euclidean(
         dataset: DatasetBase,
         descriptor: Optional[str] = None,
@@ -299,13 +529,18 @@ def calc_rdm_crossnobis(dataset, descriptor, noise=None,
     not, this function infers a split in order of the dataset, which is
     guaranteed to fail if there are any unbalances.
 
-    This function also accepts a list of noise precision matricies.
+    This function also accepts a list of noise precision matricies, or an
+    n_fold x n_channel x n_channel array of them.
     It is then assumed that this is the precision of the mean from
     the corresponding crossvalidation fold, i.e. if multiple measurements
     enter a fold, please compute the resulting noise precision in advance!
+    Each pair of folds is compared under the precision of their average
+    noise covariance; these are applied through Cholesky solves rather
+    than explicit inverses.
 
-    To assert equal ordering in the folds the dataset is initially sorted
-    according to the descriptor used to define the patterns.
+    The patterns are ordered by the sorted values of the descriptor. The
+    means of all folds are computed in one pass and every training mean
+    is derived from the condition totals, so the dataset is not copied.
 
     Args:
         dataset (rsatoolbox.data.dataset.DatasetBase):
@@ -328,62 +563,36 @@ def calc_rdm_crossnobis(dataset, descriptor, noise=None,
 
     """
     noise = _check_noise(noise, dataset.n_channel)
+    identity_noise = noise is None
     if noise is None:
         noise = np.eye(dataset.n_channel)
     if descriptor is None:
         raise ValueError('descriptor must be a string! Crossvalidation' +
                          'requires multiple measurements to be grouped')
-    datasetCopy = deepcopy(dataset)
     if cv_descriptor is None:
-        cv_desc = _gen_default_cv_descriptor(datasetCopy, descriptor)
-        datasetCopy.obs_descriptors['cv_desc'] = cv_desc
+        cv_desc = _gen_default_cv_descriptor(dataset, descriptor)
         cv_descriptor = 'cv_desc'
-    datasetCopy.sort_by(descriptor)
-    cv_folds = np.unique(np.array(datasetCopy.obs_descriptors[cv_descriptor]))
-    rdms = []
-    if (noise is None) or (isinstance(noise, np.ndarray) and noise.ndim == 2):
-        for i_fold, fold in enumerate(cv_folds):
-            data_test = datasetCopy.subset_obs(cv_descriptor, fold)
-            data_train = datasetCopy.subset_obs(
-                cv_descriptor,
-                np.setdiff1d(cv_folds, fold)
-            )
-            measurements_train, _, _ = \
-                average_dataset_by(data_train, descriptor)
-            measurements_test, _, _ = \
-                average_dataset_by(data_test, descriptor)
-            if remove_mean:
-                measurements_train -= measurements_train.mean(axis=1, keepdims=True)
-                measurements_test -= measurements_test.mean(axis=1, keepdims=True)
-            rdm = _calc_rdm_crossnobis_single(
-                measurements_train, measurements_test, noise)
-            rdms.append(rdm)
+    else:
+        cv_desc = dataset.obs_descriptors[cv_descriptor]
+    fold_means, train_means, desc = _calc_fold_means(
+        dataset.measurements, dataset.obs_descriptors[descriptor], cv_desc)
+    if remove_mean:
+        fold_means -= fold_means.mean(axis=-1, keepdims=True)
+        train_means -= train_means.mean(axis=-1, keepdims=True)
+    if isinstance(noise, np.ndarray) and noise.ndim == 2:
+        if not identity_noise:
+            train_means = train_means @ noise
+        kernels = np.einsum('fcq,fdq->fcd', train_means, fold_means)
+        rdms = _kernels_to_rdms(kernels, dataset.n_channel)
     else:  # a list of noises was provided
-        measurements = []
-        variances = []
-        for i, i_fold in enumerate(cv_folds):
-            data = datasetCopy.subset_obs(cv_descriptor, i_fold)
-            ma = average_dataset_by(data, descriptor)[0]
-            if remove_mean:
-                ma -= ma.mean(axis=1, keepdims=True)
-            measurements.append(ma)
-            variances.append(np.linalg.inv(noise[i]))
-        for i_fold in range(len(cv_folds)):
-            for j_fold in range(i_fold + 1, len(cv_folds)):
-                if i_fold != j_fold:
-                    rdm = _calc_rdm_crossnobis_single(
-                        measurements[i_fold], measurements[j_fold],
-                        np.linalg.inv(
-                            (variances[i_fold] + variances[j_fold]) / 2)
-                        )
-                    rdms.append(rdm)
-    rdms = np.array(rdms)
-    rdm = np.einsum('ij->j', rdms) / rdms.shape[0]
+        rdms = _calc_rdm_crossnobis_fold_noise(fold_means, noise)
+    rdm = rdms.sum(axis=-2) / rdms.shape[-2]
     return _build_rdms(
         rdm,
-        datasetCopy,
+        dataset,
         'crossnobis',
         descriptor,
+        desc,
         noise=noise,
         cv=cv_descriptor
     )
@@ -470,11 +679,82 @@ def calc_rdm_poisson_cv(dataset, descriptor=None, prior_lambda=1.0,
     return _build_rdms(rdm, dataset, 'poisson_cv', descriptor)
 
 
-def _calc_rdm_crossnobis_single(meas1, meas2, noise) -> NDArray:
-    kernel = meas1 @ noise @ meas2.T
-    rdm = np.expand_dims(np.diag(kernel), 0) + \
-        np.expand_dims(np.diag(kernel), 1) - kernel - kernel.T
-    return _extract_triu_(rdm) / meas1.shape[1]
+def _calc_rdm_crossnobis_fold_noise(fold_means, precisions) -> NDArray:
+    """ crossnobis rdms of all pairs of folds with fold specific noise
+
+    The pair (i, j) uses the precision of (cov_i + cov_j) / 2, with cov_i
+    the inverse of precisions[i]. As cov_i + cov_j equals
+    cov_i @ (P_i + P_j) @ cov_j, this precision is
+    2 * P_j @ inv(P_i + P_j) @ P_i, so per pair only P_i + P_j is
+    factorized and solved for the patterns of fold j and no precision or
+    covariance is inverted.
+
+    Args:
+        fold_means (numpy.ndarray): n_fold x n_cond x n_channel
+        precisions: n_fold x n_channel x n_channel array or list
+
+    Returns:
+        numpy.ndarray: n_pairs x n_cond * (n_cond - 1) / 2 rdms
+    """
+    n_fold, n_cond, n_channel = fold_means.shape
+    i_fold, j_fold = np.triu_indices(n_fold, k=1)
+    kernels = np.empty((len(i_fold), n_cond, n_cond))
+    for k, (i, j) in enumerate(zip(i_fold, j_fold)):
+        kernels[k] = 2 * (fold_means[i] @ precisions[j]) @ _solve_spd(
+            precisions[i] + precisions[j], precisions[i] @ fold_means[j].T)
+    return _kernels_to_rdms(kernels, n_channel)
+
+
+def _solve_spd(matrix, rhs) -> NDArray:
+    """solves matrix @ x = rhs by a Cholesky factorization, with a general
+    solver as fallback for matrices that are not positive definite"""
+    try:
+        return cho_solve(cho_factor(matrix), rhs)
+    except np.linalg.LinAlgError:
+        return np.linalg.solve(matrix, rhs)
+
+
+def _kernels_to_rdms(kernels, n_channel) -> NDArray:
+    """(... x folds x conditions x conditions) kernels between training and
+    test patterns to (... x folds x pairs) crossvalidated rdms"""
+    diag = np.einsum('...cc->...c', kernels)
+    rdms = diag[..., None, :] + diag[..., :, None] \
+        - kernels - np.swapaxes(kernels, -1, -2)
+    i_row, i_col = np.triu_indices(kernels.shape[-1], k=1)
+    return rdms[..., i_row, i_col] / n_channel
+
+
+def _calc_fold_means(measurements, desc, cv_desc):
+    """ average measurements per crossvalidation fold and condition
+
+    The sums over all observations of a condition are computed once, and
+    every leave-one-fold-out training mean is derived from them as
+    (total - fold) / (n_total - n_fold), which equals the average over all
+    observations outside the fold.
+
+    Args:
+        measurements (numpy.ndarray): (... x) n_obs x n_channel
+        desc (array-like): condition of each observation
+        cv_desc (array-like): crossvalidation fold of each observation
+
+    Returns:
+        numpy.ndarray: fold_means, (... x) n_fold x n_cond x n_channel
+        numpy.ndarray: train_means, (... x) n_fold x n_cond x n_channel
+        numpy.ndarray: the conditions, sorted
+    """
+    conds, i_cond = np.unique(np.asarray(desc), return_inverse=True)
+    folds, i_fold = np.unique(np.asarray(cv_desc), return_inverse=True)
+    n_cond, n_fold = len(conds), len(folds)
+    indicator = np.zeros((n_fold * n_cond, len(i_cond)))
+    indicator[i_fold.ravel() * n_cond + i_cond.ravel(), np.arange(len(i_cond))] = 1
+    counts = indicator.sum(axis=1).reshape(n_fold, n_cond, 1)
+    sums = (indicator @ measurements).reshape(
+        measurements.shape[:-2] + (n_fold, n_cond, -1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fold_means = sums / counts
+        train_means = (sums.sum(axis=-3, keepdims=True) - sums) \
+            / (counts.sum(axis=0) - counts)
+    return fold_means, train_means, conds
 
 
 def _gen_default_cv_descriptor(dataset, descriptor) -> np.ndarray:
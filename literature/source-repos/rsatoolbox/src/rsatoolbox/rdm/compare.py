@@ -66,6 +66,8 @@ def compare(rdm1: RDMs, rdm2: RDMs, method='cosine', sigma_k: Optional[NDArray]=
         numpy.ndarray: dist:
             pariwise similarities between the RDMs from the RDMs objects
     """
+    if isinstance(rdm1, PreparedRDMs) or isinstance(rdm2, PreparedRDMs):
+        return _compare_prepared(rdm1, rdm2, method, sigma_k)
     if method == 'cosine':
         sim = compare_cosine(rdm1, rdm2)
     elif method == 'spearman':
@@ -93,6 +95,71 @@ def compare(rdm1: RDMs, rdm2: RDMs, method='cosine', sigma_k: Optional[NDArray]=
     return sim
 
 
+class PreparedRDMs:
+    """RDMs prepared for repeated comparisons with a fixed method
+
+    For the methods which reduce to an inner product of transformed RDM
+    vectors ('cosine', 'corr', 'spearman', 'rho-a', 'cosine_cov' and
+    'corr_cov' without a full sigma_k) the NaN mask and the transformed,
+    normalized vectors are computed once. Passing the object to
+    :func:`compare` in place of an RDMs object then only transforms the
+    other argument. For all other methods the object simply holds on to
+    the RDMs and comparisons fall back to the normal computation.
+
+    Args:
+        rdms (rsatoolbox.rdm.RDMs or numpy.ndarray):
+            the RDMs to prepare, e.g. model predictions
+        method (string):
+            comparison method the RDMs will be used with
+        sigma_k (numpy.ndarray):
+            covariance matrix of the pattern estimates.
+            Used only for methods 'corr_cov' and 'cosine_cov'.
+
+    """
+
+    def __init__(self, rdms, method='cosine', sigma_k=None):
+        self.rdms = rdms
+        self.method = method
+        self.sigma_k = sigma_k
+        vectors = _get_vectors(rdms)
+        self.n_rdm = vectors.shape[0]
+        self.nan_mask = ~np.isnan(vectors).any(axis=0)
+        self.closed_form = method in _CLOSED_FORM_METHODS and not (
+            sigma_k is not None and sigma_k.ndim >= 2)
+        if self.closed_form:
+            self.vectors = _prepare_vectors(
+                vectors[:, self.nan_mask], method, self.nan_mask, sigma_k)
+        else:
+            self.vectors = None
+
+
+def prepare_rdms(rdms, method='cosine', sigma_k=None) -> PreparedRDMs:
+    """Prepares RDMs for repeated comparisons with :func:`compare`
+
+    Args:
+        rdms (rsatoolbox.rdm.RDMs or numpy.ndarray):
+            the RDMs to prepare, e.g. model predictions
+        method (string):
+            comparison method the RDMs will be used with
+        sigma_k (numpy.ndarray):
+            covariance matrix of the pattern estimates.
+            Used only for methods 'corr_cov' and 'cosine_cov'.
+
+    Returns:
+        PreparedRDMs: object to pass to compare instead of the RDMs
+
+    """
+    if isinstance(rdms, PreparedRDMs):
+        if rdms.method != method:
+            raise ValueError(
+                'RDMs were prepared for method ' + rdms.method)
+        if sigma_k is not None and not _same_sigma_k(sigma_k, rdms.sigma_k):
+            raise ValueError(
+                'RDMs were prepared with a different sigma_k')
+        return rdms
+    return PreparedRDMs(rdms, method=method, sigma_k=sigma_k)
+
+
 def compare_cosine(rdm1: RDMs, rdm2: RDMs) -> NDArray:
     """Calculates the cosine similarities between two RDMs objects
 
@@ -106,6 +173,8 @@ def compare_cosine(rdm1: RDMs, rdm2: RDMs) -> NDArray:
             cosine similarity between the two RDMs
 
     """
+    if _is_prepared(rdm1, rdm2):
+        return _compare_prepared(rdm1, rdm2, 'cosine')
     vector1, vector2, _ = _parse_input_rdms(rdm1, rdm2)
     sim = _cosine(vector1, vector2)
     return sim
@@ -124,6 +193,8 @@ def compare_correlation(rdm1: RDMs, rdm2: RDMs) -> NDArray:
             correlations between the two RDMs
 
     """
+    if _is_prepared(rdm1, rdm2):
+        return _compare_prepared(rdm1, rdm2, 'corr')
     vector1, vector2, _ = _parse_input_rdms(rdm1, rdm2)
     # compute by subtracting the mean and then calculating cosine similarity
     vector1 = vector1 - np.mean(vector1, 1, keepdims=True)
@@ -145,6 +216,8 @@ def compare_cosine_cov_weighted(rdm1: RDMs, rdm2: RDMs, sigma_k: Optional[NDArra
             cosine similarities between the two RDMs
 
     """
+    if _is_prepared(rdm1, rdm2):
+        return _compare_prepared(rdm1, rdm2, 'cosine_cov', sigma_k)
     vector1, vector2, nan_idx = _parse_input_rdms(rdm1, rdm2)
     sim = _cosine_cov_weighted(vector1, vector2, sigma_k, nan_idx)
     return sim
@@ -165,6 +238,8 @@ def compare_correlation_cov_weighted(rdm1: RDMs, rdm2: RDMs, sigma_k: Optional[N
             correlations between the two RDMs
 
     """
+    if _is_prepared(rdm1, rdm2):
+        return _compare_prepared(rdm1, rdm2, 'corr_cov', sigma_k)
     vector1, vector2, nan_idx = _parse_input_rdms(rdm1, rdm2)
     # compute by subtracting the mean and then calculating cosine similarity
     vector1 = vector1 - np.mean(vector1, 1, keepdims=True)
@@ -188,6 +263,8 @@ def compare_spearman(rdm1: RDMs, rdm2: RDMs) -> NDArray:
             rank correlations between the two RDMs
 
     """
+    if _is_prepared(rdm1, rdm2):
+        return _compare_prepared(rdm1, rdm2, 'spearman')
     vector1, vector2, _ = _parse_input_rdms(rdm1, rdm2)
     vector1 = np.apply_along_axis(scipy.stats.rankdata, 1, vector1)
     vector2 = np.apply_along_axis(scipy.stats.rankdata, 1, vector2)
@@ -213,6 +290,8 @@ def compare_rho_a(rdm1: RDMs, rdm2: RDMs) -> NDArray:
             rank correlations between the two RDMs
 
     """
+    if _is_prepared(rdm1, rdm2):
+        return _compare_prepared(rdm1, rdm2, 'rho-a')
     vector1, vector2, _ = _parse_input_rdms(rdm1, rdm2)
     vector1 = np.apply_along_axis(scipy.stats.rankdata, 1, vector1)
     vector2 = np.apply_along_axis(scipy.stats.rankdata, 1, vector2)
@@ -666,6 +745,10 @@ def _parse_input_rdms(rdm1, rdm2):
             second set of RDMs
 
     """
+    if isinstance(rdm1, PreparedRDMs):
+        rdm1 = rdm1.rdms
+    if isinstance(rdm2, PreparedRDMs):
+        rdm2 = rdm2.rdms
     if not isinstance(rdm1, np.ndarray):
         vector1 = rdm1.get_vectors()
     else:
@@ -692,6 +775,91 @@ def _parse_input_rdms(rdm1, rdm2):
     return vector1_no_nan, vector2_no_nan, nan_mask
 
 
+_CLOSED_FORM_METHODS = (
+    'cosine', 'corr', 'spearman', 'rho-a', 'cosine_cov', 'corr_cov')
+
+
+def _get_vectors(rdms):
+    """returns the 2D vector representation of RDMs or an array"""
+    if isinstance(rdms, np.ndarray):
+        return rdms.reshape(-1, rdms.shape[-1])
+    return rdms.get_vectors()
+
+
+def _prepare_vectors(vectors, method, nan_idx, sigma_k=None):
+    """transforms NaN-free RDM vectors such that the similarity of method
+    is the inner product of the transformed vectors
+
+    Args:
+        vectors (numpy.ndarray):
+            RDM vectors without the NaN entries (2D)
+        method (string):
+            one of the closed form comparison methods
+        nan_idx (numpy.ndarray):
+            boolean mask of the valid entries of the full vectors
+        sigma_k (numpy.ndarray):
+            optional 1D covariance for the '_cov' methods
+
+    Returns:
+        numpy.ndarray: transformed vectors
+
+    """
+    if method in ('spearman', 'rho-a'):
+        vectors = scipy.stats.rankdata(vectors, axis=1)
+    if method in ('corr', 'spearman', 'rho-a', 'corr_cov'):
+        vectors = vectors - np.mean(vectors, 1, keepdims=True)
+    if method == 'rho-a':
+        n = vectors.shape[1]
+        return vectors * np.sqrt(12 / (n ** 3 - n))
+    if method in ('cosine_cov', 'corr_cov'):
+        vectors = _cov_weighting(vectors, nan_idx, sigma_k)
+    norm = np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+    # zero length vectors have similarity 0 as in _cosine
+    norm[norm == 0] = np.inf
+    return vectors / norm[:, None]
+
+
+def _is_prepared(rdm1, rdm2):
+    return isinstance(rdm1, PreparedRDMs) or isinstance(rdm2, PreparedRDMs)
+
+
+def _same_sigma_k(sigma_k1, sigma_k2):
+    """whether two sigma_k arguments describe the same covariance"""
+    if sigma_k1 is None or sigma_k2 is None:
+        return sigma_k1 is None and sigma_k2 is None
+    return np.array_equal(np.asarray(sigma_k1), np.asarray(sigma_k2))
+
+
+def _compare_prepared(rdm1, rdm2, method, sigma_k=None):
+    """compare for the case that at least one input is PreparedRDMs
+
+    sigma_k must be None or equal to the sigma_k the RDMs were prepared
+    with, otherwise a ValueError is raised.
+    """
+    prepared = [rdm for rdm in (rdm1, rdm2) if isinstance(rdm, PreparedRDMs)]
+    for rdm in prepared:
+        if method != rdm.method:
+            raise ValueError('RDMs were prepared for method ' + rdm.method
+                             + ' but compared with method ' + method)
+    if sigma_k is None:
+        sigma_k = prepared[0].sigma_k
+    if not all(_same_sigma_k(sigma_k, rdm.sigma_k) for rdm in prepared):
+        raise ValueError('RDMs were prepared with a different sigma_k'
+                         ' than the one they are compared with')
+    if not prepared[0].closed_form:
+        return compare(
+            rdm1.rdms if isinstance(rdm1, PreparedRDMs) else rdm1,
+            rdm2.rdms if isinstance(rdm2, PreparedRDMs) else rdm2,
+            method=method, sigma_k=sigma_k)
+    rdm1 = prepare_rdms(rdm1, method, sigma_k)
+    rdm2 = prepare_rdms(rdm2, method, sigma_k)
+    if not rdm1.nan_mask.shape == rdm2.nan_mask.shape:
+        raise ValueError('rdm1 and rdm2 must be RDMs of equal shape')
+    if not np.all(rdm1.nan_mask == rdm2.nan_mask):
+        raise ValueError('rdm1 and rdm2 have different nan positions')
+    return rdm1.vectors @ rdm2.vectors.T
+
+
 def _sq_bures_metric_first_way(A, B):
     va, ua = np.linalg.eigh(A)
     Asq = ua @ (np.sqrt(np.maximum(va[:, None], 0.0)) * ua.T)
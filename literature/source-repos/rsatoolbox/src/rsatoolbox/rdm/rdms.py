@@ -15,8 +15,10 @@ from rsatoolbox.io.pandas import rdms_to_df
 from rsatoolbox.rdm.combine import _mean
 from rsatoolbox.util.rdm_utils import batch_to_vectors
 from rsatoolbox.util.rdm_utils import batch_to_matrices
+from rsatoolbox.util.rdm_utils import subsample_index
 from rsatoolbox.util.descriptor_utils import format_descriptor
 from rsatoolbox.util.descriptor_utils import num_index
+from rsatoolbox.util.descriptor_utils import repeat_index
 from rsatoolbox.util.descriptor_utils import subset_descriptor
 from rsatoolbox.util.descriptor_utils import check_descriptor_length_error
 from rsatoolbox.util.descriptor_utils import append_descriptor
@@ -255,19 +257,15 @@ class RDMs:
         """
         if by is None:
             by = 'index'
-        desc = np.array(self.pattern_descriptors[by])  # desc is list-like
-        if isinstance(value, (list, tuple, np.ndarray)):
-            selection = [np.asarray(desc == i).nonzero()[0]
-                         for i in value]
-            selection = np.concatenate(selection)
+        selection = np.sort(repeat_index(self.pattern_descriptors[by], value))
+        if len(selection) == 0:
+            # as matrices, since empty vectors would mean one pattern
+            dissimilarities = np.zeros((self.n_rdm, 0, 0))
         else:
-            selection = np.where(desc == value)[0]
-        selection = np.sort(selection)
-        dissimilarities = self.get_matrices()
-        for i_rdm in range(self.n_rdm):
-            np.fill_diagonal(dissimilarities[i_rdm], np.nan)
-        selection = np.sort(selection)
-        dissimilarities = dissimilarities[:, selection][:, :, selection]
+            idx, valid = subsample_index(self.n_cond, selection)
+            dissimilarities = self.dissimilarities[:, idx].astype(
+                float, copy=False)
+            dissimilarities[:, ~valid] = np.nan
         descriptors = self.descriptors
         pattern_descriptors = extract_dict(
             self.pattern_descriptors, selection)
@@ -323,17 +321,7 @@ class RDMs:
         """
         if by is None:
             by = 'index'
-        desc = self.rdm_descriptors[by]
-        selection = []
-        if isinstance(value, (list, tuple, np.ndarray)):
-            for i in value:
-                for j, d in enumerate(desc):
-                    if d == i:
-                        selection.append(j)
-        else:
-            for j, d in enumerate(desc):
-                if d == value:
-                    selection.append(j)
+        selection = repeat_index(self.rdm_descriptors[by], value)
         dissimilarities = self.dissimilarities[selection, :]
         descriptors = self.descriptors
         pattern_descriptors = self.pattern_descriptors
@@ -3,7 +3,7 @@
 """helper methods to create RDMs at the end of calculations"""
 
 from __future__ import annotations
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, List, Optional
 from copy import deepcopy
 import numpy as np
 from rsatoolbox.rdm.rdms import RDMs
@@ -54,6 +54,43 @@ def _build_rdms(
     return rdms
 
 
+def _build_rdms_stacked(
+            utvs: NDArray,
+            datasets: List[DatasetBase],
+            method: str,
+            obs_desc_name: str,
+            obs_desc_vals: NDArray,
+            cv: Optional[str] = None,
+            noises: Optional[List[NDArray]] = None
+        ) -> RDMs:
+    """One RDMs object for the RDMs of several datasets, as from_partials
+    builds it from their _build_rdms results: the dataset descriptors
+    become rdm_descriptors, noise and cv_descriptor stay descriptors if
+    they are equal for all datasets."""
+    rdm_descriptors = {
+        name: [deepcopy(ds.descriptors[name]) for ds in datasets]
+        for name in datasets[0].descriptors}
+    rdm_descriptors['index'] = list(range(len(datasets)))
+    per_rdm = {}
+    if noises is not None:
+        per_rdm['noise'] = noises
+    if cv is not None:
+        per_rdm['cv_descriptor'] = [cv] * len(datasets)
+    descriptors = {}
+    for name, values in per_rdm.items():
+        if all(np.all(value == values[0]) for value in values[1:]):
+            descriptors[name] = values[0]
+        else:
+            rdm_descriptors[name] = list(values)
+    return RDMs(
+        dissimilarities=utvs,
+        dissimilarity_measure=method,
+        descriptors=descriptors,
+        rdm_descriptors=rdm_descriptors,
+        pattern_descriptors={obs_desc_name: list(obs_desc_vals)}
+    )
+
+
 def _averaging_occurred(
             ds: DatasetBase,
             obs_desc_name: str | None,
@@ -54,6 +54,40 @@ def num_index(descriptor, value):
     return np.where(bool_index(descriptor, value))[0]
 
 
+def repeat_index(descriptor, value):
+    """
+    creates an index vector which contains the positions where descriptor
+    equals each of the values in turn, i.e. repeated values select the
+    same elements repeatedly
+
+    Args:
+        descriptor (list-like): descriptor vector
+        value:                  value or list of values to select
+
+    Returns:
+        numpy.ndarray:
+            index: positions in descriptor in the order of value
+
+    """
+    if not isinstance(value, (list, tuple, np.ndarray)):
+        value = [value]
+    try:
+        descriptor = np.asarray(descriptor)
+        order = np.argsort(descriptor, kind='stable')
+        start = np.searchsorted(descriptor[order], value, side='left')
+        stop = np.searchsorted(descriptor[order], value, side='right')
+    except (TypeError, ValueError):
+        # descriptors which cannot be sorted are matched one by one
+        return np.concatenate(
+            [np.array([j for j, d in enumerate(descriptor) if d == v], int)
+             for v in value] + [np.zeros(0, int)])
+    counts = stop - start
+    # NaN sorts like a value, but never equals a descriptor entry
+    counts[[v != v for v in value]] = 0
+    offsets = np.repeat(start - np.cumsum(counts) + counts, counts)
+    return order[offsets + np.arange(offsets.shape[0])]
+
+
 def format_descriptor(descriptors):
     """ formats a descriptor dictionary
 
@@ -73,6 +73,35 @@ def batch_to_matrices(x):
     return m, n_rdm, n_cond
 
 
+def subsample_index(n_cond, selection):
+    """computes where the entries of a pattern subsampled RDM vector are
+    found in the original RDM vector
+
+    Args:
+        **n_cond** (int): number of conditions of the original RDMs
+
+        **selection** (np.ndarray): sorted condition indices to keep,
+            repetitions allowed
+
+    Returns:
+        tuple: **idx** (np.ndarray): index into the original vectors for
+        each entry of the subsampled vectors
+
+        **valid** (np.ndarray): False for entries which compare a
+        condition with itself, which become NaN
+    """
+    selection = np.asarray(selection)
+    row, col = np.triu_indices(len(selection), 1)
+    row = selection[row]
+    col = selection[col]
+    valid = row != col
+    low = np.minimum(row, col)
+    high = np.maximum(row, col)
+    idx = low * n_cond - low * (low + 1) // 2 + high - low - 1
+    idx[~valid] = 0
+    return idx, valid
+
+
 def _get_n_from_reduced_vectors(x):
     """
     calculates the size of the RDM from the vector representation
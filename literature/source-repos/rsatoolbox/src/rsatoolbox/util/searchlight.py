@@ -6,13 +6,22 @@ https://github.com/machow/pysearchlight
 
 @author: Daniel Lindh
 """
+import hashlib
+import os
+import operator
+import tempfile
+from contextlib import nullcontext
 import numpy as np
 from scipy.spatial.distance import cdist
+from scipy.stats import rankdata
 from tqdm import tqdm
 from joblib import Parallel, delayed
 from rsatoolbox.data.dataset import Dataset
 from rsatoolbox.rdm.calc import calc_rdm
 from rsatoolbox.rdm import RDMs
+from rsatoolbox.rdm import compare
+from rsatoolbox.util.inference_util import input_check_model
+from rsatoolbox.io.optional import import_nibabel
 
 
 def _get_searchlight_neighbors(mask, center, radius=3, truncate_at_boundary=False):
@@ -61,11 +70,105 @@ def _get_searchlight_neighbors(mask, center, radius=3, truncate_at_boundary=Fals
     return tuple(within_radius.T.astype(int).tolist())
 
 
-def get_volume_searchlight(mask, radius=2, threshold=1.0, truncate_at_boundary=False):
+class SearchlightNeighbors:
+    """Neighbor voxel indices of all searchlights in compressed sparse row form
+
+    The neighbors of searchlight i are indices[indptr[i]:indptr[i + 1]].
+    The object behaves like the list of neighbor arrays it replaces, i.e. it
+    supports len(), indexing by center and iteration.
+
+    Args:
+        indptr (numpy array): n_centers + 1 offsets into indices
+        indices (numpy array): concatenated neighbor voxel indices
+    """
+
+    def __init__(self, indptr, indices):
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices)
+
+    @classmethod
+    def from_list(cls, neighbors):
+        """creates the sparse representation from a list of neighbor lists"""
+        if isinstance(neighbors, cls):
+            return neighbors
+        counts = [len(nb) for nb in neighbors]
+        indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        if len(neighbors) > 0:
+            indices = np.concatenate(
+                [np.asarray(nb, dtype=np.int64) for nb in neighbors])
+        else:
+            indices = np.zeros(0, dtype=np.int64)
+        return cls(indptr, indices)
+
+    @property
+    def counts(self):
+        """number of neighbors per searchlight"""
+        return np.diff(self.indptr)
+
+    def gather(self, center_idx, n_neighbors):
+        """neighbor indices of several equally sized searchlights
+
+        Args:
+            center_idx (numpy array): indices of the searchlights
+            n_neighbors (int): number of neighbors each of them has
+
+        Returns:
+            numpy array: len(center_idx) x n_neighbors
+        """
+        offsets = self.indptr[center_idx][:, None] + np.arange(n_neighbors)
+        return self.indices[offsets]
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            # contiguous block of searchlights, sharing the index arrays
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                raise IndexError('only contiguous slices are supported')
+            stop = max(start, stop)
+            indptr = self.indptr[start:stop + 1]
+            return SearchlightNeighbors(
+                indptr - indptr[0], self.indices[indptr[0]:indptr[-1]])
+        idx = operator.index(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('searchlight index out of range')
+        return self.indices[self.indptr[idx]:self.indptr[idx + 1]]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+def _get_searchlight_stencil(radius):
+    """Voxel offsets within radius of a center
+
+    The offsets are ordered as _get_searchlight_neighbors orders the voxels
+    it returns.
+
+    Returns:
+        numpy array: n_offsets x 3 integer offsets
+    """
+    r_int = int(np.ceil(radius))
+    steps = np.arange(-r_int, r_int + 1)
+    steps = steps[abs(steps) < radius]
+    d_x, d_y, d_z = np.meshgrid(steps, steps, steps)
+    offsets = np.vstack((d_x.ravel(), d_y.ravel(), d_z.ravel())).T
+    return offsets[np.sqrt(np.sum(offsets ** 2, axis=1)) < radius]
+
+
+def get_volume_searchlight(mask, radius=2, threshold=1.0, truncate_at_boundary=False,
+                           chunk_size=10000, cache_dir=None):
     """
     Searches through the non-zero voxels of the mask, selects centers where
     proportion of sphere voxels >= self.threshold.
 
+    The sphere is computed once as a stencil of voxel offsets, which is then
+    applied to chunks of centers at a time.
+
     Args:
 
         mask ([numpy array]): binary brain mask
@@ -90,42 +193,161 @@ def get_volume_searchlight(mask, radius=2, threshold=1.0, truncate_at_boundary=F
         different variance characteristics in second-level analysis.
         Defaults to False.
 
+        chunk_size (int, optional): number of centers processed at once.
+        Defaults to 10000.
+
+        cache_dir (str, optional): directory in which the searchlight geometry
+        is cached, keyed by a hash of the mask content, radius, threshold and
+        truncate_at_boundary. Cached geometries are loaded as read-only memory
+        maps, such that repeated runs and parallel workers sharing a mask skip
+        the computation. Defaults to None, i.e. no caching.
+
     Returns:
-        numpy array: array of centers of size n_centers x 3
+        numpy array: array of center indices of size n_centers
 
-        list: list of lists with neighbors - the length of the list will correspond to:
-        n_centers x 3 x n_neighbors
+        SearchlightNeighbors: neighbor voxel indices for each center,
+        behaves like a list of n_centers arrays
     """
 
     mask = np.array(mask)
     assert mask.ndim == 3, "Mask needs to be a 3-dimensional numpy array"
 
-    centers = list(zip(*np.nonzero(mask)))
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, 'searchlight_' + _searchlight_hash(
+            mask, radius, threshold, truncate_at_boundary))
+        if os.path.isdir(cache_path):
+            arrays = _load_geometry(cache_path)
+            return arrays['centers'], SearchlightNeighbors(
+                arrays['indptr'], arrays['indices'])
+
+    mask_flat = mask.ravel()
+    shape = np.array(mask.shape)
+    stencil = _get_searchlight_stencil(radius)
+    candidates = np.flatnonzero(mask_flat)
+    candidate_coords = np.array(np.unravel_index(candidates, mask.shape)).T
+
     good_centers = []
-    good_neighbors = []
+    counts = []
+    indices = []
+    for start in range(0, len(candidates), chunk_size):
+        # n_chunk x n_offsets x 3 voxel coordinates
+        coords = candidate_coords[start:start + chunk_size, None, :] \
+            + stencil[None, :, :]
+        valid = np.all((coords >= 0) & (coords < shape), axis=2)
+        flat = np.ravel_multi_index(
+            tuple(np.moveaxis(np.clip(coords, 0, shape - 1), 2, 0)),
+            mask.shape)
+        values = mask_flat[flat]
+        if truncate_at_boundary:
+            valid &= values > 0
+        n_valid = np.sum(valid, axis=1)
+        proportion = np.sum(np.where(valid, values, 0), axis=1) / n_valid
+        good = proportion >= threshold
+        good_centers.append(candidates[start:start + chunk_size][good])
+        counts.append(n_valid[good])
+        indices.append(flat[good][valid[good]])
+
+    if len(candidates) > 0:
+        good_centers = np.concatenate(good_centers)
+        counts = np.concatenate(counts)
+        indices = np.concatenate(indices)
+    else:
+        good_centers = np.zeros(0, dtype=np.int64)
+        counts = np.zeros(0, dtype=np.int64)
+        indices = np.zeros(0, dtype=np.int64)
+    print(f'Found {len(good_centers)} searchlights')
 
-    for center in tqdm(centers, desc='Finding searchlights...'):
-        neighbors = _get_searchlight_neighbors(mask, center, radius, truncate_at_boundary)
-        if mask[neighbors].mean() >= threshold:
-            good_centers.append(center)
-            good_neighbors.append(neighbors)
+    indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    if cache_dir is not None:
+        _save_geometry(cache_path, centers=good_centers, indptr=indptr,
+                       indices=indices)
+    return good_centers, SearchlightNeighbors(indptr, indices)
 
-    good_centers = np.array(good_centers)
-    assert good_centers.shape[0] == len(good_neighbors),\
-        "number of centers and sets of neighbors do not match"
-    print(f'Found {len(good_neighbors)} searchlights')
 
-    # turn the 3-dim coordinates to array coordinates
-    centers = np.ravel_multi_index(good_centers.T, mask.shape)
-    neighbors = [np.ravel_multi_index(n, mask.shape) for n in good_neighbors]
+def _searchlight_hash(mask, radius, threshold, truncate_at_boundary):
+    """Hash identifying a searchlight geometry"""
+    mask = np.ascontiguousarray(mask)
+    sha = hashlib.sha1(mask.tobytes())
+    sha.update(repr((mask.shape, mask.dtype.str, float(radius),
+                     float(threshold), bool(truncate_at_boundary))).encode())
+    return sha.hexdigest()
 
-    return centers, neighbors
+
+def _save_geometry(path, **arrays):
+    """Stores arrays as .npy files in the directory path
+
+    The files are written to a temporary directory which is then renamed,
+    such that concurrent readers never see a partially written geometry.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=parent)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, name + '.npy'), array)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # another process stored the same geometry in the meantime
+        for name in arrays:
+            os.remove(os.path.join(tmp_path, name + '.npy'))
+        os.rmdir(tmp_path)
+
+
+def _load_geometry(path):
+    """Loads all arrays stored by _save_geometry as read-only memory maps"""
+    return {
+        name[:-4]: np.load(os.path.join(path, name), mmap_mode='r')
+        for name in os.listdir(path) if name.endswith('.npy')}
+
+
+def save_volume_searchlight(filename, centers, neighbors):
+    """Saves searchlight centers and neighbors for reuse
+
+    Args:
+        filename (str): path of the .npz file to write
+        centers (numpy array): center indices as returned by
+            get_volume_searchlight
+        neighbors (SearchlightNeighbors or list): neighbors as returned by
+            get_volume_searchlight
+    """
+    neighbors = SearchlightNeighbors.from_list(neighbors)
+    np.savez(filename, centers=np.asarray(centers),
+             indptr=neighbors.indptr, indices=neighbors.indices)
+
+
+def load_volume_searchlight(filename):
+    """Loads searchlight centers and neighbors saved by
+    save_volume_searchlight
+
+    Args:
+        filename (str): path of the .npz file
+
+    Returns:
+        numpy array: center indices
+
+        SearchlightNeighbors: neighbor voxel indices for each center
+    """
+    with np.load(filename) as npz:
+        return npz['centers'], SearchlightNeighbors(
+            npz['indptr'], npz['indices'])
 
 
 def get_searchlight_RDMs(data_2d, centers, neighbors, events,
-                         method='correlation', verbose=True):
+                         method='correlation', verbose=True,
+                         max_memory=2**29, n_jobs=1):
     """Iterates over all the searchlight centers and calculates the RDM
 
+    For the 'correlation', 'euclidean' and 'mahalanobis' (with identity
+    noise) methods the condition-averaged patterns are computed once and the
+    searchlights are processed in batches of centers with the same number
+    of neighbors, each batch being a single batched matrix product.
+    Other methods fall back to constructing one Dataset per center.
+
+    With n_jobs != 1 the batches are distributed over worker processes.
+    The data and the neighbor index are then shared with the workers as
+    read-only memory maps and the workers write their RDMs directly into a
+    memory-mapped output array.
+
     Args:
 
         data_2d (2D numpy array): brain data,
@@ -134,8 +356,8 @@ def get_searchlight_RDMs(data_2d, centers, neighbors, events,
         centers (1D numpy array): center indices for all searchlights as provided
         by rsatoolbox.util.searchlight.get_volume_searchlight
 
-        neighbors (list): list of lists with neighbor voxel indices for all searchlights
-        as provided by rsatoolbox.util.searchlight.get_volume_searchlight
+        neighbors (SearchlightNeighbors or list): neighbor voxel indices for all
+        searchlights as provided by rsatoolbox.util.searchlight.get_volume_searchlight
 
         events (1D numpy array): 1D array of length n_observations
 
@@ -144,57 +366,32 @@ def get_searchlight_RDMs(data_2d, centers, neighbors, events,
 
         verbose (bool, optional): Defaults to True.
 
+        max_memory (int, optional): approximate number of bytes a single
+        batch of searchlights may occupy. Determines the batch size.
+        Defaults to 512 MiB.
+
+        n_jobs (int, optional): how many jobs to run. Defaults to 1.
+
     Returns:
         RDM [rsatoolbox.rdm.RDMs]: RDMs object with the RDM for each searchlight
                               the RDM.rdm_descriptors['voxel_index']
                               describes the center voxel index each RDM is associated with
     """
 
-    data_2d, centers = np.array(data_2d), np.array(centers)
-    n_centers = centers.shape[0]
+    centers, events = np.asarray(centers), np.asarray(events)
+    neighbors = SearchlightNeighbors.from_list(neighbors)
+    data = _searchlight_data(data_2d, events, method)
 
-    # For memory reasons, we chunk the data if we have more than 1000 RDMs
-    if n_centers > 1000:
-        # we can't run all centers at once, that will take too much memory
-        # so lets to some chunking
-        chunked_center = np.split(np.arange(n_centers),
-                                  np.linspace(0, n_centers,
-                                              101, dtype=int)[1:-1])
-
-        # loop over chunks
-        n_conds = len(np.unique(events))
-        RDM = np.zeros((n_centers, n_conds * (n_conds - 1) // 2))
-        for chunks in tqdm(chunked_center, desc='Calculating RDMs...'):
-            center_data = []
-            for c in chunks:
-                # grab this center and neighbors
-                center = centers[c]
-                center_neighbors = neighbors[c]
-                # create a database object with this data
-                ds = Dataset(data_2d[:, center_neighbors],
-                             descriptors={'center': center},
-                             obs_descriptors={'events': events},
-                             channel_descriptors={'voxels': center_neighbors})
-                center_data.append(ds)
-
-            RDM_corr = calc_rdm(center_data, method=method,
-                                descriptor='events')
-            RDM[chunks, :] = RDM_corr.dissimilarities
+    if n_jobs == 1:
+        RDM = _searchlight_rdm_array(data, centers, neighbors, events, method,
+                                     max_memory, verbose=verbose)
     else:
-        center_data = []
-        for c in range(n_centers):
-            # grab this center and neighbors
-            center = centers[c]
-            nb = neighbors[c]
-            # create a database object with this data
-            ds = Dataset(data_2d[:, nb],
-                         descriptors={'center': c},
-                         obs_descriptors={'events': events},
-                         channel_descriptors={'voxels': nb})
-            center_data.append(ds)
-        # calculate RDMs for each database object
-        RDM = calc_rdm(center_data, method=method,
-                       descriptor='events').dissimilarities
+        with tempfile.TemporaryDirectory() as tmp:
+            data, neighbors = _share_searchlight_data(data, neighbors, tmp)
+            RDM = _searchlight_rdm_array(
+                data, centers, neighbors, events, method, max_memory,
+                n_jobs=n_jobs, tmp=tmp, verbose=verbose)
+            del data, neighbors
 
     SL_rdms = RDMs(RDM,
                    rdm_descriptors={'voxel_index': centers},
@@ -203,6 +400,185 @@ def get_searchlight_RDMs(data_2d, centers, neighbors, events,
     return SL_rdms
 
 
+_BATCHED_METHODS = ('correlation', 'euclidean', 'mahalanobis')
+
+
+def _searchlight_data(data_2d, events, method):
+    """the data the searchlight RDMs are computed from: the averaged
+    patterns for the batched methods, the observations otherwise"""
+    if method in _BATCHED_METHODS:
+        return _average_patterns(np.asarray(data_2d), events)
+    return np.asarray(data_2d)
+
+
+def _share_searchlight_data(data, neighbors, folder):
+    """Stores data and neighbors in folder as read-only memory maps"""
+    data = _share_array(data, folder, 'data')
+    neighbors = SearchlightNeighbors(
+        _share_array(neighbors.indptr, folder, 'indptr'),
+        _share_array(neighbors.indices, folder, 'indices'))
+    return data, neighbors
+
+
+def _searchlight_rdm_array(data, centers, neighbors, events, method,
+                           max_memory, n_jobs=1, tmp=None, verbose=True):
+    """Calculates the RDMs of the searchlights from prepared data
+
+    Args:
+        data (numpy array): the output of _searchlight_data
+        centers (numpy array): center indices of the searchlights
+        neighbors (SearchlightNeighbors): neighbors of these searchlights
+        events (numpy array): condition of each observation
+        method (str): distance metric
+        max_memory (int): approximate number of bytes per batch
+        n_jobs (int): how many jobs to run
+        tmp (str): folder for the shared output array, required if
+            n_jobs != 1. data and neighbors should be shared already.
+        verbose (bool): whether to show a progress bar
+
+    Returns:
+        numpy array: n_centers x n_dissimilarities
+    """
+    n_centers = centers.shape[0]
+    n_conds = len(np.unique(events))
+    shape = (n_centers, n_conds * (n_conds - 1) // 2)
+
+    if method in _BATCHED_METHODS:
+        tasks = [(_fill_rdm_batch, (batch, method))
+                 for batch in _searchlight_batches(neighbors, n_conds, max_memory)]
+    else:
+        # For memory reasons, we chunk the data if we have more than 1000 RDMs
+        if n_centers > 1000:
+            chunked_center = np.split(np.arange(n_centers),
+                                      np.linspace(0, n_centers,
+                                                  101, dtype=int)[1:-1])
+        else:
+            chunked_center = [np.arange(n_centers)]
+        tasks = [(_fill_rdm_chunk, (chunk, centers, events, method))
+                 for chunk in chunked_center]
+
+    if n_jobs == 1:
+        RDM = np.zeros(shape)
+        for func, args in tqdm(tasks, desc='Calculating RDMs...',
+                               disable=not verbose):
+            func(RDM, data, neighbors, *args)
+        return RDM
+    RDM_mm = np.memmap(os.path.join(tmp, 'rdms.mmap'),
+                       dtype=np.float64, mode='w+', shape=shape)
+    Parallel(n_jobs=n_jobs)(
+        delayed(func)(RDM_mm, data, neighbors, *args)
+        for func, args in tqdm(tasks, desc='Calculating RDMs...',
+                               disable=not verbose))
+    RDM = np.array(RDM_mm)
+    del RDM_mm
+    return RDM
+
+
+def _share_array(array, folder, name):
+    """Stores array in folder and reopens it as a read-only memory map,
+    which joblib passes to worker processes by reference"""
+    filename = os.path.join(folder, name + '.npy')
+    np.save(filename, array)
+    return np.load(filename, mmap_mode='r')
+
+
+def _fill_rdm_batch(output, patterns, neighbors, batch, method):
+    """Writes the RDMs of a batch of equally sized searchlights to output
+
+    Args:
+        output (numpy array): n_centers x n_dissimilarities RDM array
+        patterns (numpy array): n_conditions x n_channels averaged patterns
+        neighbors (SearchlightNeighbors): neighbors of all searchlights
+        batch (numpy array): indices of the searchlights in the batch
+        method (str): one of 'correlation', 'euclidean', 'mahalanobis'
+    """
+    batch_neighbors = neighbors.gather(batch, neighbors.indptr[batch[0] + 1]
+                                       - neighbors.indptr[batch[0]])
+    output[batch] = _calc_rdm_batch(patterns, batch_neighbors, method)
+
+
+def _fill_rdm_chunk(output, data_2d, neighbors, chunk, centers, events, method):
+    """Writes the RDMs of a chunk of searchlights to output, computing them
+    with calc_rdm on one Dataset per searchlight"""
+    center_data = []
+    for c in chunk:
+        # grab this center and neighbors
+        center_neighbors = np.asarray(neighbors[c])
+        # create a database object with this data
+        ds = Dataset(data_2d[:, center_neighbors],
+                     descriptors={'center': centers[c]},
+                     obs_descriptors={'events': events},
+                     channel_descriptors={'voxels': center_neighbors})
+        center_data.append(ds)
+    output[chunk] = calc_rdm(center_data, method=method,
+                             descriptor='events').dissimilarities
+
+
+def _average_patterns(data_2d, events):
+    """Average the observations per event
+
+    Returns:
+        numpy array: n_conditions x n_channels, rows ordered like the
+        conditions of the RDMs produced by calc_rdm (sorted event values)
+    """
+    _, inverse = np.unique(events, return_inverse=True)
+    inverse = inverse.ravel()
+    patterns = np.empty((inverse.max() + 1, data_2d.shape[1]))
+    for i_cond in range(patterns.shape[0]):
+        patterns[i_cond] = np.mean(data_2d[inverse == i_cond], axis=0)
+    return patterns
+
+
+def _searchlight_batches(neighbors, n_conds, max_memory):
+    """Groups searchlights with the same number of neighbors into batches
+
+    Args:
+        neighbors (SearchlightNeighbors): neighbor voxel indices
+            for all searchlights
+        n_conds (int): number of conditions
+        max_memory (int): approximate number of bytes per batch
+
+    Yields:
+        numpy array: indices of the searchlights in the batch
+    """
+    n_neighbors = neighbors.counts
+    for n_vox in np.unique(n_neighbors):
+        group = np.flatnonzero(n_neighbors == n_vox)
+        # patterns, their centered / squared copy and the kernel matrices
+        bytes_per_center = 8 * (2 * n_vox * n_conds + 3 * n_conds ** 2)
+        batch_size = max(1, int(max_memory // bytes_per_center))
+        for start in range(0, len(group), batch_size):
+            yield group[start:start + batch_size]
+
+
+def _calc_rdm_batch(patterns, batch_neighbors, method):
+    """Calculates the RDMs for a batch of equally sized searchlights
+
+    Args:
+        patterns (numpy array): n_conditions x n_channels averaged patterns
+        batch_neighbors (numpy array): n_batch x n_neighbors channel indices
+        method (str): one of 'correlation', 'euclidean', 'mahalanobis'
+
+    Returns:
+        numpy array: n_batch x n_dissimilarities
+    """
+    n_conds = patterns.shape[0]
+    n_vox = batch_neighbors.shape[1]
+    # n_batch x n_neighbors x n_conditions
+    x = patterns.T[batch_neighbors]
+    if method == 'correlation':
+        x = x - x.mean(axis=1, keepdims=True)
+        x /= np.sqrt(np.einsum('bki,bki->bi', x, x))[:, None, :]
+        rdm = 1 - np.matmul(x.transpose(0, 2, 1), x)
+    else:
+        sum_sq = np.sum(x ** 2, axis=1)
+        rdm = sum_sq[:, :, None] + sum_sq[:, None, :] \
+            - 2 * np.matmul(x.transpose(0, 2, 1), x)
+        rdm /= n_vox
+    rows, cols = np.triu_indices(n_conds, k=1)
+    return rdm[:, rows, cols]
+
+
 def evaluate_models_searchlight(sl_RDM, models, eval_function, method='corr', theta=None, n_jobs=1):
     """evaluates each searchlighth with the given model/models
 
@@ -230,3 +606,235 @@ def evaluate_models_searchlight(sl_RDM, models, eval_function, method='corr', th
             sl_RDM, desc='Evaluating models for each searchlight'))
 
     return results
+
+
+_BULK_COMPARISONS = ('cosine', 'corr', 'spearman', 'rho-a')
+
+
+def compare_models_searchlight(sl_RDM, models, method='corr', theta=None,
+                               chunk_size=10000, n_jobs=1):
+    """compares the model predictions to all searchlight RDMs at once
+
+    For models which do not need to be fit (parameter-free models or models
+    for which theta is given) and the comparison methods 'cosine', 'corr',
+    'spearman' and 'rho-a', the dissimilarity vectors of all searchlights are
+    transformed in chunks and compared to all predictions with one matrix
+    product per chunk. Other comparison methods are computed with
+    rsatoolbox.rdm.compare, also in chunks of searchlights.
+    Models which need to be fit are fit and evaluated for each searchlight
+    separately.
+
+    Args:
+
+        sl_RDM ([rsatoolbox.rdm.RDMs]): RDMs object
+        as computed by rsatoolbox.util.searchlight.get_searchlight_RDMs
+
+        models ([rsatoolbox.model]: models to evaluate - can also be list of models
+
+        method (str, optional): see rsatoolbox.rdm.compare for specifics. Defaults to 'corr'.
+
+        theta (list, optional): parameters for the models. Defaults to None.
+
+        chunk_size (int, optional): number of searchlights compared at once.
+        Defaults to 10000.
+
+        n_jobs (int, optional): how many jobs to run for models which need
+        fitting. Defaults to 1.
+
+    Returns:
+
+        numpy array: n_searchlights x n_models array of model evaluations
+    """
+    models, _, theta, _ = input_check_model(models, theta, None, 1)
+    fixed = [k for k, model in enumerate(models)
+             if model.n_param == 0 or theta[k] is not None]
+    fitted = [k for k in range(len(models)) if k not in fixed]
+    evaluations = np.full((sl_RDM.n_rdm, len(models)), np.nan)
+
+    if fixed:
+        predictions = np.array(
+            [models[k].predict(theta=theta[k]) for k in fixed])
+        vectors = sl_RDM.get_vectors()
+        for start in range(0, sl_RDM.n_rdm, chunk_size):
+            chunk = slice(start, start + chunk_size)
+            if method in _BULK_COMPARISONS:
+                evaluations[chunk, fixed] = _compare_bulk(
+                    vectors[chunk], predictions, method)
+            else:
+                evaluations[chunk, fixed] = compare(
+                    RDMs(vectors[chunk]), RDMs(predictions), method)
+
+    for k in fitted:
+        evaluations[:, k] = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_compare)(models[k], sl_RDM[i], method)
+            for i in tqdm(range(sl_RDM.n_rdm),
+                          desc=f'Fitting {models[k].name} for each searchlight'))
+    return evaluations
+
+
+def _fit_compare(model, rdm, method):
+    """fits model to a single searchlight RDM and evaluates the fit"""
+    theta = model.fit(rdm, method=method)
+    return compare(model.predict_rdm(theta=theta), rdm, method)[0, 0]
+
+
+def _compare_bulk(vectors, predictions, method):
+    """compares many RDM vectors to few predictions with one matrix product
+
+    Matches rsatoolbox.rdm.compare. Entries which are NaN in a prediction are
+    ignored, RDM vectors which have NaNs elsewhere are evaluated as NaN.
+
+    Args:
+        vectors (numpy array): n_rdm x n_pairs dissimilarity vectors
+        predictions (numpy array): n_models x n_pairs dissimilarity vectors
+        method (str): one of 'cosine', 'corr', 'spearman', 'rho-a'
+
+    Returns:
+        numpy array: n_rdm x n_models evaluations
+    """
+    evaluations = np.full((vectors.shape[0], predictions.shape[0]), np.nan)
+    valid_pairs = ~np.isnan(predictions)
+    # transform the data once for each set of pairs used by the models
+    for pairs in np.unique(valid_pairs, axis=0):
+        models = np.flatnonzero(np.all(valid_pairs == pairs, axis=1))
+        ok = ~np.any(np.isnan(vectors[:, pairs]), axis=1)
+        v_data = _bulk_transform(vectors[ok][:, pairs], method)
+        v_model = _bulk_transform(predictions[models][:, pairs], method)
+        if method == 'rho-a':
+            n = v_data.shape[1]
+            sim = v_data @ v_model.T / (n ** 3 - n) * 12
+        else:
+            sim = v_data @ v_model.T
+        evaluations[np.ix_(ok, models)] = sim
+    return evaluations
+
+
+def _bulk_transform(vectors, method):
+    """ranks, centers and normalizes RDM vectors as required by method"""
+    if method in ('spearman', 'rho-a'):
+        vectors = rankdata(vectors, axis=1)
+    if method != 'cosine':
+        vectors = vectors - np.mean(vectors, axis=1, keepdims=True)
+    if method != 'rho-a':
+        norm = np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+        # zero length vectors have a cosine of 0 with everything
+        norm[norm == 0] = np.inf
+        vectors = vectors / norm[:, None]
+    return vectors
+
+
+def searchlight_model_map(data_2d, centers, neighbors, events, models,
+                          volume_shape, method='correlation', eval_method='corr',
+                          theta=None, block_size=10000, out_file=None,
+                          affine=None, max_memory=2**29, n_jobs=1, verbose=True):
+    """computes searchlight RDMs and model evaluations block by block and
+    writes the evaluations into a volume
+
+    Only the RDMs of one block of centers are held in memory at any time,
+    such that peak memory is bounded by block_size instead of the number of
+    searchlights. The patterns are averaged (and with n_jobs != 1 shared
+    with the workers) once for all blocks. The output volume can be a
+    memory-mapped file, which is filled in as the blocks are evaluated.
+
+    Args:
+
+        data_2d (2D numpy array): brain data,
+        shape n_observations x n_channels (i.e. voxels/vertices)
+
+        centers (1D numpy array): center indices for all searchlights as provided
+        by rsatoolbox.util.searchlight.get_volume_searchlight
+
+        neighbors (SearchlightNeighbors or list): neighbor voxel indices for all
+        searchlights as provided by rsatoolbox.util.searchlight.get_volume_searchlight
+
+        events (1D numpy array): 1D array of length n_observations
+
+        models ([rsatoolbox.model]: models to evaluate - can also be list of models
+
+        volume_shape (tuple): shape of the 3D mask the centers index into
+
+        method (str, optional): distance metric,
+        see rsatoolbox.rdm.calc for options. Defaults to 'correlation'.
+
+        eval_method (str, optional): RDM comparison method,
+        see rsatoolbox.rdm.compare for options. Defaults to 'corr'.
+
+        theta (list, optional): parameters for the models. Defaults to None.
+
+        block_size (int, optional): number of searchlights processed at once.
+        Defaults to 10000.
+
+        out_file (str, optional): file the volume is memory-mapped to. Files
+        ending in .nii are written as NIfTI-1 images (requires nibabel), other
+        names as .npy files. Defaults to None, i.e. an in-memory array.
+
+        affine (numpy array, optional): 4 x 4 affine stored in the NIfTI header.
+        Defaults to None.
+
+        max_memory (int, optional): see get_searchlight_RDMs.
+
+        n_jobs (int, optional): how many jobs to run. Defaults to 1.
+
+        verbose (bool, optional): Defaults to True.
+
+    Returns:
+
+        numpy array: volume_shape x n_models evaluations, NaN for voxels that
+        are not searchlight centers
+    """
+    centers, events = np.asarray(centers), np.asarray(events)
+    neighbors = SearchlightNeighbors.from_list(neighbors)
+    models = input_check_model(models, theta, None, 1)[0]
+    shape = tuple(volume_shape) + (len(models),)
+    volume = _open_output_volume(out_file, shape, affine)
+    data = _searchlight_data(data_2d, events, method)
+    with (tempfile.TemporaryDirectory() if n_jobs != 1
+          else nullcontext()) as tmp:
+        if tmp is not None:
+            data, neighbors = _share_searchlight_data(data, neighbors, tmp)
+        for start in tqdm(range(0, len(centers), block_size),
+                          desc='Evaluating searchlight blocks...',
+                          disable=not verbose):
+            block = slice(start, start + block_size)
+            RDM = _searchlight_rdm_array(
+                data, centers[block], neighbors[block], events, method,
+                max_memory, n_jobs=n_jobs, tmp=tmp, verbose=False)
+            sl_RDM = RDMs(RDM,
+                          rdm_descriptors={'voxel_index': centers[block]},
+                          dissimilarity_measure=method)
+            evaluations = compare_models_searchlight(
+                sl_RDM, models, method=eval_method, theta=theta,
+                n_jobs=n_jobs)
+            volume[np.unravel_index(centers[block], volume_shape)] = \
+                evaluations
+        del data, neighbors
+    if isinstance(volume, np.memmap):
+        volume.flush()
+    return volume
+
+
+def _open_output_volume(out_file, shape, affine=None):
+    """creates a NaN filled output volume, memory-mapped to out_file if given"""
+    if out_file is None:
+        return np.full(shape, np.nan)
+    if str(out_file).endswith('.nii'):
+        nibabel = import_nibabel()
+        header = nibabel.Nifti1Header()
+        header.set_data_shape(shape)
+        header.set_data_dtype(np.float32)
+        if affine is not None:
+            header.set_qform(affine, code='scanner')
+            header.set_sform(affine, code='scanner')
+        header.set_data_offset(352)
+        offset = int(header.get_data_offset())
+        with open(out_file, 'wb') as f:
+            header.write_to(f)
+            f.truncate(offset + 4 * int(np.prod(shape)))
+        # NIfTI stores the voxels in Fortran order
+        volume = np.memmap(out_file, dtype='<f4', mode='r+', offset=offset,
+                           shape=shape, order='F')
+    else:
+        volume = np.lib.format.open_memmap(
+            out_file, mode='w+', dtype=np.float64, shape=shape)
+    volume[:] = np.nan
+    return volume
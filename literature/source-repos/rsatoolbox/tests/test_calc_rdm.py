@@ -148,6 +148,38 @@ class TestCalcRDM(unittest.TestCase):
         )
         assert np.all(rdm.rdm_descriptors['subj'] == np.array([0, 0, 0]))
 
+    @parameterized.expand(['euclidean', 'correlation', 'mahalanobis',
+                           'crossnobis', 'poisson'])
+    def test_calc_list_stacked(self, method):
+        """equally shaped datasets are computed together; the result
+        matches the RDMs of the single datasets"""
+        datasets = []
+        for subj in range(3):
+            data = deepcopy(self.test_data)
+            data.measurements = self.rng.random(data.measurements.shape)
+            data.descriptors['subj'] = subj
+            datasets.append(data)
+        noise = [np.eye(5) * (i + 1) for i in range(3)]
+        rdm = rsr.calc_rdm(datasets, descriptor='conds', method=method,
+                           cv_descriptor='fold', noise=noise)
+        for i, data in enumerate(datasets):
+            rdm_i = rsr.calc_rdm(data, descriptor='conds', method=method,
+                                 cv_descriptor='fold', noise=noise[i])
+            assert_array_almost_equal(
+                rdm.dissimilarities[i], rdm_i.dissimilarities[0])
+            assert_array_equal(rdm.pattern_descriptors['conds'],
+                               rdm_i.pattern_descriptors['conds'])
+        assert_array_equal(rdm.rdm_descriptors['subj'], [0, 1, 2])
+        assert rdm.dissimilarity_measure == rdm_i.dissimilarity_measure
+
+    def test_calc_list_not_stacked(self):
+        """datasets with different conditions are merged with from_partials"""
+        data2 = deepcopy(self.test_data)
+        data2.obs_descriptors['conds'] = data2.obs_descriptors['conds'] + 1
+        rdm = rsr.calc_rdm([self.test_data, data2], descriptor='conds')
+        assert rdm.n_cond == 7
+        assert np.isnan(rdm.dissimilarities[0, 5])
+
     def test_calc_mahalanobis(self):
         rdm = rsr.calc_rdm(
             self.test_data,
@@ -208,6 +240,32 @@ class TestCalcRDM(unittest.TestCase):
         )
         np.testing.assert_equal(rdm1.dissimilarities, rdm2.dissimilarities)
 
+    def test_calc_crossnobis_matches_fold_loop(self):
+        """the closed form training means equal explicit per fold averages,
+        also with unequal numbers of observations per condition"""
+        data = rsa.data.Dataset(
+            self.rng.random((24, 5)),
+            obs_descriptors={
+                'conds': np.tile([0, 1, 2, 2, 3, 3, 3, 1], 3),
+                'fold': np.repeat([0, 1, 2], 8)})
+        obs_before = deepcopy(data.obs_descriptors)
+        rdm = rsr.calc_rdm_crossnobis(
+            data, descriptor='conds', cv_descriptor='fold')
+        expected = []
+        for fold in range(3):
+            test = rsa.data.average_dataset_by(
+                data.subset_obs('fold', fold), 'conds')[0]
+            train = rsa.data.average_dataset_by(
+                data.subset_obs('fold', np.setdiff1d([0, 1, 2], fold)),
+                'conds')[0]
+            kernel = train @ test.T
+            diss = np.diag(kernel)[None] + np.diag(kernel)[:, None] \
+                - kernel - kernel.T
+            expected.append(diss[np.triu_indices(4, k=1)] / 5)
+        assert_array_almost_equal(
+            rdm.dissimilarities[0], np.mean(expected, axis=0))
+        self.assertEqual(data.obs_descriptors.keys(), obs_before.keys())
+
     def test_calc_crossnobis_no_descriptors(self):
         rdm = rsr.calc_rdm_crossnobis(
             self.test_data_balanced,
@@ -251,6 +309,35 @@ class TestCalcRDM(unittest.TestCase):
         )
         assert rdm.n_cond == 6
 
+    def test_calc_crossnobis_noise_per_fold_values(self):
+        """fold specific noise: each pair of folds uses the inverse of the
+        average of their noise covariances"""
+        noise = self.rng.standard_normal((3, 10, 5))
+        noise = np.einsum('ijk,ijl->ikl', noise, noise)
+        data = rsa.data.Dataset(
+            self.rng.random((15, 5)),
+            obs_descriptors={'conds': np.tile(np.arange(5), 3),
+                             'fold': np.repeat(np.arange(3), 5)})
+        rdm = rsr.calc_rdm_crossnobis(
+            data, descriptor='conds', cv_descriptor='fold', noise=noise)
+        rdm_list = rsr.calc_rdm_crossnobis(
+            data, descriptor='conds', cv_descriptor='fold',
+            noise=list(noise))
+        variances = np.linalg.inv(noise)
+        expected = []
+        for i, j in [(0, 1), (0, 2), (1, 2)]:
+            meas_i = data.measurements[5 * i:5 * (i + 1)]
+            meas_j = data.measurements[5 * j:5 * (j + 1)]
+            kernel = meas_i @ np.linalg.inv(
+                (variances[i] + variances[j]) / 2) @ meas_j.T
+            diss = np.diag(kernel)[None] + np.diag(kernel)[:, None] \
+                - kernel - kernel.T
+            expected.append(diss[np.triu_indices(5, k=1)] / 5)
+        assert_array_almost_equal(
+            rdm.dissimilarities[0], np.mean(expected, axis=0))
+        assert_array_almost_equal(
+            rdm.dissimilarities, rdm_list.dissimilarities)
+
     def test_calc_poisson_6_conditions(self):
         rdm = rsr.calc_rdm(
             self.test_data,
@@ -526,6 +613,39 @@ class TestCalcRDMMovie(unittest.TestCase):
         assert len([r for r in rdm]) == 5
         assert rdm.rdm_descriptors['time'][0] == np.mean(time[:3])
 
+    def test_calc_rdm_movie_matches_single_times(self):
+        """the vectorized movie equals calc_rdm on each time point"""
+        time = self.test_data_time.time_descriptors['time']
+        bins = [time[[0, 4]], time[[1, 2]], time[5:]]
+        for method, kwargs in [
+                ('euclidean', {}),
+                ('correlation', {}),
+                ('crossnobis', {'cv_descriptor': 'fold'})]:
+            for time_bins in [None, bins]:
+                rdm = rsr.calc_rdm_movie(
+                    self.test_data_time,
+                    descriptor='conds',
+                    method=method,
+                    time_descriptor='time',
+                    bins=time_bins,
+                    **kwargs)
+                data = self.test_data_time if time_bins is None else \
+                    self.test_data_time.bin_time('time', time_bins)
+                for i, dat in enumerate(data.split_time('time')):
+                    rdm_single = rsr.calc_rdm(
+                        dat.time_as_observations('time'),
+                        descriptor='conds',
+                        method=method,
+                        **kwargs)
+                    assert_array_almost_equal(
+                        rdm[i].dissimilarities, rdm_single.dissimilarities)
+                assert_array_almost_equal(
+                    rdm.rdm_descriptors['time'],
+                    data.time_descriptors['time'])
+                self.assertEqual(
+                    rdm.pattern_descriptors['conds'],
+                    rdm_single.pattern_descriptors['conds'])
+
 
 class CvDescriptorTests(unittest.TestCase):
 
@@ -248,6 +248,67 @@ class TestCompareRDM(unittest.TestCase):
         result = compare(self.test_rdm1, self.test_rdm2, method='bures')
         result = compare(self.test_rdm1, self.test_rdm2, method='bures_metric')
 
+    def test_compare_prepared(self):
+        from rsatoolbox.rdm.compare import compare, prepare_rdms
+        for method in ['cosine', 'corr', 'spearman', 'rho-a', 'cosine_cov',
+                       'corr_cov', 'kendall', 'tau-a', 'bures']:
+            expected = compare(self.test_rdm1, self.test_rdm2, method=method)
+            prepared = prepare_rdms(self.test_rdm2, method=method)
+            assert_array_almost_equal(
+                compare(self.test_rdm1, prepared, method=method), expected)
+            assert_array_almost_equal(
+                compare(prepared, self.test_rdm1, method=method), expected.T)
+        prepared = prepare_rdms(self.test_rdm2, method='cosine_cov',
+                                sigma_k=np.eye(6))
+        assert_array_almost_equal(
+            compare(self.test_rdm1, prepared, method='cosine_cov'),
+            compare(self.test_rdm1, self.test_rdm2, method='cosine_cov'))
+        with raises(ValueError):
+            compare(self.test_rdm1, prepared, method='corr')
+
+    def test_compare_prepared_sigma_k(self):
+        """a sigma_k passed to compare must match the prepared one"""
+        from rsatoolbox.rdm.compare import compare, prepare_rdms
+        sigma_k = np.eye(6) + 0.5
+        for method in ['cosine_cov', 'corr_cov']:
+            expected = compare(self.test_rdm1, self.test_rdm2, method=method,
+                               sigma_k=sigma_k)
+            prepared = prepare_rdms(self.test_rdm2, method=method,
+                                    sigma_k=sigma_k)
+            assert_array_almost_equal(
+                compare(self.test_rdm1, prepared, method=method,
+                        sigma_k=sigma_k), expected)
+            with raises(ValueError):
+                compare(self.test_rdm1, prepare_rdms(self.test_rdm2, method),
+                        method=method, sigma_k=sigma_k)
+            with raises(ValueError):
+                compare(self.test_rdm1, prepared, method=method,
+                        sigma_k=np.eye(6))
+
+    def test_compare_functions_prepared(self):
+        """the compare_* functions accept prepared RDMs"""
+        from rsatoolbox.rdm.compare import (
+            prepare_rdms, compare_cosine, compare_correlation,
+            compare_spearman, compare_rho_a, compare_cosine_cov_weighted,
+            compare_correlation_cov_weighted, compare_kendall_tau,
+            compare_bures_similarity)
+        for func, method in [
+                (compare_cosine, 'cosine'),
+                (compare_correlation, 'corr'),
+                (compare_spearman, 'spearman'),
+                (compare_rho_a, 'rho-a'),
+                (compare_cosine_cov_weighted, 'cosine_cov'),
+                (compare_correlation_cov_weighted, 'corr_cov'),
+                (compare_kendall_tau, 'kendall'),
+                (compare_bures_similarity, 'bures')]:
+            prepared = prepare_rdms(self.test_rdm2, method=method)
+            assert_array_almost_equal(
+                func(self.test_rdm1, prepared),
+                func(self.test_rdm1, self.test_rdm2))
+        with raises(ValueError):
+            compare_cosine(
+                self.test_rdm1, prepare_rdms(self.test_rdm2, 'corr'))
+
 
 class TestCompareRDMNaN(unittest.TestCase):
 
@@ -389,6 +450,17 @@ class TestCompareRDMNaN(unittest.TestCase):
         result = compare(self.test_rdm1, self.test_rdm2, method='cosine_cov')
         result = compare(self.test_rdm1, self.test_rdm2, method='kendall')
 
+    def test_compare_prepared(self):
+        from rsatoolbox.rdm.compare import compare, prepare_rdms
+        for method in ['cosine', 'corr', 'spearman', 'rho-a', 'cosine_cov',
+                       'corr_cov']:
+            prepared = prepare_rdms(self.test_rdm2, method=method)
+            assert_array_almost_equal(
+                compare(self.test_rdm1, prepared, method=method),
+                compare(self.test_rdm1, self.test_rdm2, method=method))
+        with raises(ValueError):
+            compare(np.ones(15), prepare_rdms(self.test_rdm2), 'cosine')
+
     def test_nan_errors(self):
         from rsatoolbox.rdm.compare import _parse_input_rdms
         vec1 = np.array([1, np.nan, 3])
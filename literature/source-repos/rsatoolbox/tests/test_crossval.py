@@ -65,6 +65,74 @@ class TestCrossval(unittest.TestCase):
             rdm_descriptor='session')
         self.assertEqual(res.evaluations.shape[0], 10)
 
+    def test_dual_bootstrap_seed(self):
+        from rsatoolbox.inference import eval_dual_bootstrap
+        res1 = eval_dual_bootstrap(
+            self.m, self.rdms, N=6, k_rdm=2, k_pattern=2,
+            pattern_descriptor='type', rdm_descriptor='session', seed=3)
+        res2 = eval_dual_bootstrap(
+            self.m, self.rdms, N=6, k_rdm=2, k_pattern=2,
+            pattern_descriptor='type', rdm_descriptor='session', seed=3,
+            n_jobs=2)
+        np.testing.assert_array_equal(res1.evaluations, res2.evaluations)
+        np.testing.assert_array_equal(res1.noise_ceiling, res2.noise_ceiling)
+
+    def test_dual_bootstrap_random_checkpoint(self):
+        import os
+        import tempfile
+        from rsatoolbox.inference import eval_dual_bootstrap_random
+        kwargs = dict(n_rdm=2, n_pattern=4, pattern_descriptor='type',
+                      rdm_descriptor='session')
+        full = eval_dual_bootstrap_random(
+            self.m, self.rdms, N=8, seed=5, **kwargs)
+        with tempfile.TemporaryDirectory() as checkpoint:
+            eval_dual_bootstrap_random(
+                self.m, self.rdms, N=8, seed=5, checkpoint=checkpoint,
+                **kwargs)
+            self.assertTrue(os.path.isfile(
+                os.path.join(checkpoint, 'sample_000004.npz')))
+            # an interrupted run is missing the last samples
+            for i_sample in range(5, 8):
+                os.remove(os.path.join(
+                    checkpoint, 'sample_%06d.npz' % i_sample))
+            resumed = eval_dual_bootstrap_random(
+                self.m, self.rdms, N=8, checkpoint=checkpoint, **kwargs)
+            with self.assertRaises(ValueError):
+                eval_dual_bootstrap_random(
+                    self.m, self.rdms, N=8, seed=6, checkpoint=checkpoint,
+                    **kwargs)
+            for changed in [dict(N=9), dict(N=8, n_cv=3),
+                            dict(N=8, method='corr')]:
+                with self.assertRaises(ValueError):
+                    eval_dual_bootstrap_random(
+                        self.m, self.rdms, checkpoint=checkpoint,
+                        **changed, **kwargs)
+            with self.assertRaises(ValueError):
+                eval_dual_bootstrap_random(
+                    self.m, self.rdms.subset('session', [0, 1, 2, 4, 5, 7]),
+                    N=8, checkpoint=checkpoint,
+                    **kwargs)
+        np.testing.assert_array_equal(full.evaluations, resumed.evaluations)
+
+    def test_bootstrap_crossval_seed(self):
+        import tempfile
+        from rsatoolbox.inference import bootstrap_crossval
+        kwargs = dict(N=6, k_rdm=2, k_pattern=2, pattern_descriptor='type',
+                      rdm_descriptor='session', seed=3)
+        np.random.seed(10)
+        res1 = bootstrap_crossval(self.m, self.rdms, **kwargs)
+        # the caller's global random state is left alone
+        self.assertEqual(np.random.randint(1000000),
+                         np.random.RandomState(10).randint(1000000))
+        with tempfile.TemporaryDirectory() as checkpoint:
+            res2 = bootstrap_crossval(self.m, self.rdms, n_jobs=2,
+                                      checkpoint=checkpoint, **kwargs)
+            res3 = bootstrap_crossval(self.m, self.rdms,
+                                      checkpoint=checkpoint, **kwargs)
+        np.testing.assert_array_equal(res1.evaluations, res2.evaluations)
+        np.testing.assert_array_equal(res1.evaluations, res3.evaluations)
+        np.testing.assert_array_equal(res1.noise_ceiling, res2.noise_ceiling)
+
     def test_bootstrap_crossval_pattern(self):
         from rsatoolbox.inference import bootstrap_crossval
         rdms = self.rdms
@@ -401,6 +401,33 @@ class TestTemporalDataset(unittest.TestCase):
         self.assertEqual(data.obs_descriptors['conds'][0], obs_des['conds'][0])
         self.assertEqual(data.obs_descriptors['conds'][1], obs_des['conds'][1])
 
+    def test_temporaldataset_time_as_observations_repeated_time(self):
+        """time-points with equal time are grouped, in order of appearance
+        """
+        measurements = self.rng.random((3, 1, 4))
+        obs_des = {'conds': np.array([0, 1, 1])}
+        tim_des = {'time': np.array([20, 10, 20, 30])}
+        data_temporal = rsd.TemporalDataset(measurements=measurements,
+                                            obs_descriptors=obs_des,
+                                            time_descriptors=tim_des
+                                            )
+        data = data_temporal.time_as_observations('time')
+        self.assertEqual(data.n_obs, 12)
+        self.assertEqual(data.n_channel, 1)
+        assert_array_equal(
+            data.obs_descriptors['time'],
+            np.repeat([20, 20, 10, 30], 3))
+        assert_array_equal(
+            data.obs_descriptors['conds'], np.tile(obs_des['conds'], 4))
+        assert_array_equal(
+            data.measurements[:, 0],
+            measurements[:, 0, [0, 2, 1, 3]].T.ravel())
+        splited_list = data_temporal.split_time('time')
+        self.assertEqual(len(splited_list), 3)
+        self.assertEqual(splited_list[0].n_time, 2)
+        assert_array_equal(
+            splited_list[0].measurements, measurements[:, :, [0, 2]])
+
     def test_temporaldataset_time_as_channels(self):
         from rsatoolbox.data.dataset import TemporalDataset
         measurements = np.zeros((3, 2, 4)) # 3 trials, 2 channels, 4 timepoints
@@ -623,6 +650,32 @@ class TestSave(unittest.TestCase):
                       == chn_des['rois'])
         assert data_loaded.descriptors['subj'] == 0
 
+    def test_save_load_group(self):
+        import io
+        f = io.BytesIO()
+        rng = np.random.default_rng(0)
+        datasets = {}
+        for roi in ['V1', 'IT']:
+            for subj in ['1', '2']:
+                datasets[roi + '/' + subj] = rsd.Dataset(
+                    measurements=rng.random((6, 4)),
+                    descriptors={'subj': subj, 'roi': roi},
+                    obs_descriptors={'conds': np.array(
+                        ['a.r1', 'b.r1', 'c.r1', 'a.r2', 'b.r2', 'c.r2']),
+                        'run': np.array([1, 1, 1, 2, 2, 2])},
+                    channel_descriptors={'voxel': np.arange(4)})
+        for group, data in datasets.items():
+            data.save(f, file_type='hdf5', group=group, compression='gzip')
+        with self.assertRaises(ValueError):
+            datasets['IT/1'].save(f, file_type='hdf5', group='IT/1')
+        data_loaded = rsd.load_dataset(f, file_type='hdf5', group='IT/1')
+        np.testing.assert_array_equal(data_loaded.measurements,
+                                      datasets['IT/1'].measurements)
+        np.testing.assert_array_equal(data_loaded.obs_descriptors['run'],
+                                      [1, 1, 1, 2, 2, 2])
+        assert data_loaded.obs_descriptors['conds'][3] == 'a.r2'
+        assert data_loaded.descriptors['roi'] == 'IT'
+
 
 class TestOESplit(unittest.TestCase):
 
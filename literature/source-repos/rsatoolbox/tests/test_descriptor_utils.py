@@ -69,6 +69,19 @@ class TestDescriptorUtils(unittest.TestCase):
                 {'foo': ['bar', 'bar2']}
                 )
 
+    def test_repeat_index(self):
+        from rsatoolbox.util.descriptor_utils import repeat_index
+        descriptor = np.array([3, 1, 2, 1, 5])
+        np.testing.assert_array_equal(
+            repeat_index(descriptor, [1, 3, 1, 4]), [1, 3, 0, 1, 3])
+        np.testing.assert_array_equal(repeat_index(descriptor, 2), [2])
+        np.testing.assert_array_equal(
+            repeat_index(['a', 'b', 'a'], ['a']), [0, 2])
+        np.testing.assert_array_equal(
+            repeat_index([(0, 1), 'b', 2], [2, 'b']), [2, 1])
+        np.testing.assert_array_equal(
+            repeat_index([1., np.nan, 2.], [np.nan, 2., 7.]), [2])
+
     def test_check_descriptor_length_error(self):
         from rsatoolbox.util.descriptor_utils import check_descriptor_length_error
         descriptors = {'foo': ['bar', 'bar2']}
@@ -93,6 +93,50 @@ class TestEvaluation(unittest.TestCase):
         eval_bootstrap_rdm(self.m, self.rdms, N=10)
         eval_bootstrap_rdm(self.m, self.rdms, N=10, boot_noise_ceil=True)
 
+    def test_eval_bootstrap_batched(self):
+        from rsatoolbox.inference import eval_bootstrap
+        from rsatoolbox.inference.evaluate import _bootstrap_counts
+        from rsatoolbox.inference import boot_noise_ceiling
+        from rsatoolbox.rdm import compare
+        np.random.seed(1)
+        result = eval_bootstrap(self.m, self.rdms, N=10, method='corr',
+                                batched=True)
+        np.random.seed(1)
+        rdm_counts, _ = _bootstrap_counts(np.arange(11), 10)
+        pattern_counts, n_groups = _bootstrap_counts(np.arange(5), 10)
+        pred = self.m.predict_rdm()
+        for i in range(10):
+            if n_groups[i] < 3:
+                self.assertTrue(np.isnan(result.evaluations[i, 0]))
+                continue
+            rdm_idx = np.repeat(np.arange(11), rdm_counts[i])
+            pattern_idx = np.repeat(np.arange(5), pattern_counts[i])
+            sample = self.rdms.subsample('index', rdm_idx)
+            sample = sample.subsample_pattern('index', pattern_idx)
+            sample.rdm_descriptors['index'] = rdm_idx
+            expected = np.mean(compare(
+                pred.subsample_pattern('index', pattern_idx), sample, 'corr'))
+            self.assertAlmostEqual(result.evaluations[i, 0], expected)
+            self.assertAlmostEqual(
+                result.noise_ceiling[0, i],
+                boot_noise_ceiling(sample, method='corr')[0])
+
+    def test_eval_bootstrap_rdm_batched(self):
+        from rsatoolbox.inference import eval_bootstrap_rdm
+        from rsatoolbox.inference.evaluate import _bootstrap_counts
+        from rsatoolbox.rdm import compare
+        np.random.seed(2)
+        result = eval_bootstrap_rdm(self.m, self.rdms, N=20, method='spearman',
+                                    boot_noise_ceil=False, batched=True)
+        np.random.seed(2)
+        rdm_counts, _ = _bootstrap_counts(np.arange(11), 20)
+        for i in range(20):
+            sample = self.rdms.subsample(
+                'index', np.repeat(np.arange(11), rdm_counts[i]))
+            self.assertAlmostEqual(
+                result.evaluations[i, 0],
+                np.mean(compare(self.m.predict_rdm(), sample, 'spearman')))
+
     def test_bootstrap_testset(self):
         from rsatoolbox.inference import bootstrap_testset
         bootstrap_testset(self.m, self.rdms, method='cosine', fitter=None, N=100,
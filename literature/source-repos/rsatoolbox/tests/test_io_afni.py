@@ -0,0 +1,123 @@
+"""Tests for AFNI BRIK/HEAD I/O functions
+"""
+from unittest import TestCase
+from os.path import join
+from tempfile import TemporaryDirectory
+import gzip
+import numpy as np
+
+
+def write_afni(prefix, bricks, labels, brick_types=None, factors=None,
+               byteorder='LSB_FIRST'):
+    """writes a minimal AFNI dataset for testing"""
+    shape = bricks[0].shape
+    n_bricks = len(bricks)
+    if brick_types is None:
+        brick_types = [3] * n_bricks
+    if factors is None:
+        factors = [0.0] * n_bricks
+    labs = '~'.join(labels) + '~'
+    head = ''
+    for attr_type, name, values in [
+            ('integer-attribute', 'DATASET_RANK', [3, n_bricks, 0, 0, 0, 0, 0, 0]),
+            ('integer-attribute', 'DATASET_DIMENSIONS', list(shape) + [0, 0]),
+            ('integer-attribute', 'BRICK_TYPES', brick_types),
+            ('float-attribute', 'BRICK_FLOAT_FACS', factors),
+            ('float-attribute', 'IJK_TO_DICOM_REAL',
+             [3, 0, 0, -10, 0, 3, 0, -20, 0, 0, 3, -30])]:
+        head += '\ntype = %s\nname = %s\ncount = %d\n' % (
+            attr_type, name, len(values))
+        head += ' '.join(str(v) for v in values) + '\n'
+    for name, value in [('BRICK_LABS', labs),
+                        ('BYTEORDER_STRING', byteorder + '~')]:
+        head += "\ntype = string-attribute\nname = %s\ncount = %d\n'%s\n" % (
+            name, len(value), value)
+    with open(prefix + '.HEAD', 'w', encoding='latin-1') as f:
+        f.write(head)
+    order = '>' if byteorder == 'MSB_FIRST' else '<'
+    dtypes = {1: 'i2', 3: 'f4'}
+    return b''.join(
+        brick.astype(order + dtypes[t]).tobytes(order='F')
+        for brick, t in zip(bricks, brick_types))
+
+
+class TestIoAfni(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.bricks = [rng.random((4, 3, 2)).astype(np.float32)
+                       for _ in range(4)]
+        self.labels = ['Full_Fstat', 'FBM.Mean60.r1#0_Coef',
+                       'FBM.Mean60.r1#0_Tstat', 'Pred.Mean60#0_Coef']
+
+    def test_read_head(self):
+        from rsatoolbox.io.afni import read_head
+        with TemporaryDirectory() as tmp:
+            prefix = join(tmp, 'stats.1+tlrc')
+            write_afni(prefix, self.bricks, self.labels)
+            header = read_head(prefix + '.HEAD')
+        self.assertEqual(header['BRICK_LABS'], '~'.join(self.labels))
+        self.assertEqual(header['BYTEORDER_STRING'], 'LSB_FIRST')
+        np.testing.assert_array_equal(header['DATASET_DIMENSIONS'][:3],
+                                      [4, 3, 2])
+        np.testing.assert_array_equal(header['BRICK_FLOAT_FACS'], 0)
+
+    def test_get_coefs(self):
+        from rsatoolbox.io.afni import AfniDataset
+        with TemporaryDirectory() as tmp:
+            prefix = join(tmp, 'stats.1+tlrc')
+            with open(prefix + '.BRIK', 'wb') as f:
+                f.write(write_afni(prefix, self.bricks, self.labels))
+            dset = AfniDataset(prefix + '.HEAD')
+            self.assertEqual(dset.shape, (4, 3, 2))
+            self.assertEqual(dset.labels, self.labels)
+            coefs = dset.get_coefs(['FBM.Mean60.r1', 'FBM.Mean60.r2',
+                                    'Pred.Mean60'])
+            self.assertEqual(list(coefs), ['FBM.Mean60.r1', 'Pred.Mean60'])
+            np.testing.assert_array_equal(coefs['FBM.Mean60.r1'],
+                                          self.bricks[1])
+            np.testing.assert_array_equal(coefs['Pred.Mean60'],
+                                          self.bricks[3])
+            self.assertFalse(coefs['Pred.Mean60'].flags.writeable)
+            self.assertEqual(dset.affine[0, 3], -10)
+            del coefs, dset
+
+    def test_scaled_big_endian_gzip(self):
+        from rsatoolbox.io.afni import AfniDataset
+        bricks = [np.arange(24).reshape(4, 3, 2) - 5,
+                  np.arange(24).reshape(4, 3, 2).astype(np.float32)]
+        with TemporaryDirectory() as tmp:
+            prefix = join(tmp, 'mask+tlrc')
+            data = write_afni(prefix, bricks, ['a', 'b'], brick_types=[1, 3],
+                              factors=[0.5, 0], byteorder='MSB_FIRST')
+            with gzip.open(prefix + '.BRIK.gz', 'wb') as f:
+                f.write(data)
+            dset = AfniDataset(prefix)
+            np.testing.assert_array_equal(dset.get_subbrick('a'),
+                                          bricks[0] * 0.5)
+            np.testing.assert_array_equal(dset.get_subbrick(1), bricks[1])
+
+    def test_write_dataset(self):
+        from rsatoolbox.io.afni import (
+            AfniDataset, FUNC_TT_TYPE, read_head, write_dataset)
+        with TemporaryDirectory() as tmp:
+            prefix = join(tmp, 'stats.1+tlrc')
+            with open(prefix + '.BRIK', 'wb') as f:
+                f.write(write_afni(prefix, self.bricks, self.labels))
+            template = AfniDataset(prefix)
+            out = join(tmp, 'glt.1+tlrc')
+            write_dataset(out, self.bricks[:2], ['a#0_Coef', 'a#0_Tstat'],
+                          header=template.header,
+                          stataux=[(1, FUNC_TT_TYPE, [97])])
+            dset = AfniDataset(out)
+            self.assertEqual(dset.labels, ['a#0_Coef', 'a#0_Tstat'])
+            self.assertEqual(dset.n_bricks, 2)
+            np.testing.assert_array_equal(dset.get_subbrick('a#0_Tstat'),
+                                          self.bricks[1])
+            np.testing.assert_array_equal(dset.affine, template.affine)
+            header = read_head(out + '.HEAD')
+            np.testing.assert_array_equal(header['BRICK_STATAUX'],
+                                          [1, 3, 1, 97])
+            np.testing.assert_allclose(header['BRICK_STATS'][1],
+                                       self.bricks[0].max(), rtol=1e-6)
+            del dset, template
@@ -147,6 +147,24 @@ class TestRDM(unittest.TestCase):
         assert_array_equal(rdms_sample.pattern_descriptors['type'],
                            [0, 1, 2, 2, 2, 2])
 
+    def test_rdm_subsample_missing_values(self):
+        """values that are not present or NaN select nothing"""
+        dis = np.zeros((3, 10))
+        rdms = rsr.RDMs(
+            dissimilarities=dis,
+            rdm_descriptors={'session': np.array([1., np.nan, 2.])},
+            pattern_descriptors={'type': np.array([1., np.nan, 2., 3., 3.])})
+        rdms_sample = rdms.subsample_pattern('type', [7])
+        self.assertEqual(rdms_sample.n_rdm, 3)
+        self.assertEqual(rdms_sample.n_cond, 0)
+        self.assertEqual(len(rdms_sample.pattern_descriptors['type']), 0)
+        rdms_sample = rdms.subsample_pattern('type', [np.nan, 3., 1.])
+        self.assertEqual(rdms_sample.n_cond, 3)
+        assert_array_equal(rdms_sample.pattern_descriptors['index'],
+                           [0, 3, 4])
+        self.assertEqual(rdms.subsample('session', [np.nan]).n_rdm, 0)
+        self.assertEqual(rdms.subsample('session', [5]).n_rdm, 0)
+
     def test_rdm_idx(self):
         dis = np.zeros((8, 10))
         mes = "Euclidean"
@@ -4,6 +4,7 @@
 """
 # pylint: disable=import-outside-toplevel, no-self-use
 import unittest
+from importlib.util import find_spec
 import numpy as np
 
 
@@ -144,3 +145,269 @@ class TestSearchlight(unittest.TestCase):
         for neighbors in neighbors_trunc:
             neighbor_coords = np.unravel_index(neighbors, mask.shape)
             assert np.all(mask[neighbor_coords] == 1)
+
+    def test_get_searchlight_RDMs_batched(self):
+        """Batched searchlight RDMs match calc_rdm on one Dataset per center"""
+        from rsatoolbox.util.searchlight import get_searchlight_RDMs
+        from rsatoolbox.data.dataset import Dataset
+        from rsatoolbox.rdm.calc import calc_rdm
+
+        rng = np.random.default_rng(1)
+        events = np.array(['b', 'a', 'c', 'd'] * 3)
+        data_2d = rng.random((len(events), 20))
+        centers = np.arange(8)
+        neighbors = [rng.choice(20, size=3 + (c % 3), replace=False)
+                     for c in centers]
+        for method in ['correlation', 'euclidean', 'mahalanobis']:
+            sl_RDMs = get_searchlight_RDMs(
+                data_2d, centers, neighbors, events, method=method,
+                verbose=False, max_memory=1)
+            expected = calc_rdm(
+                [Dataset(data_2d[:, nb], obs_descriptors={'events': events})
+                 for nb in neighbors],
+                method=method, descriptor='events')
+            np.testing.assert_allclose(
+                sl_RDMs.dissimilarities, expected.dissimilarities)
+            np.testing.assert_array_equal(
+                sl_RDMs.rdm_descriptors['voxel_index'], centers)
+            assert sl_RDMs.dissimilarity_measure == method
+
+    def test_get_volume_searchlight_matches_neighbors(self):
+        """Vectorized searchlight finds the same centers and neighbors as
+        _get_searchlight_neighbors applied to every voxel"""
+        from rsatoolbox.util.searchlight import (
+            get_volume_searchlight, _get_searchlight_neighbors)
+
+        rng = np.random.default_rng(2)
+        mask = (rng.random((6, 7, 5)) > 0.3).astype(int)
+        for truncate in [False, True]:
+            for radius in [1, 2, 2.5]:
+                centers, neighbors = get_volume_searchlight(
+                    mask, radius=radius, threshold=0.6,
+                    truncate_at_boundary=truncate, chunk_size=17)
+                expected_centers = []
+                expected_neighbors = []
+                for center in zip(*np.nonzero(mask)):
+                    nb = _get_searchlight_neighbors(
+                        mask, center, radius, truncate)
+                    if mask[nb].mean() >= 0.6:
+                        expected_centers.append(
+                            np.ravel_multi_index(center, mask.shape))
+                        expected_neighbors.append(
+                            np.ravel_multi_index(nb, mask.shape))
+                np.testing.assert_array_equal(centers, expected_centers)
+                assert len(neighbors) == len(expected_neighbors)
+                for nb, expected in zip(neighbors, expected_neighbors):
+                    np.testing.assert_array_equal(nb, expected)
+
+    def test_searchlight_neighbors_indexing(self):
+        """negative indices count from the end like in a list"""
+        from rsatoolbox.util.searchlight import SearchlightNeighbors
+        neighbors = SearchlightNeighbors.from_list([[0, 1], [2], [3, 4, 5]])
+        np.testing.assert_array_equal(neighbors[-1], [3, 4, 5])
+        np.testing.assert_array_equal(neighbors[-3], [0, 1])
+        with self.assertRaises(IndexError):
+            neighbors[3]
+        with self.assertRaises(IndexError):
+            neighbors[-4]
+
+    def test_save_load_volume_searchlight(self):
+        from tempfile import TemporaryDirectory
+        from os.path import join
+        from rsatoolbox.util.searchlight import (
+            get_volume_searchlight, save_volume_searchlight,
+            load_volume_searchlight)
+
+        mask = np.zeros((5, 5, 5), dtype=int)
+        mask[1:4, 1:4, 1:4] = 1
+        centers, neighbors = get_volume_searchlight(mask, radius=1)
+        with TemporaryDirectory() as tmp:
+            filename = join(tmp, 'searchlight.npz')
+            save_volume_searchlight(filename, centers, neighbors)
+            centers_loaded, neighbors_loaded = load_volume_searchlight(
+                filename)
+        np.testing.assert_array_equal(centers, centers_loaded)
+        np.testing.assert_array_equal(neighbors.indptr, neighbors_loaded.indptr)
+        np.testing.assert_array_equal(
+            neighbors.indices, neighbors_loaded.indices)
+
+    def test_get_volume_searchlight_cache(self):
+        from tempfile import TemporaryDirectory
+        from unittest.mock import patch
+        from rsatoolbox.util import searchlight
+
+        mask = np.zeros((5, 5, 5), dtype=int)
+        mask[1:4, 1:4, 1:4] = 1
+        with TemporaryDirectory() as tmp:
+            centers, neighbors = searchlight.get_volume_searchlight(
+                mask, radius=1, threshold=0.5, cache_dir=tmp)
+            with patch.object(searchlight, '_get_searchlight_stencil') as stencil:
+                centers_cached, neighbors_cached = \
+                    searchlight.get_volume_searchlight(
+                        mask, radius=1, threshold=0.5, cache_dir=tmp)
+                stencil.assert_not_called()
+            np.testing.assert_array_equal(centers, centers_cached)
+            np.testing.assert_array_equal(
+                neighbors.indices, neighbors_cached.indices)
+            # loaded as read-only memory maps
+            assert not neighbors_cached.indices.flags.writeable
+            # a different radius is a different geometry
+            centers_r2, _ = searchlight.get_volume_searchlight(
+                mask, radius=2, threshold=0.5, cache_dir=tmp)
+            assert len(centers_r2) != len(centers)
+            del neighbors_cached, centers_cached
+
+    def test_get_searchlight_RDMs_n_jobs(self):
+        """Searchlight RDMs computed by worker processes match n_jobs=1"""
+        from rsatoolbox.util.searchlight import get_searchlight_RDMs
+
+        rng = np.random.default_rng(3)
+        events = np.repeat(np.arange(4), 2)
+        data_2d = rng.random((len(events), 30))
+        centers = np.arange(10)
+        neighbors = [rng.choice(30, size=4 + (c % 2), replace=False)
+                     for c in centers]
+        for method in ['correlation', 'poisson']:
+            expected = get_searchlight_RDMs(
+                data_2d, centers, neighbors, events, method=method,
+                verbose=False)
+            sl_RDMs = get_searchlight_RDMs(
+                data_2d, centers, neighbors, events, method=method,
+                verbose=False, max_memory=1, n_jobs=2)
+            np.testing.assert_allclose(
+                sl_RDMs.dissimilarities, expected.dissimilarities)
+
+    def test_compare_models_searchlight(self):
+        """Bulk searchlight evaluation matches compare for each searchlight"""
+        from rsatoolbox.util.searchlight import compare_models_searchlight
+        from rsatoolbox.rdm import RDMs, compare
+        from rsatoolbox.model import ModelFixed, ModelSelect
+
+        rng = np.random.default_rng(4)
+        sl_RDM = RDMs(rng.random((7, 10)),
+                      rdm_descriptors={'voxel_index': np.arange(7)})
+        model_rdms = rng.random((2, 10))
+        model_rdms[1, :5] = 1  # ties
+        models = [ModelFixed('a', model_rdms[0]),
+                  ModelFixed('b', model_rdms[1]),
+                  ModelSelect('c', RDMs(model_rdms))]
+        for method in ['cosine', 'corr', 'spearman', 'rho-a', 'tau-a']:
+            evaluations = compare_models_searchlight(
+                sl_RDM, models, method=method)
+            assert evaluations.shape == (7, 3)
+            for k, model in enumerate(models[:2]):
+                expected = compare(model.predict_rdm(), sl_RDM, method)[0]
+                np.testing.assert_allclose(evaluations[:, k], expected)
+            for i in range(7):
+                theta = models[2].fit(sl_RDM[i], method=method)
+                expected = compare(
+                    models[2].predict_rdm(theta), sl_RDM[i], method)
+                np.testing.assert_allclose(evaluations[i, 2], expected[0, 0])
+
+    def test_compare_models_searchlight_nan(self):
+        """NaN entries of the model are ignored"""
+        from rsatoolbox.util.searchlight import compare_models_searchlight
+        from rsatoolbox.rdm import RDMs, compare
+        from rsatoolbox.model import ModelFixed
+
+        rng = np.random.default_rng(5)
+        model_rdm = rng.random(10)
+        model_rdm[[2, 7]] = np.nan
+        dissimilarities = rng.random((4, 10))
+        dissimilarities[:, [2, 7]] = np.nan
+        dissimilarities[3, 0] = np.nan
+        evaluations = compare_models_searchlight(
+            RDMs(dissimilarities), ModelFixed('a', model_rdm),
+            method='spearman')
+        expected = compare(RDMs(model_rdm), RDMs(dissimilarities[:3]),
+                           'spearman')[0]
+        np.testing.assert_allclose(evaluations[:3, 0], expected)
+        assert np.isnan(evaluations[3, 0])
+
+    def _model_map_inputs(self):
+        from rsatoolbox.util.searchlight import get_volume_searchlight
+        from rsatoolbox.model import ModelFixed
+
+        rng = np.random.default_rng(6)
+        mask = np.zeros((5, 6, 4), dtype=int)
+        mask[1:4, 1:5, 1:3] = 1
+        centers, neighbors = get_volume_searchlight(
+            mask, radius=1.5, threshold=0.5, truncate_at_boundary=True)
+        events = np.repeat(np.arange(5), 2)
+        data_2d = rng.random((len(events), mask.size))
+        models = [ModelFixed('a', rng.random(10)),
+                  ModelFixed('b', rng.random(10))]
+        return mask, centers, neighbors, events, data_2d, models
+
+    def test_searchlight_model_map(self):
+        """Block-wise evaluation matches evaluating all searchlights at once"""
+        from tempfile import TemporaryDirectory
+        from os.path import join
+        from rsatoolbox.util.searchlight import (
+            searchlight_model_map, get_searchlight_RDMs,
+            compare_models_searchlight)
+
+        mask, centers, neighbors, events, data_2d, models = \
+            self._model_map_inputs()
+        expected = compare_models_searchlight(
+            get_searchlight_RDMs(data_2d, centers, neighbors, events,
+                                 verbose=False),
+            models, method='spearman')
+        coords = np.unravel_index(centers, mask.shape)
+        volume = searchlight_model_map(
+            data_2d, centers, neighbors, events, models, mask.shape,
+            eval_method='spearman', block_size=5, verbose=False)
+        assert volume.shape == mask.shape + (2,)
+        np.testing.assert_allclose(volume[coords], expected)
+        assert np.all(np.isnan(volume[mask == 0]))
+        with TemporaryDirectory() as tmp:
+            filename = join(tmp, 'map.npy')
+            volume = searchlight_model_map(
+                data_2d, centers, neighbors, events, models, mask.shape,
+                eval_method='spearman', block_size=7, out_file=filename,
+                verbose=False)
+            del volume
+            np.testing.assert_allclose(np.load(filename)[coords], expected)
+
+    def test_searchlight_model_map_averages_once(self):
+        """The patterns are averaged once, not once per block"""
+        from unittest.mock import patch
+        from rsatoolbox.util import searchlight
+
+        mask, centers, neighbors, events, data_2d, models = \
+            self._model_map_inputs()
+        expected = searchlight.searchlight_model_map(
+            data_2d, centers, neighbors, events, models, mask.shape,
+            verbose=False)
+        for n_jobs in [1, 2]:
+            with patch.object(searchlight, '_average_patterns',
+                              wraps=searchlight._average_patterns) as avg:
+                volume = searchlight.searchlight_model_map(
+                    data_2d, centers, neighbors, events, models, mask.shape,
+                    block_size=3, n_jobs=n_jobs, verbose=False)
+            assert avg.call_count == 1
+            np.testing.assert_allclose(volume, expected)
+
+    @unittest.skipIf(find_spec('nibabel') is None, 'nibabel not installed')
+    def test_searchlight_model_map_nifti(self):
+        from tempfile import TemporaryDirectory
+        from os.path import join
+        import nibabel
+        from rsatoolbox.util.searchlight import searchlight_model_map
+
+        mask, centers, neighbors, events, data_2d, models = \
+            self._model_map_inputs()
+        affine = np.diag([2., 2., 2., 1.])
+        expected = searchlight_model_map(
+            data_2d, centers, neighbors, events, models, mask.shape,
+            verbose=False)
+        with TemporaryDirectory() as tmp:
+            filename = join(tmp, 'map.nii')
+            volume = searchlight_model_map(
+                data_2d, centers, neighbors, events, models, mask.shape,
+                out_file=filename, affine=affine, verbose=False)
+            del volume
+            img = nibabel.load(filename)
+            np.testing.assert_allclose(img.affine, affine)
+            np.testing.assert_allclose(img.get_fdata(), expected, rtol=1e-6)
+            del img
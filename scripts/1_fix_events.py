@@ -6,13 +6,26 @@ peer×feedback order derived from normal participants.
 Two modes:
   - majority: build a per-run template from the majority label at each trial
   - subject:  use a single normal subject as the template
+
+Every events.tsv is parsed once (in parallel) into an in-memory table; the
+template is built from those tables and the corrected copies are written
+in parallel. A copy is only rewritten when the input file or the template
+changed since the last run (see --state), or when the copy itself was
+modified. The report is kept as columns and written as TSV, or as Parquet
+when --report ends in .parquet (needs pandas + pyarrow).
 """
 
 from __future__ import annotations
 
 import argparse
 import csv
+import hashlib
+import io
+import json
+import os
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
 FEEDBACK = {
@@ -26,6 +39,8 @@ FEEDBACK = {
     "Nice80_fdkn",
 }
 
+REPORT_COLUMNS = ["subj", "run", "trial", "old_event", "new_event", "status"]
+
 
 def find_events(bids_dir: Path):
     return sorted(bids_dir.glob("sub-*/func/sub-*_task-learn_run-*_events.tsv"))
@@ -38,25 +53,40 @@ def sub_run_from_name(path: Path):
     return subj, run
 
 
-def build_template_majority(bids_dir: Path):
+def read_events(path: Path, bids_dir: Path):
+    """Parses one events.tsv into a table dict, or None if it has no event column."""
+    data = path.read_bytes()
+    # universal newlines, like open(), so CRLF files parse the same
+    lines = io.StringIO(data.decode(), newline=None)
+    header = lines.readline().strip().split("\t")
+    if "event" not in header:
+        return None
+    subj, run = sub_run_from_name(path)
+    return {
+        "rel": str(path.relative_to(bids_dir)),
+        "subj": subj,
+        "run": run,
+        "digest": hashlib.sha256(data).hexdigest(),
+        "header": header,
+        "i_event": header.index("event"),
+        "i_trial": header.index("trial"),
+        "rows": [r.rstrip("\n").split("\t") for r in lines if r.strip()],
+    }
+
+
+def feedback_trials(table):
+    """Yields (trial, event) for the feedback rows of one table."""
+    i_event, i_trial = table["i_event"], table["i_trial"]
+    for row in table["rows"]:
+        if row[i_event] in FEEDBACK:
+            yield int(float(row[i_trial])), row[i_event]
+
+
+def build_template_majority(tables):
     counts = defaultdict(lambda: defaultdict(Counter))
-    for ev in find_events(bids_dir):
-        _, run = sub_run_from_name(ev)
-        with ev.open() as f:
-            header = f.readline().strip().split("\t")
-            if "event" not in header:
-                continue
-            i_event = header.index("event")
-            i_trial = header.index("trial")
-            for line in f:
-                if not line.strip():
-                    continue
-                cols = line.rstrip("\n").split("\t")
-                event = cols[i_event]
-                if event not in FEEDBACK:
-                    continue
-                trial = int(float(cols[i_trial]))
-                counts[run][trial][event] += 1
+    for table in tables:
+        for trial, event in feedback_trials(table):
+            counts[table["run"]][trial][event] += 1
     template = defaultdict(dict)
     for run, trial_map in counts.items():
         for trial, counter in trial_map.items():
@@ -69,91 +99,131 @@ def build_template_majority(bids_dir: Path):
     return template
 
 
-def build_template_from_subject(bids_dir: Path, subj: str):
+def build_template_from_subject(tables, subj: str):
     template = defaultdict(dict)
-    for ev in find_events(bids_dir):
-        s, run = sub_run_from_name(ev)
-        if s != subj:
-            continue
-        with ev.open() as f:
-            header = f.readline().strip().split("\t")
-            if "event" not in header:
-                continue
-            i_event = header.index("event")
-            i_trial = header.index("trial")
-            for line in f:
-                if not line.strip():
-                    continue
-                cols = line.rstrip("\n").split("\t")
-                event = cols[i_event]
-                if event not in FEEDBACK:
-                    continue
-                trial = int(float(cols[i_trial]))
-                template[run][trial] = event
+    for table in tables:
+        if table["subj"] == subj:
+            template[table["run"]].update(feedback_trials(table))
     return template
 
 
+def template_hash(template) -> str:
+    items = sorted((run, trial, event) for run, trials in template.items() for trial, event in trials.items())
+    return hashlib.sha256(json.dumps(items).encode()).hexdigest()
+
+
+def output_matches(path: Path, entry) -> bool:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return False
+    return [stat.st_size, stat.st_mtime_ns] == entry.get("stat")
+
+
+def fix_table(table, previous, template, t_hash: str, out_dir: Path, force: bool):
+    """Relabels one table; rewrites its copy unless it is up to date.
+
+    Returns (report rows, state entry, written).
+    """
+    i_event, i_trial = table["i_event"], table["i_trial"]
+    run_template = template.get(table["run"], {})
+    report = []
+    for row in table["rows"]:
+        if row[i_event] != "nopred_fdbk":
+            continue
+        new_event = run_template.get(int(float(row[i_trial])))
+        if new_event:
+            row[i_event] = new_event
+        report.append([table["subj"], table["run"], row[i_trial], "nopred_fdbk",
+                       new_event or "NA", "fixed" if new_event else "unresolved"])
+
+    out_path = out_dir / table["rel"]
+    entry = {"input": table["digest"], "template": t_hash}
+    if (not force and previous and previous.get("input") == entry["input"]
+            and previous.get("template") == t_hash and output_matches(out_path, previous)):
+        return report, previous, False
+
+    buf = io.StringIO(newline="")
+    writer = csv.writer(buf, delimiter="\t")
+    writer.writerow(table["header"])
+    writer.writerows(table["rows"])
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open("w", newline="") as f:
+        f.write(buf.getvalue())
+    stat = out_path.stat()
+    entry["stat"] = [stat.st_size, stat.st_mtime_ns]
+    return report, entry, True
+
+
+def write_report(path: Path, columns):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".parquet":
+        try:
+            import pandas as pd
+
+            pd.DataFrame(columns).to_parquet(path, index=False)
+        except ImportError as exc:
+            raise SystemExit(f"Parquet report needs pandas and pyarrow: {exc}")
+        return
+    with path.open("w", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(REPORT_COLUMNS)
+        writer.writerows(zip(*(columns[name] for name in REPORT_COLUMNS)))
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--bids-dir", required=True, type=Path)
     ap.add_argument("--out-dir", required=True, type=Path)
-    ap.add_argument("--report", required=True, type=Path)
+    ap.add_argument("--report", required=True, type=Path,
+                    help="Fix report (.tsv, or .parquet for a columnar file)")
     ap.add_argument("--mode", choices=["majority", "subject"], default="majority")
     ap.add_argument("--template-subj", help="Required if mode=subject")
+    ap.add_argument("--state", type=Path,
+                    help="Hash state of the written copies (default: <out-dir>/.fix_events_state.json)")
+    ap.add_argument("--force", action="store_true", help="Rewrite every copy")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                    help="Parallel parse/write workers")
     args = ap.parse_args()
 
-    if args.mode == "subject":
-        if not args.template_subj:
-            raise SystemExit("Need --template-subj when mode=subject")
-        template = build_template_from_subject(args.bids_dir, args.template_subj)
-    else:
-        template = build_template_majority(args.bids_dir)
-
-    report_rows = []
-    fixed = 0
-    unresolved = 0
-    total = 0
-
-    for ev in find_events(args.bids_dir):
-        rel = ev.relative_to(args.bids_dir)
-        out_path = args.out_dir / rel
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-
-        with ev.open() as f:
-            header = f.readline().strip().split("\t")
-            if "event" not in header:
-                continue
-            i_event = header.index("event")
-            i_trial = header.index("trial")
-            rows = [r.rstrip("\n").split("\t") for r in f if r.strip()]
-
-        for row in rows:
-            if row[i_event] != "nopred_fdbk":
-                continue
-            total += 1
-            trial = int(float(row[i_trial]))
-            _, run = sub_run_from_name(ev)
-            new_event = template.get(run, {}).get(trial)
-            if new_event:
-                row[i_event] = new_event
-                fixed += 1
-                report_rows.append([*sub_run_from_name(ev), row[i_trial], "nopred_fdbk", new_event, "fixed"])
-            else:
-                unresolved += 1
-                report_rows.append([*sub_run_from_name(ev), row[i_trial], "nopred_fdbk", "NA", "unresolved"])
-
-        with out_path.open("w", newline="") as f:
-            writer = csv.writer(f, delimiter="\t")
-            writer.writerow(header)
-            writer.writerows(rows)
-
-    args.report.parent.mkdir(parents=True, exist_ok=True)
-    with args.report.open("w", newline="") as f:
-        writer = csv.writer(f, delimiter="\t")
-        writer.writerow(["subj", "run", "trial", "old_event", "new_event", "status"])
-        writer.writerows(report_rows)
-
-    print(f"[template_fix] total={total} fixed={fixed} unresolved={unresolved}")
+    if args.mode == "subject" and not args.template_subj:
+        raise SystemExit("Need --template-subj when mode=subject")
+    state_path = args.state or args.out_dir / ".fix_events_state.json"
+    state = json.loads(state_path.read_text()) if state_path.is_file() else {}
+
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        tables = [t for t in pool.map(partial(read_events, bids_dir=args.bids_dir),
+                                      find_events(args.bids_dir), chunksize=16) if t]
+
+        if args.mode == "subject":
+            template = build_template_from_subject(tables, args.template_subj)
+        else:
+            template = build_template_majority(tables)
+        t_hash = template_hash(template)
+
+        worker = partial(fix_table, template=template, t_hash=t_hash, out_dir=args.out_dir,
+                         force=args.force)
+        results = pool.map(worker, tables, [state.get(t["rel"]) for t in tables], chunksize=16)
+
+        columns = {name: [] for name in REPORT_COLUMNS}
+        new_state = {}
+        written = 0
+        for table, (report, entry, wrote) in zip(tables, results):
+            for name, values in zip(REPORT_COLUMNS, zip(*report)):
+                columns[name].extend(values)
+            new_state[table["rel"]] = entry
+            written += wrote
+
+    write_report(args.report, columns)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = state_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(new_state, indent=1, sort_keys=True))
+    os.replace(tmp, state_path)
+
+    total = len(columns["status"])
+    fixed = columns["status"].count("fixed")
+    print(f"[template_fix] total={total} fixed={fixed} unresolved={total - fixed}")
+    print(f"[template_fix] wrote {written} of {len(tables)} files ({len(tables) - written} up to date)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+RSA-learn Stage 2: run-wise AFNI timing files (NonPM + Anticipation).
+
+Python port of the original awk fan-out in 2_generate_timing.sh. Each
+subject's four events.tsv files are parsed once and their rows grouped
+by event label in a single pass; all timing files of a subject are then
+written together. Subjects run in parallel worker processes.
+
+The output is byte-identical to the bash version:
+  - events.tsv copies of the 4 runs in the subject's timing folder
+  - NonPM_<peer>_<fdkm|fdkn>_runN.1D and Anticipation_pred_fdk_runN.1D,
+    padded to 4 rows with '*' for the other runs
+  - <peer>_<pred|rsp>_runN.1D (single line, not padded)
+  - the multi-run <name>.1D files, one line per run
+Fields are split on blanks like awk's default FS, and onset/duration are
+copied as text, so numbers are never reformatted.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+TOPDIR = Path("/data/projects/STUDIES/LEARN/fMRI")
+RUNS = [1, 2, 3, 4]
+
+# Event names in events.tsv use Mean_60_* and Nice_60_* (underscore) but
+# Mean80_* and Nice80_* (no underscore); file names use Mean60, ..., Nice80.
+PEERS = [("Mean_60", "Mean60"), ("Mean80", "Mean80"), ("Nice_60", "Nice60"), ("Nice80", "Nice80")]
+
+# (timing file stem, BIDS event label, padded to 4 rows)
+TIMINGS = (
+    [(f"NonPM_{name}_{fb}", f"{event}_{fb}", True) for event, name in PEERS for fb in ("fdkm", "fdkn")]
+    + [(f"{name}_{kind}", f"{event}_{kind}", False) for event, name in PEERS for kind in ("pred", "rsp")]
+    + [("Anticipation_pred_fdk", "isi", True)]
+)
+
+_FIELD = re.compile(rb"[^ \t\n]+")
+
+
+def events_name(subj: str, run: int) -> str:
+    return f"sub-{subj}_task-learn_run-{run:02d}_events.tsv"
+
+
+def group_events(path: Path):
+    """Maps event label ($3) to the joined b'onset:duration ' pairs of one run."""
+    pairs = {}
+    if not path.is_file():
+        return pairs
+    for line in path.read_bytes().split(b"\n"):
+        fields = _FIELD.findall(line)
+        if len(fields) >= 3:
+            pairs.setdefault(fields[2], []).append(b"%s:%s " % (fields[0], fields[1]))
+    return {label: b"".join(chunks) for label, chunks in pairs.items()}
+
+
+def pad_rows(line: bytes, run: int) -> bytes:
+    rows = [b"*"] * len(RUNS)
+    rows[run - 1] = line or b"*"
+    return b"".join(row + b"\n" for row in rows)
+
+
+def generate_subject(subj: str, bids_dir: Path, timing_root: Path):
+    """Copies the events of one subject and writes all of its timing files."""
+    out_dir = timing_root / f"sub-{subj}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob(f"sub-{subj}_task-learn_run-0*_events.tsv"):
+        old.unlink()
+
+    missing = []
+    runs = {}
+    for run in RUNS:
+        src = bids_dir / f"sub-{subj}" / "func" / events_name(subj, run)
+        if src.is_file():
+            shutil.copy(src, out_dir)
+        else:
+            missing.append(run)
+        runs[run] = group_events(out_dir / events_name(subj, run))
+
+    for stem, label, padded in TIMINGS:
+        lines = [runs[run].get(label.encode(), b"") for run in RUNS]
+        for run, line in zip(RUNS, lines):
+            (out_dir / f"{stem}_run{run}.1D").write_bytes(pad_rows(line, run) if padded else line)
+        (out_dir / f"{stem}.1D").write_bytes(b"".join(line + b"\n" for line in lines))
+    return subj, missing
+
+
+def read_subjects(subj_list: Path):
+    return subj_list.read_text().split()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--subj-list", type=Path,
+                    default=Path(os.environ.get("SUBJ_LIST_OVERRIDE",
+                                                TOPDIR / "code/afni/subjList_LEARN.txt")),
+                    help='Subject list file (one ID per line, no "sub-")')
+    ap.add_argument("--bids-dir", type=Path,
+                    default=Path(os.environ.get("BIDS_DIR_OVERRIDE", TOPDIR / "RSA-learn/bids_fixed")))
+    ap.add_argument("--timing-root", type=Path,
+                    default=Path(os.environ.get("TIMING_ROOT_OVERRIDE",
+                                                TOPDIR / "RSA-learn/TimingFiles/Fixed2")))
+    ap.add_argument("--subjects", nargs="+",
+                    help="Subject IDs to process instead of the subject list")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                    help="Parallel subject workers")
+    args = ap.parse_args()
+
+    subjects = args.subjects or read_subjects(args.subj_list)
+    worker = partial(generate_subject, bids_dir=args.bids_dir, timing_root=args.timing_root)
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for subj, missing in pool.map(worker, subjects):
+            print(f"[RSA-learn] Generated NonPM run-wise timing files for sub-{subj}", flush=True)
+            for run in missing:
+                print(f"[RSA-learn]   WARN: sub-{subj} has no run-{run:02d} events "
+                      f"(that run's rows are '*')", flush=True)
+
+    print(f"[RSA-learn] Timing files for {len(subjects)} subjects in {args.timing_root}")
+
+
+if __name__ == "__main__":
+    main()
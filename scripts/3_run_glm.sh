@@ -8,7 +8,8 @@
 # Standard workflow:
 #   1) Generate afni_proc scripts (per subject)
 #   2) Clean output directories (avoid "already exists")
-#   3) Run the GLM from the correct working directory
+#   3) Run the GLM from the correct working directory, via the
+#      memory- and load-aware scheduler 3c_glm_scheduler.py
 #
 # SUBJECT DISCOVERY:
 #   - No subject list required.
@@ -18,7 +19,15 @@
 #       $BIDS_DIR/sub-*
 #
 # PARALLELIZATION:
-#   - Use MAX_JOBS to cap parallel subjects (default: CPU cores)
+#   - Use MAX_JOBS to cap parallel subjects for proc generation and
+#     cleaning (default: CPU cores)
+#   - GLMs are admitted by 3c_glm_scheduler.py against a RAM budget
+#     (GLM_MEM_GB, default 80% of RAM) and a CPU budget (MAX_CPUS,
+#     default CPU cores), estimating each subject's memory from its
+#     run count and volume dimensions. Running GLMs are tracked in
+#     the scheduler state file ($LOG_DIR/glm_scheduler_state.json).
+#   - Failed subjects are retried GLM_RETRIES times (default 1);
+#     FALLBACK_PRIORITY=high|low runs 2-3 run subjects first or last
 #
 # FALLBACK:
 #   - If a subject has 2–3 runs, rewrite afni_proc inputs to those runs
@@ -28,7 +37,9 @@
 # Usage:
 #   bash 3_run_glm.sh
 #   MAX_JOBS=4 bash 3_run_glm.sh
+#   GLM_MEM_GB=200 MAX_CPUS=60 bash 3_run_glm.sh
 #   SUBJ_ROOT=/path/to/sub-*/ bash 3_run_glm.sh
+#   SUBJECTS_OVERRIDE="958 1028" bash 3_run_glm.sh   # skip discovery
 #
 # Optional toggles (default = 1):
 #   MAKE_PROC=1   CLEAN_OUT=1   RUN_GLM=1
@@ -49,6 +60,8 @@ BIDS_DIR="${BIDS_DIR_OVERRIDE:-$TOPDIR/bids}"
 
 AP_ORIG="$SCRIPT_DIR/3a_afni_proc_template.sh"
 AP_FALLBACK="$SCRIPT_DIR/3b_fallback_patch.py"
+GLM_SCHEDULER="$SCRIPT_DIR/3c_glm_scheduler.py"
+GLM_STATE="${GLM_STATE:-$LOG_DIR/glm_scheduler_state.json}"
 
 MAKE_PROC="${MAKE_PROC:-1}"
 CLEAN_OUT="${CLEAN_OUT:-1}"
@@ -56,6 +69,11 @@ RUN_GLM="${RUN_GLM:-1}"
 MAX_JOBS="${MAX_JOBS:-}"
 LOAD_LIMIT="${LOAD_LIMIT:-}"
 SUBJ_ROOT="${SUBJ_ROOT:-$TIMING_ROOT}"
+SUBJECTS_OVERRIDE="${SUBJECTS_OVERRIDE:-}"
+GLM_MEM_GB="${GLM_MEM_GB:-}"
+MAX_CPUS="${MAX_CPUS:-}"
+GLM_RETRIES="${GLM_RETRIES:-1}"
+FALLBACK_PRIORITY="${FALLBACK_PRIORITY:-low}"
 
 mkdir -p "$TMP_DIR" "$LOG_DIR" "$RESULTS_DIR"
 
@@ -67,7 +85,12 @@ Usage:
 Env:
   MAX_JOBS=N            # parallel subjects (default: CPU cores)
   LOAD_LIMIT=N          # 1-min loadavg threshold to start a new subject (default: MAX_JOBS)
+  GLM_MEM_GB=N          # RAM budget for concurrent GLMs (default: 80% of RAM)
+  MAX_CPUS=N            # CPU budget for concurrent GLMs (default: CPU cores)
+  GLM_RETRIES=N         # retries per failed subject (default: 1)
+  FALLBACK_PRIORITY=low # run 2-3 run subjects before (high) or after (low) the rest
   SUBJ_ROOT=/path/to/sub-*/  # override discovery root
+  SUBJECTS_OVERRIDE="958 1028"  # explicit subject IDs, no discovery
   TIMING_ROOT_OVERRIDE=/path/to/timing
   BIDS_DIR_OVERRIDE=/path/to/bids
 
@@ -98,7 +121,11 @@ if [ -z "${LOAD_LIMIT}" ]; then
 fi
 
 SUBJECTS=()
-mapfile -t SUBJECTS < <(discover_subjects "$SUBJ_ROOT" || true)
+if [ -n "$SUBJECTS_OVERRIDE" ]; then
+  read -r -a SUBJECTS <<< "$SUBJECTS_OVERRIDE"
+else
+  mapfile -t SUBJECTS < <(discover_subjects "$SUBJ_ROOT" || true)
+fi
 
 if [ "${#SUBJECTS[@]}" -eq 0 ]; then
   echo "[RSA-learn] No subjects found in $SUBJ_ROOT"
@@ -117,7 +144,7 @@ echo "[RSA-learn] MAX_JOBS=$MAX_JOBS  LOAD_LIMIT=$LOAD_LIMIT"
 
 is_running() {
   local subj="$1"
-  pgrep -f "proc\.${subj}\.LEARN_RSA_runwise_AFNI" >/dev/null 2>&1
+  python3 "$GLM_SCHEDULER" --state-file "$GLM_STATE" --is-running "$subj"
 }
 
 proc_gen() {
@@ -171,22 +198,6 @@ clean_out() {
   fi
 }
 
-run_glm() {
-  local subj="$1"
-  if is_running "$subj"; then
-    echo "[RSA-learn] SKIP RUN (running): $subj"
-    return 0
-  fi
-  PROC="$RESULTS_DIR/$subj/proc.${subj}.LEARN_RSA_runwise_AFNI"
-  if [ ! -f "$PROC" ]; then
-    echo "[RSA-learn] MISSING PROC: $PROC"
-    return 0
-  fi
-  mkdir -p "$RESULTS_DIR/$subj"
-  echo "[RSA-learn] RUN: $subj"
-  ( cd "$RESULTS_DIR/$subj" && tcsh -xef "proc.${subj}.LEARN_RSA_runwise_AFNI" 2>&1 | tee "output.proc.${subj}.LEARN_RSA_runwise_AFNI" )
-}
-
 run_parallel() {
   local fn="$1"; shift
   local subj
@@ -221,5 +232,11 @@ if [ "$CLEAN_OUT" -eq 1 ]; then
 fi
 
 if [ "$RUN_GLM" -eq 1 ]; then
-  run_parallel run_glm "${SUBJECTS[@]}"
+  SCHED_ARGS=(--results-dir "$RESULTS_DIR" --bids-dir "$BIDS_DIR" --state-file "$GLM_STATE"
+              --load-limit "$LOAD_LIMIT" --retries "$GLM_RETRIES"
+              --fallback-priority "$FALLBACK_PRIORITY")
+  [ -n "$GLM_MEM_GB" ] && SCHED_ARGS+=(--mem-gb "$GLM_MEM_GB")
+  [ -n "$MAX_CPUS" ] && SCHED_ARGS+=(--cpu-budget "$MAX_CPUS")
+  echo "[RSA-learn] RUN GLMs via $(basename "$GLM_SCHEDULER")"
+  python3 "$GLM_SCHEDULER" "${SCHED_ARGS[@]}" "${SUBJECTS[@]}" 2>&1 | tee -a "$LOG_DIR/glm_scheduler.log"
 fi
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+RSA-learn Stage 3c: memory- and load-aware GLM scheduler.
+
+Runs the per-subject proc.<subj>.LEARN_RSA_runwise_AFNI scripts written by
+the proc_gen step of 3_run_glm.sh. Instead of a fixed number of parallel
+subjects, every job is admitted against a RAM and CPU budget:
+
+  - memory need  = base + bytes/sample * (voxels x volumes summed over the
+                   subject's BOLD runs, read from the NIfTI headers)
+  - CPU need     = the -jobs value of 3dDeconvolve in the proc script
+
+bytes/sample starts at a conservative default and is calibrated from the
+peak RSS of every finished job, so estimates improve as subjects complete.
+A job is also held back while the 1-minute load average is above the load
+limit or while the machine has less memory available than the job needs
+(the server is shared).
+
+All running jobs are recorded in a JSON state file guarded by a lock file,
+so several scheduler invocations (e.g. parallel run_pipeline.py nodes)
+share one budget, and `--is-running SUBJ` replaces the old pgrep check.
+Failed subjects are cleaned and retried; a job killed by the OOM killer is
+retried with a 1.5x larger memory estimate. Fallback subjects (2-3 runs)
+are queued separately, before or after the 4-run subjects, and either
+queue backfills when the other's next job does not fit.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import gzip
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+TOPDIR = Path("/data/projects/STUDIES/LEARN/fMRI")
+RSA_DIR = TOPDIR / "RSA-learn"
+GLM = "LEARN_RSA_runwise_AFNI"
+GIB = 1024 ** 3
+
+BASE_BYTES = 1 * GIB          # per-job overhead independent of data size
+DEFAULT_BYTES_PER_SAMPLE = 16  # ~4 float copies of the data before calibration
+SAFETY = 1.15                  # margin on calibrated estimates
+OOM_GROWTH = 1.5
+
+
+def log(msg: str = ""):
+    print(f"[{time.strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+def nifti_samples(path: Path) -> int:
+    """Voxels x volumes of a NIfTI-1 image, from its header only."""
+    opener = gzip.open if path.name.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        header = f.read(348)
+    for endian in "<>":
+        if struct.unpack(endian + "i", header[:4])[0] == 348:
+            dim = struct.unpack(endian + "8h", header[40:56])
+            break
+    else:
+        raise ValueError(f"Not a NIfTI-1 header: {path}")
+    samples = 1
+    for size in dim[1:dim[0] + 1]:
+        samples *= max(1, size)
+    return samples
+
+
+def bold_runs(bids_dir: Path, subj: str):
+    return sorted((bids_dir / f"sub-{subj}" / "func").glob(f"sub-{subj}_task-learn_run-*_bold.nii.gz"))
+
+
+def proc_path(results_dir: Path, subj: str) -> Path:
+    return results_dir / subj / f"proc.{subj}.{GLM}"
+
+
+def proc_cpus(proc: Path) -> int:
+    match = re.search(r"-jobs\s+(\d+)", proc.read_text(errors="replace"))
+    return int(match.group(1)) if match else 1
+
+
+def mem_available() -> int:
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return sys.maxsize
+
+
+def mem_total() -> int:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError):
+        return 16 * GIB
+
+
+def pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    if Path("/proc").is_dir():
+        return Path(f"/proc/{pid}").exists()
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class StateFile:
+    """JSON state shared by all scheduler invocations, guarded by flock."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock_path = path.with_name(path.name + ".lock")
+
+    @contextmanager
+    def locked(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            data = json.loads(self.path.read_text()) if self.path.is_file() else {}
+            data.setdefault("subjects", {})
+            data.setdefault("calibration", {})
+            yield data
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(data, indent=1, sort_keys=True))
+            os.replace(tmp, self.path)
+
+    def read(self):
+        with self.locked() as data:
+            return data
+
+
+def running(data):
+    """Subject entries of live GLM processes, from any scheduler invocation."""
+    return {subj: entry for subj, entry in data["subjects"].items()
+            if entry.get("status") == "running" and pid_alive(entry.get("pid"))}
+
+
+def bytes_per_sample(data, override):
+    if override:
+        return override
+    observed = data["calibration"].get("bytes_per_sample")
+    return observed * SAFETY if observed else DEFAULT_BYTES_PER_SAMPLE
+
+
+def build_jobs(args, data):
+    jobs = []
+    for subj in args.subjects:
+        proc = proc_path(args.results_dir, subj)
+        if not proc.is_file():
+            log(f"MISSING PROC: {proc}")
+            continue
+        runs = bold_runs(args.bids_dir, subj)
+        if len(runs) < 2:
+            log(f"SKIP (runs <2): {subj}")
+            continue
+        samples = sum(nifti_samples(run) for run in runs)
+        cpus = args.cpus_per_job or proc_cpus(proc)
+        jobs.append({
+            "subj": subj,
+            "fallback": len(runs) < 4,
+            "runs": len(runs),
+            "samples": samples,
+            "cpus": max(1, min(cpus, args.cpu_budget)),
+            "mem": int(BASE_BYTES + bytes_per_sample(data, args.bytes_per_sample) * samples),
+            "attempts": 0,
+        })
+    return jobs
+
+
+def clean_results(results_dir: Path, subj: str):
+    out_dir = results_dir / subj / f"{subj}.results.{GLM}"
+    if out_dir.is_dir():
+        log(f"CLEAN: {out_dir}")
+        shutil.rmtree(out_dir)
+
+
+def fits(job, data, args):
+    """Returns None if the job can start now, otherwise the reason it cannot."""
+    active = running(data)
+    used_mem = sum(entry["mem"] for entry in active.values())
+    used_cpus = sum(entry["cpus"] for entry in active.values())
+    if active and used_mem + job["mem"] > args.mem_budget:
+        return "memory budget"
+    if active and used_cpus + job["cpus"] > args.cpu_budget:
+        return "CPU budget"
+    if active and job["mem"] > mem_available():
+        return "available memory"
+    if args.load_limit and os.getloadavg()[0] >= args.load_limit:
+        return "load"
+    return None
+
+
+def start(job, args, data):
+    subj = job["subj"]
+    workdir = args.results_dir / subj
+    proc = proc_path(args.results_dir, subj)
+    if job["mem"] > args.mem_budget:
+        log(f"WARN: {subj} needs ~{job['mem'] / GIB:.1f} GiB, more than the "
+            f"{args.mem_budget / GIB:.1f} GiB budget; running it alone")
+    output = open(workdir / f"output.proc.{subj}.{GLM}", "w")
+    child = subprocess.Popen(["tcsh", "-xef", proc.name], cwd=workdir,
+                             stdout=output, stderr=subprocess.STDOUT)
+    output.close()
+    job["attempts"] += 1
+    data["subjects"][subj] = {
+        "status": "running", "pid": child.pid, "host": socket.gethostname(),
+        "mem": job["mem"], "cpus": job["cpus"], "runs": job["runs"],
+        "attempt": job["attempts"], "started": time.time(),
+    }
+    log(f"RUN: {subj} (attempt {job['attempts']}, {job['runs']} runs, "
+        f"~{job['mem'] / GIB:.1f} GiB, {job['cpus']} CPUs)")
+    return child
+
+
+def finish(job, child, status, rusage, data):
+    """Records a finished job; calibrates bytes/sample from its peak RSS."""
+    subj = job["subj"]
+    code = os.waitstatus_to_exitcode(status)
+    child.returncode = code
+    peak = rusage.ru_maxrss * 1024
+    entry = data["subjects"].get(subj, {})
+    entry.update(status="done" if code == 0 else "failed", pid=None, returncode=code,
+                 peak_rss=peak, ended=time.time())
+    data["subjects"][subj] = entry
+    if code == 0 and job["samples"]:
+        observed = max(0.0, (peak - BASE_BYTES) / job["samples"])
+        calibration = data["calibration"]
+        calibration["bytes_per_sample"] = max(calibration.get("bytes_per_sample", 0.0), observed)
+    return code
+
+
+def killed(results_dir: Path, subj: str) -> bool:
+    """True if the tail of the proc output shows a process killed by a signal (OOM)."""
+    output = results_dir / subj / f"output.proc.{subj}.{GLM}"
+    try:
+        with output.open("rb") as f:
+            f.seek(max(0, output.stat().st_size - 4096))
+            tail = f.read()
+    except OSError:
+        return False
+    return b"Killed" in tail
+
+
+def admit_order(queues, data, args):
+    """Yields the next job that fits: queue order first, then backfill."""
+    for queue in queues:
+        for job in queue:
+            if fits(job, data, args) is None:
+                return queue, job
+    return None, None
+
+
+def schedule(args):
+    state = StateFile(args.state_file)
+    with state.locked() as data:
+        jobs = build_jobs(args, data)
+    if not jobs:
+        log("No GLM jobs to run.")
+        return 0
+
+    full = sorted((j for j in jobs if not j["fallback"]), key=lambda j: -j["mem"])
+    fallback = sorted((j for j in jobs if j["fallback"]), key=lambda j: -j["mem"])
+    queues = [fallback, full] if args.fallback_priority == "high" else [full, fallback]
+    log(f"Scheduling {len(full)} full + {len(fallback)} fallback subjects: "
+        f"{args.mem_budget / GIB:.1f} GiB, {args.cpu_budget} CPUs, "
+        f"load limit {args.load_limit or 'off'}, {args.retries} retries")
+
+    children = {}
+    failed = []
+    while any(queues) or children:
+        for pid, (job, child) in list(children.items()):
+            done_pid, status, rusage = os.wait4(pid, os.WNOHANG)
+            if not done_pid:
+                continue
+            del children[pid]
+            with state.locked() as data:
+                code = finish(job, child, status, rusage, data)
+            if code == 0:
+                log(f"DONE: {job['subj']} (peak {rusage.ru_maxrss / 1024 ** 2:.1f} GiB)")
+                continue
+            oom = code in (-signal.SIGKILL, 128 + signal.SIGKILL) or killed(args.results_dir, job["subj"])
+            if job["attempts"] <= args.retries:
+                if oom:
+                    job["mem"] = int(job["mem"] * OOM_GROWTH)
+                log(f"FAIL: {job['subj']} (exit {code}{', killed' if oom else ''}); retrying")
+                clean_results(args.results_dir, job["subj"])
+                (fallback if job["fallback"] else full).append(job)
+            else:
+                log(f"FAIL: {job['subj']} (exit {code}); giving up after {job['attempts']} attempts")
+                failed.append(job["subj"])
+
+        while True:
+            with state.locked() as data:
+                queue, job = admit_order(queues, data, args)
+                if job is None:
+                    break
+                queue.remove(job)
+                child = start(job, args, data)
+            children[child.pid] = (job, child)
+        if children or any(queues):
+            time.sleep(args.poll)
+
+    if failed:
+        log(f"{len(failed)} subjects failed: {' '.join(failed)}")
+        return 1
+    log(f"All {len(jobs)} GLMs finished.")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("subjects", nargs="*", help="Subject IDs (no 'sub-')")
+    ap.add_argument("--results-dir", type=Path,
+                    default=Path(os.environ.get("RESULTS_DIR", RSA_DIR / "derivatives/afni/IndvlLvlAnalyses")))
+    ap.add_argument("--bids-dir", type=Path,
+                    default=Path(os.environ.get("BIDS_DIR_OVERRIDE", TOPDIR / "bids")))
+    ap.add_argument("--state-file", type=Path,
+                    default=Path(os.environ.get("GLM_STATE", RSA_DIR / "logs/glm_scheduler_state.json")))
+    ap.add_argument("--mem-gb", type=float, default=float(os.environ.get("GLM_MEM_GB") or 0),
+                    help="RAM budget for all GLMs (default: 80%% of physical memory)")
+    ap.add_argument("--cpu-budget", type=int,
+                    default=int(os.environ.get("MAX_CPUS") or os.cpu_count() or 1),
+                    help="CPU budget for all GLMs (default: CPU cores)")
+    ap.add_argument("--cpus-per-job", type=int, default=int(os.environ.get("GLM_CPUS_PER_JOB") or 0),
+                    help="CPUs charged per job (default: 3dDeconvolve -jobs of the proc script)")
+    ap.add_argument("--bytes-per-sample", type=float, default=0,
+                    help="Fixed memory per voxel x volume (default: calibrated from finished jobs)")
+    ap.add_argument("--load-limit", type=float, default=float(os.environ.get("LOAD_LIMIT") or 0),
+                    help="Do not start jobs while the 1-min loadavg is at or above this (0 = off)")
+    ap.add_argument("--retries", type=int, default=int(os.environ.get("GLM_RETRIES", 1)))
+    ap.add_argument("--fallback-priority", choices=["high", "low"],
+                    default=os.environ.get("FALLBACK_PRIORITY", "low"),
+                    help="Run 2-3 run subjects before (high) or after (low) 4-run subjects")
+    ap.add_argument("--poll", type=float, default=10, help="Seconds between scheduling passes")
+    ap.add_argument("--is-running", metavar="SUBJ",
+                    help="Exit 0 if a GLM for SUBJ is running, 1 otherwise")
+    args = ap.parse_args()
+
+    if args.is_running:
+        return 0 if args.is_running in running(StateFile(args.state_file).read()) else 1
+    args.mem_budget = int(args.mem_gb * GIB) if args.mem_gb else int(0.8 * mem_total())
+    return schedule(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
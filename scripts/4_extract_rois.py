@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+RSA-learn Stage 4: single-pass ROI extraction.
+
+Reads each subject's run-wise stats dataset once and computes the NZmean
+(non-zero mean beta) of all 41 conditions within every ROI mask at once.
+
+  - The BRIK is memory-mapped with rsatoolbox.io.afni, so only the
+    '#0_Coef' sub-bricks are touched and no AFNI binaries are needed.
+  - All ROI masks are combined into one integer label volume. Each label
+    is one combination of ROI memberships, so overlapping ROIs are handled
+    exactly. Per subject, sums and non-zero counts for every label and every
+    condition come from a single np.bincount; ROI values are label sums.
+  - Subjects run in parallel worker processes.
+
+Output keeps the Stage 4 layout: one CSV per ROI,
+Subject,FBM.Mean60.r1,...,Anticipation.PredFdk with "NA" for conditions
+missing in fallback subjects (2-3 runs).
+
+With --patterns, the full (conditions x voxels) beta matrix of every
+subject and ROI is also written to one HDF5 store for RSA. Each group
+<roi>/<subject> is an rsatoolbox Dataset (chunked, gzip compressed):
+
+  obs_descriptors      conds ('FBM.Mean60.r1'), condition ('FBM.Mean60'),
+                       run (1-4, 0 for regressors spanning all runs)
+  channel_descriptors  voxel (flat Fortran-order index on the GLM grid)
+  descriptors          subj, roi
+
+and is loaded on its own with
+  rsatoolbox.data.load_dataset(store, file_type="hdf5", group="vmPFC/958")
+Only the conditions present in a subject's stats file are stored, and
+voxels that are zero in every condition (outside the subject's brain
+mask) are dropped. With --rois, the groups of the other ROIs in an
+existing store are kept.
+
+Environment overrides RESULTS_DIR, MASKS_DIR, OUT_DIR and DRY_RUN are
+honoured as defaults, like the bash stages.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import h5py
+import numpy as np
+from rsatoolbox.data import Dataset
+from rsatoolbox.io.afni import AfniDataset, read_head
+
+TOPDIR = Path("/data/projects/STUDIES/LEARN/fMRI")
+RSA_DIR = TOPDIR / "RSA-learn"
+GLM = "LEARN_RSA_runwise_AFNI"
+PEERS = ["Mean60", "Mean80", "Nice60", "Nice80"]
+
+# 32 run-wise feedback (runs 1-4; Mean60, Mean80, Nice60, Nice80; FBM then FBN),
+# 8 prediction/response and 1 anticipation condition = 41 total
+ALL_CONDS = (
+    [f"{fb}.{peer}.r{run}" for run in range(1, 5) for peer in PEERS for fb in ("FBM", "FBN")]
+    + [f"{kind}.{peer}" for peer in PEERS for kind in ("Pred", "Resp")]
+    + ["Anticipation.PredFdk"]
+)
+
+# 6 core ROIs (Stage 4) and the 2 mentalizing ROIs prepared by Stage 4b
+ROI_FILES = [
+    ("vmPFC", "VMPFC-mask-final.nii.gz"),
+    ("dACC1", "dACC1-6mm-bilat.nii.gz"),
+    ("dACC2", "dACC2-6mm-bilat.nii.gz"),
+    ("AntInsula", "AntInsula-thr10-3mm-bilat.nii.gz"),
+    ("VS", "striatum-structural-3mm-VS-bilat.nii.gz"),
+    ("Amygdala", "Amyg_LR_resample+tlrc"),
+    ("RTPJ", "RTPJ_Mars_clustALL_R_resampled+tlrc"),
+    ("dmPFC", "dmPFC_Schurz2014_8mm+tlrc"),
+]
+
+LOGFILE = None
+
+
+def log(msg: str = ""):
+    line = f"[{time.strftime('%H:%M:%S')}] {msg}"
+    print(line, flush=True)
+    if LOGFILE is not None:
+        with LOGFILE.open("a") as f:
+            f.write(line + "\n")
+
+
+def stats_prefix(results_dir: Path, subj: str) -> Path:
+    return results_dir / subj / f"{subj}.results.{GLM}" / f"stats.{subj}+tlrc"
+
+
+def find_subjects(results_dir: Path):
+    subjects = [
+        d.name for d in results_dir.glob("*/")
+        if re.fullmatch(r"\d+", d.name)
+        and Path(str(stats_prefix(results_dir, d.name)) + ".HEAD").is_file()
+    ]
+    return sorted(subjects, key=int)
+
+
+def mask_exists(path: Path) -> bool:
+    # AFNI +tlrc datasets have .HEAD/.BRIK files
+    if path.name.endswith("+tlrc"):
+        return Path(str(path) + ".HEAD").is_file()
+    return path.is_file()
+
+
+def load_mask(path: Path) -> np.ndarray:
+    """Boolean (x, y, z) mask in voxel index order, like 3dROIstats sees it."""
+    if path.name.endswith("+tlrc"):
+        data = AfniDataset(str(path)).get_subbrick(0)
+    else:
+        import nibabel
+        data = np.asanyarray(nibabel.load(str(path)).dataobj)
+    data = data.reshape(data.shape[:3], order="F") if data.ndim > 3 else data
+    return data != 0
+
+
+def build_labels(masks):
+    """Combines ROI masks into one label per voxel.
+
+    Returns the flat (Fortran order) indices of voxels inside any ROI, the
+    label of each of these voxels and a (n_labels, n_rois) membership
+    matrix. A label is one distinct combination of ROI memberships.
+    """
+    bits = np.zeros(masks[0].size, dtype=np.int64)
+    for i_roi, mask in enumerate(masks):
+        bits |= mask.ravel(order="F").astype(np.int64) << i_roi
+    voxels = np.flatnonzero(bits)
+    combos, labels = np.unique(bits[voxels], return_inverse=True)
+    membership = (combos[:, None] >> np.arange(len(masks))) & 1
+    return voxels, labels, membership.astype(float)
+
+
+def load_betas(prefix: Path, voxels: np.ndarray):
+    """(n_available, n_voxels) Coef betas and the available condition indices."""
+    dset = AfniDataset(str(prefix))
+    coefs = dset.get_coefs(ALL_CONDS)
+    available = [i for i, cond in enumerate(ALL_CONDS) if cond in coefs]
+    betas = np.empty((len(available), len(voxels)))
+    for row, vol in zip(betas, coefs.values()):
+        if vol.shape != dset.shape:
+            raise ValueError(f"unexpected sub-brick shape {vol.shape}")
+        row[:] = vol.ravel(order="F")[voxels]
+    return betas, np.array(available, dtype=int), dset.shape
+
+
+def nzmeans(betas: np.ndarray, labels: np.ndarray, membership: np.ndarray):
+    """(n_conditions, n_rois) mean over non-zero voxels, 0 if there are none."""
+    n_cond, n_labels = betas.shape[0], membership.shape[0]
+    segment = (labels[None, :] + n_labels * np.arange(n_cond)[:, None]).ravel()
+    sums = np.bincount(segment, weights=betas.ravel(), minlength=n_cond * n_labels)
+    counts = np.bincount(segment, weights=(betas != 0).ravel(), minlength=n_cond * n_labels)
+    sums = sums.reshape(n_cond, n_labels) @ membership
+    counts = counts.reshape(n_cond, n_labels) @ membership
+    return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+
+def extract_subject(subj, results_dir, grid, voxels, labels, membership, patterns=False):
+    """Worker: one subject's (41, n_rois) NZmean table, NaN where missing.
+
+    With patterns=True the gathered betas and their condition indices are
+    returned as well, otherwise None.
+    """
+    try:
+        betas, available, shape = load_betas(stats_prefix(results_dir, subj), voxels)
+        if tuple(shape) != tuple(grid):
+            raise ValueError(f"stats grid {shape} does not match mask grid {grid}")
+        values = np.full((len(ALL_CONDS), membership.shape[1]), np.nan)
+        values[available] = nzmeans(betas, labels, membership)
+        return subj, values, (betas, available) if patterns else None, None
+    except Exception as exc:  # reported per subject, like an empty 3dROIstats row
+        return subj, None, None, f"{type(exc).__name__}: {exc}"
+
+
+def parse_condition(label: str):
+    """'FBM.Mean60.r1' -> ('FBM.Mean60', 1); run 0 if the label has no run."""
+    match = re.fullmatch(r"(.+)\.r(\d+)", label)
+    return (match.group(1), int(match.group(2))) if match else (label, 0)
+
+
+def save_patterns(store: Path, subj, rois, pattern, voxels, labels, membership):
+    """Writes one Dataset per ROI for a subject into the HDF5 store."""
+    betas, available = pattern
+    conds = [ALL_CONDS[i] for i in available]
+    condition, run = zip(*map(parse_condition, conds)) if conds else ((), ())
+    for i_roi, (name, _) in enumerate(rois):
+        columns = np.flatnonzero(membership[labels, i_roi])
+        columns = columns[np.any(betas[:, columns] != 0, axis=0)]
+        Dataset(
+            betas[:, columns],
+            descriptors={"subj": subj, "roi": name},
+            obs_descriptors={"conds": np.array(conds), "condition": np.array(condition),
+                             "run": np.array(run, dtype=int)},
+            channel_descriptors={"voxel": voxels[columns]},
+        ).save(str(store), file_type="hdf5", group=f"{name}/{subj}", compression="gzip")
+
+
+def copy_other_rois(source: Path, store: Path, rois):
+    """Copies the groups of ROIs not extracted in this run from an existing store."""
+    names = {name for name, _ in rois}
+    with h5py.File(source, "r") as src, h5py.File(store, "a") as dst:
+        for name in src:
+            if name not in names:
+                src.copy(src[name], dst, name=name)
+
+
+def format_value(value: float) -> str:
+    # 3dROIstats prints its means with %f
+    return "NA" if np.isnan(value) else f"{value:f}"
+
+
+def main():
+    global LOGFILE
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--results-dir", type=Path,
+                    default=Path(os.environ.get("RESULTS_DIR", RSA_DIR / "derivatives/afni/IndvlLvlAnalyses")))
+    ap.add_argument("--masks-dir", type=Path,
+                    default=Path(os.environ.get("MASKS_DIR", TOPDIR / "Masks")))
+    ap.add_argument("--out-dir", type=Path,
+                    default=Path(os.environ.get("OUT_DIR", RSA_DIR / "derivatives/afni/ROI_extractions")))
+    ap.add_argument("--log-dir", type=Path, default=RSA_DIR / "logs")
+    ap.add_argument("--rois", nargs="+", choices=[name for name, _ in ROI_FILES],
+                    help="Subset of ROIs to extract (default: all masks found)")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                    help="Parallel subject workers")
+    ap.add_argument("--patterns", type=Path, nargs="?", const=Path("roi_patterns.h5"),
+                    help="Also write voxel patterns to this HDF5 store "
+                         "(default: roi_patterns.h5, relative to --out-dir)")
+    ap.add_argument("--dry-run", action="store_true",
+                    default=os.environ.get("DRY_RUN", "0") == "1")
+    args = ap.parse_args()
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    args.log_dir.mkdir(parents=True, exist_ok=True)
+    LOGFILE = args.log_dir / f"4_extract_rois_{time.strftime('%Y%m%d_%H%M%S')}.log"
+
+    log("============================================================")
+    log(" RSA-learn Stage 4: ROI Extraction (single pass)")
+    log("============================================================")
+    log()
+    log(f"Results dir:  {args.results_dir}")
+    log(f"Masks dir:    {args.masks_dir}")
+    log(f"Output dir:   {args.out_dir}")
+    log(f"GLM label:    {GLM}")
+    log(f"Conditions:   {len(ALL_CONDS)}")
+    log(f"Workers:      {args.jobs}")
+    if args.patterns:
+        args.patterns = args.out_dir / args.patterns
+        log(f"Patterns:     {args.patterns}")
+    log(f"Dry run:      {int(args.dry_run)}")
+    log()
+
+    # 1. Discover subjects with a completed stats HEAD file
+    subjects = find_subjects(args.results_dir)
+    log(f"Found {len(subjects)} subjects with completed GLM results")
+    log(f"Subjects: {' '.join(subjects)}")
+    log()
+    if not subjects:
+        raise SystemExit("ERROR: No subjects found. Check RESULTS_DIR path.")
+
+    # 2. Verify ROI masks
+    log("Checking ROI masks...")
+    rois = []
+    for name, filename in ROI_FILES:
+        if args.rois and name not in args.rois:
+            continue
+        path = args.masks_dir / filename
+        if mask_exists(path):
+            log(f"  OK   {name} -> {path}")
+            rois.append((name, path))
+        else:
+            log(f"  MISS {name} -> {path}")
+    log(f"  Masks found: {len(rois)} / {len(args.rois or ROI_FILES)}")
+    log()
+    if not rois:
+        raise SystemExit("ERROR: No ROI masks found. Check MASKS_DIR path.")
+
+    # 3. Dry run: verify sub-brick labels and exit
+    if args.dry_run:
+        log("=== DRY RUN: verifying sub-brick labels ===")
+        log()
+        for subj in subjects:
+            head = read_head(str(stats_prefix(args.results_dir, subj)) + ".HEAD")
+            labels = set(head.get("BRICK_LABS", "").split("~"))
+            n_found = sum(cond + "#0_Coef" in labels for cond in ALL_CONDS)
+            log(f"  {subj}: {n_found} / {len(ALL_CONDS)} conditions found")
+        log()
+        log("=== DRY RUN complete. Set DRY_RUN=0 to extract. ===")
+        return
+
+    # 4. One label volume from all masks (masks must be on the GLM grid)
+    masks = [load_mask(path) for _, path in rois]
+    grid = masks[0].shape
+    for (name, _), mask in zip(rois, masks):
+        if mask.shape != grid:
+            raise SystemExit(f"ERROR: {name} mask grid {mask.shape} differs from {grid}")
+    voxels, labels, membership = build_labels(masks)
+    log(f"Label volume: {len(voxels)} ROI voxels in {membership.shape[0]} labels")
+    log()
+
+    # 5. Extract all subjects in parallel, each stats file read once
+    log("=== Beginning extraction ===")
+    worker = partial(extract_subject, results_dir=args.results_dir, grid=grid,
+                     voxels=voxels, labels=labels, membership=membership,
+                     patterns=bool(args.patterns))
+    if args.patterns:
+        # written to a temporary file first, so a failed run keeps the old store
+        store = args.patterns.with_name(args.patterns.name + ".tmp")
+        store.unlink(missing_ok=True)
+    results = {}
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for n_done, (subj, values, pattern, error) in enumerate(pool.map(worker, subjects), 1):
+            if error:
+                log(f"    WARN: {subj} failed ({error})")
+            else:
+                results[subj] = values
+                if args.patterns:
+                    save_patterns(store, subj, rois, pattern, voxels, labels, membership)
+            if n_done % 10 == 0:
+                log(f"    Progress: {n_done} / {len(subjects)}")
+    log(f"    Complete: {len(results)} extracted, {len(subjects) - len(results)} failed")
+    log()
+    if args.patterns and results:
+        if args.patterns.is_file():
+            copy_other_rois(args.patterns, store, rois)
+        os.replace(store, args.patterns)
+        log(f"Pattern store: {args.patterns}  ({len(results)} subjects x {len(rois)} ROIs)")
+        log()
+
+    # 6. Write one CSV per ROI
+    log("Output CSVs:")
+    for i_roi, (name, _) in enumerate(rois):
+        csv_file = args.out_dir / f"{name}_betas.csv"
+        with csv_file.open("w", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(["Subject", *ALL_CONDS])
+            for subj in subjects:
+                if subj in results:
+                    writer.writerow([subj, *map(format_value, results[subj][:, i_roi])])
+                else:
+                    # failed subjects keep their row, like the bash stage
+                    writer.writerow([subj] + ["NA"] * len(ALL_CONDS))
+        log(f"  {csv_file}  ({len(subjects)} subjects x {len(ALL_CONDS) + 1} columns)")
+    log()
+    log(f"Log file: {LOGFILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,11 @@ set -euo pipefail
 # R-TPJ comes from the shared AnatomicalROI_Masks archive.
 # dmPFC is created by this script using 3dUndump.
 #
+# This script prepares both masks on the GLM grid and then
+# runs the single-pass Stage 4 extractor (4_extract_rois.py)
+# for these two ROIs. Once the masks exist, plain Stage 4
+# extracts them together with the core ROIs.
+#
 # WHAT IT EXTRACTS: same 41 conditions as Stage 4
 #   - 32 run-wise feedback betas (8 conditions x 4 runs)
 #   - 8 prediction/response betas
@@ -37,7 +42,8 @@ set -euo pipefail
 #   derivatives/afni/ROI_extractions/dmPFC_betas.csv
 #
 # REQUIRES:
-#   - AFNI (3dROIstats, 3dresample, 3dUndump) in PATH
+#   - AFNI (3dresample, 3dUndump) in PATH for mask preparation
+#   - python3 with numpy and rsatoolbox for the extraction
 #   - Completed GLM results from Stage 3
 #   - R-TPJ source mask accessible (see RTPJ_SOURCE below)
 #
@@ -96,28 +102,6 @@ ROI_LOCAL=(
     "$MASKS_DIR/dmPFC_Schurz2014_8mm+tlrc"
 )
 
-# -------------------------------------------------------
-# CONDITIONS TO EXTRACT (same 41 as Stage 4)
-# -------------------------------------------------------
-
-ALL_CONDS=()
-
-for run in 1 2 3 4; do
-    for peer in Mean60 Mean80 Nice60 Nice80; do
-        ALL_CONDS+=("FBM.${peer}.r${run}")
-        ALL_CONDS+=("FBN.${peer}.r${run}")
-    done
-done
-
-for peer in Mean60 Mean80 Nice60 Nice80; do
-    ALL_CONDS+=("Pred.${peer}")
-    ALL_CONDS+=("Resp.${peer}")
-done
-
-ALL_CONDS+=("Anticipation.PredFdk")
-
-N_CONDS=${#ALL_CONDS[@]}
-
 ############################################################################################
 # FUNCTIONS
 ############################################################################################
@@ -131,81 +115,6 @@ get_stats_prefix() {
     echo "$RESULTS_DIR/$subj/$subj.results.$GLM/stats.$subj+tlrc"
 }
 
-parse_label_map() {
-    local head_file="$1"
-    local labels_raw
-    labels_raw=$(grep -A 2 "^name = BRICK_LABS" "$head_file" | tail -1 | tr -d "'")
-    LABEL_IDX=()
-    local idx=0
-    local IFS='~'
-    for label in $labels_raw; do
-        if [[ -n "$label" ]]; then
-            LABEL_IDX["$label"]=$idx
-            ((idx++)) || true
-        fi
-    done
-}
-
-extract_one_subject() {
-    local subj="$1"
-    local mask="$2"
-    local stats_prefix
-    stats_prefix=$(get_stats_prefix "$subj")
-
-    local -a avail_indices=()
-    local -a has_data=()
-
-    for cond in "${ALL_CONDS[@]}"; do
-        local coef_label="${cond}#0_Coef"
-        local idx="${LABEL_IDX[$coef_label]:-}"
-        if [[ -n "$idx" ]]; then
-            avail_indices+=("$idx")
-            has_data+=("1")
-        else
-            has_data+=("0")
-        fi
-    done
-
-    local -a values=()
-
-    if [[ ${#avail_indices[@]} -gt 0 ]]; then
-        local selector
-        selector=$(IFS=,; echo "${avail_indices[*]}")
-
-        local raw
-        raw=$(3dROIstats -nzmean -quiet \
-            -mask "$mask" \
-            "${stats_prefix}[${selector}]" 2>/dev/null) || true
-
-        # 3dROIstats -nzmean outputs TWO columns per line:
-        #   Mean  NZMean
-        # We want the LAST column (NZMean).
-        while IFS= read -r line; do
-            local val
-            val=$(echo "$line" | awk '{print $NF}')
-            [[ -n "$val" ]] && values+=("$val")
-        done <<< "$raw"
-    fi
-
-    local row="$subj"
-    local val_ptr=0
-
-    for i in "${!ALL_CONDS[@]}"; do
-        if [[ "${has_data[$i]}" == "1" ]]; then
-            if [[ $val_ptr -lt ${#values[@]} ]]; then
-                row+=",${values[$val_ptr]}"
-            else
-                row+=",NA"
-            fi
-            ((val_ptr++)) || true
-        else
-            row+=",NA"
-        fi
-    done
-
-    echo "$row"
-}
-
 ############################################################################################
 # MAIN
 ############################################################################################
@@ -219,7 +128,6 @@ log "Masks dir:        $MASKS_DIR"
 log "Anatomical ROIs:  $ANATOMICAL_ROIS"
 log "Output dir:       $OUT_DIR"
 log "GLM label:        $GLM"
-log "Conditions:       $N_CONDS"
 log "Dry run:          $DRY_RUN"
 log ""
 
@@ -228,13 +136,13 @@ log ""
 # -------------------------------------------------------
 
 if [[ "$DRY_RUN" -eq 0 ]]; then
-    for cmd in 3dROIstats 3dresample 3dUndump; do
+    for cmd in 3dresample 3dUndump; do
         if ! command -v "$cmd" &>/dev/null; then
             log "ERROR: $cmd not found in PATH."
             exit 1
         fi
     done
-    log "AFNI check: 3dROIstats, 3dresample, 3dUndump found"
+    log "AFNI check: 3dresample, 3dUndump found"
     log ""
 fi
 
@@ -346,110 +254,18 @@ if [[ $mask_ok -eq 0 ]]; then
 fi
 
 # -------------------------------------------------------
-# 5. DRY RUN CHECK
+# 5. EXTRACT
 # -------------------------------------------------------
-
-if [[ "$DRY_RUN" -eq 1 ]]; then
-    log "=== DRY RUN: verifying sub-brick labels ==="
-    log ""
-
-    for subj in "${SUBJECTS[@]}"; do
-        stats_prefix=$(get_stats_prefix "$subj")
-        head_file="${stats_prefix}.HEAD"
-
-        declare -A LABEL_IDX=()
-        parse_label_map "$head_file"
-
-        n_found=0
-        for cond in "${ALL_CONDS[@]}"; do
-            coef_label="${cond}#0_Coef"
-            [[ -n "${LABEL_IDX[$coef_label]:-}" ]] && { ((n_found++)) || true; }
-        done
-
-        log "  $subj: $n_found / $N_CONDS conditions found"
-        unset LABEL_IDX
-    done
-
-    log ""
-    log "=== DRY RUN complete. Set DRY_RUN=0 to extract. ==="
-    exit 0
-fi
-
-# -------------------------------------------------------
-# 6. BUILD CSV HEADER
-# -------------------------------------------------------
-
-HEADER="Subject"
-for cond in "${ALL_CONDS[@]}"; do
-    HEADER+=",${cond}"
-done
-
-# -------------------------------------------------------
-# 7. EXTRACT
+# Extraction (and the dry-run label check) is done by the
+# single-pass Stage 4 extractor, restricted to these ROIs.
+# Once the masks exist, plain Stage 4 picks them up too.
 # -------------------------------------------------------
 
-log "=== Beginning extraction ==="
+log "=== Handing over to Stage 4 extractor (${ROI_NAMES[*]}) ==="
 log ""
 
-for roi_idx in "${!ROI_NAMES[@]}"; do
-    roi_name="${ROI_NAMES[$roi_idx]}"
-    mask_file="${ROI_LOCAL[$roi_idx]}"
-    csv_file="$OUT_DIR/${roi_name}_betas.csv"
-
-    [[ ! -f "${mask_file}.HEAD" ]] && { log "SKIP $roi_name (mask not found)"; continue; }
-
-    log "--- ROI: $roi_name ---"
-    log "    Mask:   $mask_file"
-    log "    Output: $csv_file"
-
-    echo "$HEADER" > "$csv_file"
-
-    n_done=0
-    n_fail=0
-
-    for subj in "${SUBJECTS[@]}"; do
-        stats_prefix=$(get_stats_prefix "$subj")
-        head_file="${stats_prefix}.HEAD"
-
-        declare -A LABEL_IDX=()
-        parse_label_map "$head_file"
-
-        row=$(extract_one_subject "$subj" "$mask_file")
-        if [[ -n "$row" ]]; then
-            echo "$row" >> "$csv_file"
-            ((n_done++)) || true
-        else
-            log "    WARN: empty output for $subj"
-            ((n_fail++)) || true
-        fi
-
-        unset LABEL_IDX
-
-        if (( n_done % 10 == 0 && n_done > 0 )); then
-            log "    Progress: $n_done / ${#SUBJECTS[@]}"
-        fi
-    done
-
-    log "    Complete: $n_done extracted, $n_fail failed"
-    log ""
-done
-
-# -------------------------------------------------------
-# 8. SUMMARY
-# -------------------------------------------------------
-
-log "============================================================"
-log " Mentalizing ROI extraction complete"
-log "============================================================"
-log ""
-log "Output CSVs:"
-for roi_name in "${ROI_NAMES[@]}"; do
-    csv_file="$OUT_DIR/${roi_name}_betas.csv"
-    if [[ -f "$csv_file" ]]; then
-        n_rows=$(( $(wc -l < "$csv_file") - 1 ))
-        n_cols=$(head -1 "$csv_file" | tr ',' '\n' | wc -l)
-        log "  $csv_file  ($n_rows subjects x $n_cols columns)"
-    fi
-done
-log ""
-log "Log file: $LOGFILE"
+DRY_RUN="$DRY_RUN" exec python3 "$(dirname "${BASH_SOURCE[0]}")/4_extract_rois.py" \
+    --results-dir "$RESULTS_DIR" \
+    --masks-dir "$MASKS_DIR" \
+    --out-dir "$OUT_DIR" \
+    --rois "${ROI_NAMES[@]}" "$@"
@@ -11,11 +11,18 @@ must_exist=(
   "$SERVER_RSA/README.md"
   "$SERVER_RSA/scripts/1_fix_events.py"
   "$SERVER_RSA/scripts/2_generate_timing.sh"
+  "$SERVER_RSA/scripts/2_generate_timing.py"
   "$SERVER_RSA/scripts/3a_afni_proc_template.sh"
   "$SERVER_RSA/scripts/3b_fallback_patch.py"
   "$SERVER_RSA/scripts/3_run_glm.sh"
+  "$SERVER_RSA/scripts/3c_glm_scheduler.py"
+  "$SERVER_RSA/scripts/posthoc_glt.py"
   "$SERVER_RSA/scripts/4_extract_rois.sh"
+  "$SERVER_RSA/scripts/4_extract_rois.py"
+  "$SERVER_RSA/scripts/beta_cube.py"
+  "$SERVER_RSA/scripts/run_pipeline.py"
   "$SERVER_RSA/scripts/qc_summary.sh"
+  "$SERVER_RSA/scripts/qc_summary.py"
   "$SERVER_RSA/scripts/audit_server.sh"
   "$SERVER_RSA/scripts/README.md"
   "$SERVER_RSA/docs/masterplan.md"
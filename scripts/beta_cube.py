@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+RSA-learn beta cube: one typed HDF5 store for all ROI betas + covariates.
+
+Consolidates the Stage 4 <ROI>_betas.csv files into a float32 cube
+
+  betas[subject, roi, condition, run]
+
+with condition 'FBM.Mean60', ..., 'Anticipation.PredFdk' and run 1-4 for
+the run-wise feedback regressors, run 0 for the regressors spanning all
+runs. Every cell without a beta (missing runs of fallback subjects,
+subjects without an ROI, the unused run slots) is NaN.
+
+Subject IDs from every source ('1028', 'sub-1028', 1028.0) are normalized
+to the bare ID, and the store carries the joined data:
+
+  /covariates/<column>   analysis/learn_clinical.csv, one value per cube
+                         subject (numbers as float64 with NaN, text as str)
+  /behavioral/<column>   analysis/learn_behavioral.csv, trial-level, with a
+                         'subject_index' column pointing into the cube
+
+The cube is chunked per (subject, roi), so load_cube() only reads the
+chunks of the requested subjects and ROIs; subject predicates are
+evaluated on the covariate columns they name before any beta is read:
+
+  sys.path.insert(0, "scripts"); from beta_cube import load_cube
+  cube = load_cube(store, rois=["vmPFC"], runwise=True,
+                   where={"sa_dx_csr": lambda v: v > 0, "Usable_fMRI": 1})
+  cube["betas"].shape   # (n_sa_subjects, 1, 8, 4)
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import re
+from fnmatch import fnmatch
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+TOPDIR = Path("/data/projects/STUDIES/LEARN/fMRI")
+RSA_DIR = TOPDIR / "RSA-learn"
+REPO_DIR = Path(__file__).resolve().parent.parent
+RUNS = [0, 1, 2, 3, 4]
+
+
+def normalize_subject(value) -> str:
+    """'sub-1028', '1028', ' 1028.0' -> '1028'."""
+    text = str(value).strip()
+    text = re.sub(r"^sub-", "", text)
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    return str(int(number)) if number.is_integer() else text
+
+
+def parse_condition(label: str):
+    """'FBM.Mean60.r1' -> ('FBM.Mean60', 1); run 0 if the label has no run."""
+    match = re.fullmatch(r"(.+)\.r(\d+)", label)
+    return (match.group(1), int(match.group(2))) if match else (label, 0)
+
+
+def to_float(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def read_roi_csvs(roi_dir: Path):
+    """{roi: {subject: {column: value}}} and the CSV column order."""
+    tables, columns = {}, []
+    for path in sorted(roi_dir.glob("*_betas.csv")):
+        with path.open(newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            for column in header[1:]:
+                if column not in columns:
+                    columns.append(column)
+            tables[path.name[:-len("_betas.csv")]] = {
+                normalize_subject(row[0]): dict(zip(header[1:], map(to_float, row[1:])))
+                for row in reader if row}
+    return tables, columns
+
+
+def read_columns(path: Path, id_column: str = "s"):
+    """Columnar CSV: {column: list of str}, with normalized subject IDs."""
+    with path.open(newline="") as f:
+        rows = list(csv.DictReader(f))
+    columns = {name: [row[name] for row in rows] for name in (rows[0] if rows else [])}
+    if id_column in columns:
+        columns[id_column] = [normalize_subject(v) for v in columns[id_column]]
+    return columns
+
+
+def typed(values):
+    """float64 (NA/empty -> NaN) if every value is numeric or missing, else str."""
+    missing = {"", "NA", "NaN", "nan"}
+    numbers = [to_float(v) for v in values]
+    if all(not np.isnan(n) or v.strip() in missing for v, n in zip(values, numbers)):
+        return np.array(numbers, dtype=np.float64)
+    return np.array(["" if v.strip() in missing else v for v in values], dtype=object)
+
+
+def write_column(group, name: str, values):
+    if values.dtype == object:
+        group.create_dataset(name, data=values.astype(str).astype(object),
+                             dtype=h5py.string_dtype())
+    else:
+        group.create_dataset(name, data=values)
+
+
+def build_cube(roi_dir: Path, clinical: Path, behavioral: Path, out: Path):
+    tables, columns = read_roi_csvs(roi_dir)
+    if not tables:
+        raise SystemExit(f"ERROR: No *_betas.csv files in {roi_dir}")
+    clin = read_columns(clinical) if clinical.is_file() else {}
+    behav = read_columns(behavioral) if behavioral.is_file() else {}
+
+    rois = sorted(tables)
+    subjects = sorted({s for table in tables.values() for s in table},
+                      key=lambda s: (not s.isdigit(), int(s) if s.isdigit() else 0, s))
+    conditions = []
+    for column in columns:
+        name, _ = parse_condition(column)
+        if name not in conditions:
+            conditions.append(name)
+
+    betas = np.full((len(subjects), len(rois), len(conditions), len(RUNS)), np.nan, np.float32)
+    slots = [(conditions.index(parse_condition(c)[0]), RUNS.index(parse_condition(c)[1]))
+             for c in columns]
+    for i_roi, roi in enumerate(rois):
+        for i_subj, subj in enumerate(subjects):
+            row = tables[roi].get(subj)
+            if row is None:
+                continue
+            for column, (i_cond, i_run) in zip(columns, slots):
+                betas[i_subj, i_roi, i_cond, i_run] = row.get(column, np.nan)
+
+    tmp = out.with_name(out.name + ".tmp")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with h5py.File(tmp, "w") as f:
+        f.create_dataset("betas", data=betas, chunks=(1, 1, len(conditions), len(RUNS)),
+                         compression="gzip")
+        f.create_dataset("subjects", data=np.array(subjects, dtype=object), dtype=h5py.string_dtype())
+        f.create_dataset("rois", data=np.array(rois, dtype=object), dtype=h5py.string_dtype())
+        f.create_dataset("conditions", data=np.array(conditions, dtype=object),
+                         dtype=h5py.string_dtype())
+        f.create_dataset("runs", data=np.array(RUNS))
+        cov = f.create_group("covariates")
+        if clin:
+            index = {s: i for i, s in enumerate(clin["s"])}
+            for name, values in clin.items():
+                if name == "s":
+                    continue
+                write_column(cov, name, typed([values[index[s]] if s in index else ""
+                                               for s in subjects]))
+        beh = f.create_group("behavioral")
+        if behav:
+            position = {s: i for i, s in enumerate(subjects)}
+            beh.create_dataset("subject_index", data=np.array(
+                [position.get(s, -1) for s in behav["s"]], dtype=np.int32))
+            for name, values in behav.items():
+                write_column(beh, name, np.array(values, dtype=object) if name == "s" else typed(values))
+    os.replace(tmp, out)
+    return betas.shape, len(clin.get("s", [])), len(behav.get("s", []))
+
+
+def _select(names, wanted):
+    """Indices of names matching any of the wanted names or glob patterns."""
+    if wanted is None:
+        return list(range(len(names)))
+    if isinstance(wanted, str):
+        wanted = [wanted]
+    return [i for i, name in enumerate(names) if any(fnmatch(name, w) for w in wanted)]
+
+
+def _column(dataset, index=slice(None)):
+    """Reads a column; h5py returns strings as bytes, decode them."""
+    values = dataset[()][index]
+    if values.dtype == object:
+        values = np.array([v.decode() if isinstance(v, bytes) else v for v in values], dtype=object)
+    return values
+
+
+def _strings(dataset):
+    return list(_column(dataset))
+
+
+def load_cube(path, subjects=None, rois=None, conditions=None, runs=None,
+              runwise=False, where=None, covariates=None):
+    """Loads a slice of the beta cube; only the selected chunks are read.
+
+    Args:
+        path: the HDF5 store written by build_cube
+        subjects: subject IDs in any format ('1028', 'sub-1028')
+        rois, conditions: names or glob patterns ('FB*', 'Pred.*')
+        runs: run numbers to keep (0 = regressors spanning all runs)
+        runwise: shortcut for the run-wise feedback conditions (runs 1-4)
+        where: {covariate: value or callable(array) -> bool mask}; keeps
+            subjects for which every predicate holds
+        covariates: covariate columns to return (default: those in where)
+
+    Returns:
+        dict with 'betas' (subjects x rois x conditions x runs), the axis
+        labels 'subjects', 'rois', 'conditions', 'runs' and 'covariates'
+    """
+    with h5py.File(path, "r") as f:
+        all_subjects = _strings(f["subjects"])
+        keep = np.ones(len(all_subjects), bool)
+        if subjects is not None:
+            wanted = {normalize_subject(s) for s in subjects}
+            keep &= np.array([s in wanted for s in all_subjects])
+        for name, predicate in (where or {}).items():
+            values = _column(f["covariates"][name])
+            keep &= np.asarray(predicate(values) if callable(predicate) else values == predicate,
+                               dtype=bool)
+        i_subj = np.flatnonzero(keep)
+
+        roi_names = _strings(f["rois"])
+        i_roi = _select(roi_names, rois)
+        cond_names = _strings(f["conditions"])
+        run_values = [int(r) for r in f["runs"][()]]
+        if runwise:
+            conditions = conditions or [c for c in cond_names if c.startswith(("FBM.", "FBN."))]
+            runs = runs or [r for r in run_values if r > 0]
+        i_cond = _select(cond_names, conditions)
+        i_run = [run_values.index(r) for r in (runs if runs is not None else run_values)]
+
+        dset = f["betas"]
+        shape = (len(i_subj), len(i_roi), len(i_cond), len(i_run))
+        betas = np.empty(shape, np.float32)
+        if len(i_subj) and len(i_roi):
+            for k, r in enumerate(i_roi):
+                block = dset[i_subj, r]
+                betas[:, k] = block[:, i_cond][:, :, i_run]
+
+        names = list(covariates or []) + [n for n in (where or {}) if n not in (covariates or [])]
+        cov = {}
+        for name in names:
+            cov[name] = _column(f["covariates"][name], i_subj)
+
+    return {
+        "betas": betas,
+        "subjects": [all_subjects[i] for i in i_subj],
+        "rois": [roi_names[i] for i in i_roi],
+        "conditions": [cond_names[i] for i in i_cond],
+        "runs": [run_values[i] for i in i_run],
+        "covariates": cov,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--roi-dir", type=Path,
+                    default=Path(os.environ.get("OUT_DIR", RSA_DIR / "derivatives/afni/ROI_extractions")),
+                    help="Folder with the Stage 4 <ROI>_betas.csv files")
+    ap.add_argument("--clinical", type=Path, default=REPO_DIR / "analysis/learn_clinical.csv")
+    ap.add_argument("--behavioral", type=Path, default=REPO_DIR / "analysis/learn_behavioral.csv")
+    ap.add_argument("--out", type=Path,
+                    help="HDF5 store (default: <roi-dir>/beta_cube.h5)")
+    args = ap.parse_args()
+
+    out = args.out or args.roi_dir / "beta_cube.h5"
+    shape, n_clin, n_behav = build_cube(args.roi_dir, args.clinical, args.behavioral, out)
+    print(f"[RSA-learn] beta cube {shape[0]} subjects x {shape[1]} ROIs x {shape[2]} conditions "
+          f"x {shape[3]} runs -> {out}")
+    print(f"[RSA-learn]   joined {n_clin} clinical rows, {n_behav} behavioral trials")
+
+
+if __name__ == "__main__":
+    main()
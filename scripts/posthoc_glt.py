@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+RSA-learn post-hoc GLTs: new contrasts from stored GLM results.
+
+Evaluates symbolic GLTs in the 3dDeconvolve syntax
+('SYM: +0.5*FBM.Mean60.r1 +0.5*FBN.Mean60.r1') without regenerating the
+proc script or re-running Stage 3. Per subject it reads from
+<subj>.results.LEARN_RSA_runwise_AFNI/:
+
+  X.xmat.1D              design matrix (censored TRs removed) + column labels
+  cbucket.stats.<subj>   every regression coefficient, in X column order
+  stats.<subj>           the #0_Coef / #0_Tstat of one regressor, which give
+                         the residual variance (or errts.<subj>, --variance)
+
+With L the (GLTs x columns) weight matrix, C = (X'X)^-1 and B the betas of
+all voxels, every GLT is computed with one matrix multiply:
+
+  coef = L B        t = coef / sqrt(sigma^2 * diag(L C L'))
+
+which is what 3dDeconvolve reports for a single-row GLT, with
+N - p degrees of freedom. Only the coefficient sub-bricks used by some
+GLT are read (memory-mapped). The result is one AFNI bucket per subject,
+<out-dir>/<subj>/<name>.<subj>+tlrc, with '<label>#0_Coef' and
+'<label>#0_Tstat' sub-bricks like the Stage 3 stats file.
+
+GLTs come from --glt LABEL 'SYM: ...' and/or --glt-file, which accepts
+any text with "-gltsym 'SYM: ...' -glt_label N LABEL" entries (e.g.
+3a_afni_proc_template.sh itself). A GLT that names a regressor missing
+from a subject's design (fallback subjects, 2-3 runs) is skipped for
+that subject.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+from rsatoolbox.io.afni import FUNC_TT_TYPE, AfniDataset, write_dataset
+
+TOPDIR = Path("/data/projects/STUDIES/LEARN/fMRI")
+RSA_DIR = TOPDIR / "RSA-learn"
+GLM = "LEARN_RSA_runwise_AFNI"
+
+_GLTSYM = re.compile(r"-gltsym\s+'(SYM:[^']*)'\s+-glt_label\s+\d+\s+(\S+)")
+_TERM = re.compile(r"([+-]?)(?:(\d*\.?\d+(?:[eE][+-]?\d+)?)\*)?([A-Za-z_][\w.]*)(?:\[(\d+)\])?")
+
+
+def log(msg: str = ""):
+    print(f"[{time.strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+def results_path(results_dir: Path, subj: str) -> Path:
+    return results_dir / subj / f"{subj}.results.{GLM}"
+
+
+def read_glt_file(path: Path):
+    return [(label, sym) for sym, label in _GLTSYM.findall(path.read_text())]
+
+
+def read_xmat(path: Path):
+    """Column labels ('FBM.Mean60.r1#0', ...) and the design matrix of an X.xmat.1D."""
+    match = re.search(r'ColumnLabels\s*=\s*"([^"]*)"', path.read_text())
+    if not match:
+        raise ValueError(f"No ColumnLabels in {path}")
+    labels = [label.strip() for label in match.group(1).split(";")]
+    xmat = np.loadtxt(path, comments="#", ndmin=2)
+    if xmat.shape[1] != len(labels):
+        raise ValueError(f"{path}: {xmat.shape[1]} columns but {len(labels)} labels")
+    return labels, xmat
+
+
+def parse_sym(sym: str, columns: dict) -> dict:
+    """Maps one 'SYM: ...' GLT to {column index: weight}.
+
+    Terms are [+-][weight*]label[index]; the index defaults to 0. Raises
+    KeyError for labels that are not in the design.
+    """
+    text = sym.strip()
+    if text.startswith("SYM:"):
+        text = text[4:]
+    if "\\" in text:
+        raise ValueError(f"Multi-row GLTs are not supported: {sym}")
+    weights = {}
+    for token in text.split():
+        match = _TERM.fullmatch(token)
+        if not match:
+            raise ValueError(f"Cannot parse GLT term {token!r}")
+        sign, weight, label, index = match.groups()
+        column = columns[f"{label}#{index or 0}"]
+        value = (-1.0 if sign == "-" else 1.0) * float(weight or 1.0)
+        weights[column] = weights.get(column, 0.0) + value
+    return weights
+
+
+def residual_variance(results: Path, subj: str, labels, xtx_inv, dof: int, method: str):
+    """(x, y, z) residual variance of the GLM, see the module docstring."""
+    if method == "errts":
+        errts = AfniDataset(str(results / f"errts.{subj}+tlrc"))
+        sse = np.zeros(errts.shape, dtype=np.float64)
+        for i_brick in range(errts.n_bricks):
+            sse += np.square(errts.get_subbrick(i_brick), dtype=np.float64)
+        return sse / dof
+    stats = AfniDataset(str(results / f"stats.{subj}+tlrc"))
+    for column, label in enumerate(labels):
+        stem = label.split("#")[0]
+        if label.endswith("#0") and f"{stem}#0_Tstat" in stats.label_index:
+            coef = stats.get_subbrick(f"{stem}#0_Coef").astype(np.float64)
+            tstat = stats.get_subbrick(f"{stem}#0_Tstat").astype(np.float64)
+            se2 = np.divide(coef, tstat, out=np.zeros_like(coef), where=tstat != 0) ** 2
+            return se2 / xtx_inv[column, column]
+    raise ValueError(f"No regressor with a Tstat sub-brick in stats.{subj}")
+
+
+def subject_glts(subj: str, results_dir: Path, glts, out_dir: Path, name: str, variance: str):
+    """Evaluates all GLTs for one subject; returns (subj, written labels, skipped labels)."""
+    results = results_path(results_dir, subj)
+    labels, xmat = read_xmat(results / "X.xmat.1D")
+    columns = {label: i for i, label in enumerate(labels)}
+    xtx_inv = np.linalg.pinv(xmat.T @ xmat)
+    dof = xmat.shape[0] - np.linalg.matrix_rank(xmat)
+
+    rows, used, skipped = [], [], []
+    for label, sym in glts:
+        try:
+            rows.append(parse_sym(sym, columns))
+            used.append(label)
+        except KeyError:
+            skipped.append(label)
+    if not rows:
+        return subj, used, skipped
+    needed = sorted({column for row in rows for column in row})
+    contrast = np.zeros((len(rows), len(needed)))
+    full = np.zeros((len(rows), len(labels)))
+    for i_row, row in enumerate(rows):
+        for column, weight in row.items():
+            contrast[i_row, needed.index(column)] = weight
+            full[i_row, column] = weight
+
+    sigma2 = residual_variance(results, subj, labels, xtx_inv, dof, variance)
+    voxels = np.flatnonzero(sigma2 > 0)
+    cbucket = AfniDataset(str(results / f"cbucket.stats.{subj}+tlrc"))
+    if cbucket.n_bricks != len(labels):
+        raise ValueError(f"cbucket.stats.{subj} has {cbucket.n_bricks} sub-bricks, "
+                         f"X.xmat.1D {len(labels)} columns")
+    betas = np.stack([cbucket.get_subbrick(column).reshape(-1)[voxels] for column in needed])
+
+    coef = contrast @ betas
+    scale = np.sqrt(np.einsum("gi,ij,gj->g", full, xtx_inv, full))
+    tstat = coef / (scale[:, None] * np.sqrt(sigma2.reshape(-1)[voxels]))
+
+    bricks, brick_labels = [], []
+    for i_row, label in enumerate(used):
+        for values, kind in ((coef[i_row], "Coef"), (tstat[i_row], "Tstat")):
+            volume = np.zeros(cbucket.shape, dtype=np.float32)
+            volume.reshape(-1)[voxels] = values
+            bricks.append(volume)
+            brick_labels.append(f"{label}#0_{kind}")
+    (out_dir / subj).mkdir(parents=True, exist_ok=True)
+    write_dataset(str(out_dir / subj / f"{name}.{subj}+tlrc"), bricks, brick_labels,
+                  header=cbucket.header,
+                  stataux=[(2 * i + 1, FUNC_TT_TYPE, [dof]) for i in range(len(used))])
+    return subj, used, skipped
+
+
+def find_subjects(results_dir: Path):
+    subjects = [d.name for d in results_dir.glob("*/")
+                if re.fullmatch(r"\d+", d.name)
+                and (results_path(results_dir, d.name) / "X.xmat.1D").is_file()]
+    return sorted(subjects, key=int)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--glt", nargs=2, action="append", default=[], metavar=("LABEL", "SYM"),
+                    help="GLT label and 'SYM: ...' expression (repeatable)")
+    ap.add_argument("--glt-file", type=Path, action="append", default=[],
+                    help="File with -gltsym 'SYM: ...' -glt_label N LABEL entries")
+    ap.add_argument("--subjects", nargs="+", help="Subject IDs (default: all with GLM results)")
+    ap.add_argument("--results-dir", type=Path,
+                    default=Path(os.environ.get("RESULTS_DIR", RSA_DIR / "derivatives/afni/IndvlLvlAnalyses")))
+    ap.add_argument("--out-dir", type=Path,
+                    default=Path(os.environ.get("OUT_DIR", RSA_DIR / "derivatives/afni/PosthocGLT")))
+    ap.add_argument("--name", default="glt", help="Output prefix: <name>.<subj>+tlrc")
+    ap.add_argument("--variance", choices=["stats", "errts"], default="stats",
+                    help="Residual variance from a stats Coef/Tstat pair or from errts")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                    help="Parallel subject workers")
+    args = ap.parse_args()
+
+    glts = [tuple(glt) for glt in args.glt]
+    for path in args.glt_file:
+        glts += read_glt_file(path)
+    if not glts:
+        raise SystemExit("ERROR: No GLTs given (--glt or --glt-file)")
+    subjects = args.subjects or find_subjects(args.results_dir)
+    if not subjects:
+        raise SystemExit("ERROR: No subjects found. Check RESULTS_DIR path.")
+
+    log(f"{len(glts)} GLTs x {len(subjects)} subjects -> {args.out_dir}")
+    worker = partial(subject_glts, results_dir=args.results_dir, glts=glts,
+                     out_dir=args.out_dir, name=args.name, variance=args.variance)
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for subj, used, skipped in pool.map(worker, subjects):
+            log(f"  {subj}: {len(used)} GLTs written")
+            if skipped:
+                log(f"  {subj}: skipped (regressor not in design): {' '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
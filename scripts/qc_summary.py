@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+RSA-learn QC summary: one markdown report from all out.ss_review files.
+
+Parses every subject's
+<results-dir>/<subj>/<subj>.results.LEARN_RSA_runwise_AFNI/out.ss_review.<subj>.txt
+(plain text, no AFNI dependency) into one typed table: the values as
+printed by AFNI for the report, and float64 columns (NaN if missing) on
+which the flag thresholds are evaluated for all subjects at once.
+
+Parsed files are cached in a JSON file (default
+<results-dir>/.qc_summary_cache.json) keyed by size + mtime, with the
+SHA-256 of the file as a second check, so regenerating the report after
+one new subject finished parses one file. Cache misses are parsed in
+parallel.
+
+The report layout (group summary, flagged subjects, full subject table,
+metric definitions) is the one of the former shell implementation, and
+qc_summary.sh still runs this script.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+TOPDIR = Path("/data/projects/STUDIES/LEARN/fMRI")
+RSA_DIR = TOPDIR / "RSA-learn"
+GLM = "LEARN_RSA_runwise_AFNI"
+LOCAL_MOUNT = Path("/Volumes/Jarcho_DataShare/projects/STUDIES/LEARN/fMRI/RSA-learn"
+                   "/derivatives/afni/IndvlLvlAnalyses")
+
+# --- Flag thresholds ---
+CENSOR_WARN = 0.15      # >= 15% censored: moderate flag
+CENSOR_FAIL = 0.30      # >= 30% censored: heavy flag
+MAX_DISP_WARN = 3.0     # >= 3mm max displacement
+TSNR_WARN = 40          # < 40 TSNR: low signal
+DICE_WARN = 0.90        # < 0.90 Dice: poor alignment
+RUN_CENSOR_WARN = 0.40  # >= 40% of a single run censored
+
+# field -> key prefix of its line in out.ss_review (first matching line)
+FIELDS = {
+    "runs": "num runs found",
+    "trs_total": "TRs total ",
+    "trs_censored": "TRs censored ",
+    "cens_frac": "censor fraction",
+    "avg_mot": "average motion (per TR)",
+    "max_disp": "max motion displacement",
+    "max_disp_cens": "max censored displacement",
+    "avg_outlier": "average outlier frac",
+    "tsnr": "TSNR average",
+    "gcor": "global correlation",
+    "dice": "anat/EPI mask Dice",
+    "df_left": "degrees of freedom left",
+    "df_frac": "final DF fraction",
+    "run_cens": "fraction censored per run",
+}
+
+DEFINITIONS = [
+    ("Cens%", "Fraction of TRs censored for motion/outliers. Higher = more data lost."),
+    ("AvgMot", "Average framewise displacement (mm) across all TRs."),
+    ("MaxDisp", "Largest single-TR displacement (mm). Can indicate a head jerk."),
+    ("TSNR", "Temporal signal-to-noise ratio. Higher = cleaner signal."),
+    ("GCOR", "Global correlation. Lower = less global signal artifact."),
+    ("Dice", "Overlap between EPI and anatomy masks. Should be >0.90."),
+    ("DF left", "Degrees of freedom remaining after censoring + regressors."),
+    ("Per-Run Cens%", "Censoring fraction for each individual run."),
+]
+
+
+def review_path(results_dir: Path, subj: str) -> Path:
+    return results_dir / subj / f"{subj}.results.{GLM}" / f"out.ss_review.{subj}.txt"
+
+
+def find_subjects(results_dir: Path):
+    subjects = [d.name for d in results_dir.glob("*/")
+                if re.fullmatch(r"\d+", d.name) and review_path(results_dir, d.name).is_file()]
+    return sorted(subjects, key=int)
+
+
+def parse_review(text: str) -> dict:
+    """{field: value after the colon, runs of spaces squeezed}; '' if absent."""
+    fields = dict.fromkeys(FIELDS, "")
+    pending = dict(FIELDS)
+    for line in text.splitlines():
+        for field, key in list(pending.items()):
+            if line.startswith(key):
+                fields[field] = re.sub(r" +", " ", re.sub(r"^[^:]*: *", "", line))
+                del pending[field]
+    return fields
+
+
+def read_review(path: Path, previous_sha: str | None):
+    """Cache entry for one review file; parses only if its content changed."""
+    data = path.read_bytes()
+    stat = path.stat()
+    sha = hashlib.sha256(data).hexdigest()
+    entry = {"stat": [stat.st_size, stat.st_mtime_ns], "sha256": sha}
+    if sha != previous_sha:
+        entry["fields"] = parse_review(data.decode(errors="replace"))
+    return entry, sha != previous_sha
+
+
+def collect(results_dir: Path, subjects, cache: dict, jobs: int):
+    """Cached/parsed fields of every subject; returns (records, new cache, n parsed)."""
+    records, new_cache, misses = {}, {}, []
+    for subj in subjects:
+        path = review_path(results_dir, subj)
+        entry = cache.get(subj)
+        stat = path.stat()
+        if entry and entry.get("stat") == [stat.st_size, stat.st_mtime_ns]:
+            new_cache[subj] = entry
+        else:
+            misses.append(subj)
+
+    parsed = 0
+    if misses:
+        previous = [cache.get(s, {}).get("sha256") for s in misses]
+        with ProcessPoolExecutor(max_workers=max(1, min(jobs, len(misses)))) as pool:
+            results = pool.map(read_review, [review_path(results_dir, s) for s in misses],
+                               previous, chunksize=8)
+            for subj, (entry, changed) in zip(misses, results):
+                if not changed:
+                    entry["fields"] = cache[subj]["fields"]
+                new_cache[subj] = entry
+                parsed += changed
+
+    for subj in subjects:
+        records[subj] = new_cache[subj]["fields"]
+    return records, new_cache, parsed
+
+
+def to_float(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def build_table(subjects, records) -> dict:
+    """Columns: 'subject', the raw text of every field, '<field>_num' float64
+    columns, 'run_cens_num' (subjects x max runs, NaN padded) and 'flags'."""
+    table = {"subject": np.array(subjects, dtype=object)}
+    for field in FIELDS:
+        table[field] = np.array([records[s][field] for s in subjects], dtype=object)
+        table[f"{field}_num"] = np.array([to_float(v) for v in table[field]], dtype=np.float64)
+    per_run = [[to_float(v) for v in text.split()] for text in table["run_cens"]]
+    width = max((len(runs) for runs in per_run), default=0)
+    table["run_cens_num"] = np.full((len(subjects), width), np.nan)
+    for i, runs in enumerate(per_run):
+        table["run_cens_num"][i, :len(runs)] = runs
+
+    cens = table["cens_frac_num"]
+    with np.errstate(invalid="ignore"):
+        table["cens_fail"] = cens >= CENSOR_FAIL
+        table["cens_warn"] = cens >= CENSOR_WARN
+        masks = [
+            (table["cens_fail"], "CENSOR>30% "),
+            (table["cens_warn"] & ~table["cens_fail"], "censor>15% "),
+            (table["max_disp_num"] >= MAX_DISP_WARN, f"maxDisp>{MAX_DISP_WARN}mm "),
+            (table["tsnr_num"] < TSNR_WARN, "lowTSNR "),
+            (table["dice_num"] < DICE_WARN, "poorAlign "),
+            ((table["run_cens_num"] >= RUN_CENSOR_WARN).any(axis=1), "run>40% "),
+        ]
+    flags = np.full(len(subjects), "", dtype=object)
+    for mask, text in masks:
+        flags[mask] += text
+    flags[flags == ""] = "-"
+    table["flags"] = flags
+    return table
+
+
+def awk_number(text: str) -> float:
+    """The numeric prefix of the first word, 0 if none (awk's $1+0)."""
+    match = re.match(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?", text.split()[0] if text.split() else "")
+    return float(match.group(0)) if match else 0.0
+
+
+def group_stats(values) -> list:
+    """min, mean, max rounded to 3 decimals before display, as in the shell version."""
+    numbers = np.array([awk_number(v) for v in values])
+    return [float(f"{x:.3f}") for x in (numbers.min(), numbers.mean(), numbers.max())]
+
+
+def render(table, generated: str) -> str:
+    n_subj = len(table["subject"])
+    flagged = table["flags"] != "-"
+    out = [
+        "# GLM Quality Control Summary", "",
+        f"Generated: {generated}", "",
+        f"GLM: `{GLM}`", "",
+        f"Subjects: **{n_subj}**", "",
+        "---", "",
+        "## Group Summary", "",
+        "| Metric | Min | Mean | Max |",
+        "|--------|-----|------|-----|",
+    ]
+    for label, field, fmt in [
+        ("Censor fraction", "cens_frac", ".3f"),
+        ("Avg motion (mm/TR)", "avg_mot", ".3f"),
+        ("Max displacement (mm)", "max_disp", ".1f"),
+        ("TSNR", "tsnr", ".1f"),
+        ("GCOR", "gcor", ".4f"),
+        ("Anat/EPI Dice", "dice", ".3f"),
+    ]:
+        lo, mean, hi = group_stats(table[field])
+        out.append(f"| {label} | {lo:{fmt}} | {mean:{fmt}} | {hi:{fmt}} |")
+    out += [
+        "",
+        f"**Flagged subjects: {int(flagged.sum())} / {n_subj}** (censor >15%: "
+        f"{int(table['cens_warn'].sum())}, censor >30%: {int(table['cens_fail'].sum())})",
+        "", "---", "",
+        "## Flagged Subjects", "",
+        "Thresholds: censor fraction >15% (warn) / >30% (exclude?), max displacement >3mm, "
+        "TSNR <40, Dice <0.90, any run >40% censored.",
+        "",
+    ]
+    for i in np.flatnonzero(flagged):
+        row = {name: table[name][i] for name in ["subject", "flags", *FIELDS]}
+        out += [
+            f"### sub-{row['subject']}", "",
+            f"- **Flags:** {row['flags']}",
+            f"- Runs: {row['runs']} | Censor fraction: {row['cens_frac']} | "
+            f"TRs censored: {row['trs_censored']}",
+            f"- Avg motion: {row['avg_mot']} mm/TR | Max displacement: {row['max_disp']} mm",
+            f"- TSNR: {row['tsnr']} | GCOR: {row['gcor']} | Dice: {row['dice']}",
+            f"- Per-run censor fractions: {row['run_cens']}",
+            f"- DF remaining: {row['df_left']} ({row['df_frac']} of total)",
+            "",
+        ]
+    if not flagged.any():
+        out += ["*No subjects flagged.*", ""]
+    out += [
+        "---", "",
+        "## Full Subject Table", "",
+        "| Subject | Runs | TRs Cens | Cens% | AvgMot | MaxDisp | TSNR | GCOR | Dice | DF left "
+        "| Per-Run Cens% | Flags |",
+        "|---------|------|----------|-------|--------|---------|------|------|------|---------"
+        "|---------------|-------|",
+    ]
+    for i in range(n_subj):
+        num = {field: awk_number(table[field][i]) for field in FIELDS}
+        run_pcts = " ".join(f"{rc * 100:.0f}%" for rc in table["run_cens_num"][i]
+                            if not np.isnan(rc))
+        out.append(
+            f"| {table['subject'][i]} | {table['runs'][i]} | {table['trs_censored'][i]} "
+            f"| {num['cens_frac'] * 100:.1f}% | {num['avg_mot']:.3f} | {num['max_disp']:.1f} "
+            f"| {num['tsnr']:.1f} | {num['gcor']:.4f} | {num['dice']:.3f} "
+            f"| {table['df_left'][i]} | {run_pcts} | {table['flags'][i]} |")
+    out += ["", "---", "", "## Metric Definitions", "",
+            "| Metric | What it means |",
+            "|--------|---------------|"]
+    out += [f"| **{name}** | {text} |" for name, text in DEFINITIONS]
+    return "\n".join(out) + "\n"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--results-dir", type=Path,
+                    default=Path(os.environ.get("RESULTS_DIR", RSA_DIR / "derivatives/afni/IndvlLvlAnalyses")))
+    ap.add_argument("--out-file", type=Path,
+                    default=Path(os.environ.get("OUT_FILE", RSA_DIR / "docs/qc-summary.md")))
+    ap.add_argument("--cache", type=Path, default=os.environ.get("QC_CACHE"),
+                    help="Parsed-file cache (default: <results-dir>/.qc_summary_cache.json)")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                    help="Parallel parse workers")
+    args = ap.parse_args()
+
+    results_dir = args.results_dir
+    if not results_dir.is_dir():
+        # Allow running from the local mount
+        if not LOCAL_MOUNT.is_dir():
+            raise SystemExit(f"ERROR: Cannot find results at {results_dir} or {LOCAL_MOUNT}")
+        results_dir = LOCAL_MOUNT
+
+    subjects = find_subjects(results_dir)
+    print(f"Found {len(subjects)} subjects with QC data")
+    if not subjects:
+        raise SystemExit(f"ERROR: No out.ss_review files under {results_dir}")
+
+    cache_path = args.cache or results_dir / ".qc_summary_cache.json"
+    cache = json.loads(cache_path.read_text()) if cache_path.is_file() else {}
+    records, cache, parsed = collect(results_dir, subjects, cache, args.jobs)
+    print(f"Parsed {parsed} review files ({len(subjects) - parsed} cached)")
+    try:
+        tmp = cache_path.with_name(cache_path.name + ".tmp")
+        tmp.write_text(json.dumps(cache, indent=1, sort_keys=True))
+        os.replace(tmp, cache_path)
+    except OSError as exc:
+        print(f"WARNING: Could not write cache {cache_path}: {exc}")
+
+    table = build_table(subjects, records)
+    args.out_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = args.out_file.with_name(args.out_file.name + ".tmp")
+    tmp.write_text(render(table, time.strftime("%Y-%m-%d %H:%M")))
+    os.replace(tmp, args.out_file)
+
+    print("")
+    print(f"QC summary written to: {args.out_file}")
+    print(f"  {len(subjects)} subjects, {int((table['flags'] != '-').sum())} flagged")
+
+
+if __name__ == "__main__":
+    main()
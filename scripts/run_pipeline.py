@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+RSA-learn incremental pipeline runner (stages 1-4).
+
+Runs the stage scripts as a small DAG and only re-executes the nodes
+whose inputs or outputs changed since their last successful run:
+
+  1:fix_events   1_fix_events.py       all raw events -> bids_fixed + report
+  2:<subj>       2_generate_timing.py  fixed events   -> TimingFiles/Fixed2/sub-<subj>
+  3:<subj>       3_run_glm.sh          timing + BOLD + anatomy -> stats.<subj>+tlrc
+  4:rois         4_extract_rois.py     all stats + each mask -> <roi>_betas.csv,
+                                       tracked per ROI and run with --rois for
+                                       the changed ROIs only
+
+Every node's state is the SHA-256 of its input files (including the
+stage scripts) and of its output files, stored in a JSON manifest. A node
+is skipped when both still match, so e.g. a subject whose fixed events
+did not change after re-running stage 1 does not get new timing files or
+a new GLM. File hashes are cached in the manifest by (size, mtime), so a
+no-op re-run only stats files.
+
+Independent nodes (different subjects) run in parallel; each node's
+output goes to logs/pipeline/<node>.log.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+GLM = "LEARN_RSA_runwise_AFNI"
+
+
+def log(msg: str = ""):
+    print(f"[{time.strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+class Manifest:
+    """Content hashes of files and the last successful state of each node."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        data = json.loads(path.read_text()) if path.is_file() else {}
+        self.files = data.get("files", {})
+        self.nodes = data.get("nodes", {})
+
+    def file_hash(self, path: Path) -> str:
+        stat = path.stat()
+        key = str(path)
+        with self.lock:
+            cached = self.files.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        sha = hashlib.sha256()
+        with path.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        with self.lock:
+            self.files[key] = [stat.st_size, stat.st_mtime_ns, sha.hexdigest()]
+        return sha.hexdigest()
+
+    def digest(self, paths) -> str:
+        sha = hashlib.sha256()
+        for path in sorted(set(paths)):
+            if path.is_file():
+                sha.update(f"{path}\0{self.file_hash(path)}\n".encode())
+        return sha.hexdigest()
+
+    def record(self, key: str, state: dict):
+        """Stores the state of a node entry and saves, under one lock."""
+        with self.lock:
+            self.nodes[key] = state
+            self._write()
+
+    def save(self):
+        with self.lock:
+            self._write()
+
+    def _write(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"files": self.files, "nodes": self.nodes}, indent=1))
+        os.replace(tmp, self.path)
+
+
+class Node:
+    """One step of the DAG.
+
+    entries maps a manifest key to a function returning its (inputs,
+    outputs) paths; most nodes have one entry. command(stale) returns the
+    argv (and extra environment) to bring the stale entries up to date.
+    """
+
+    def __init__(self, name, deps, entries, command):
+        self.name = name
+        self.deps = deps
+        self.entries = entries
+        self.command = command
+
+
+def files(directory: Path, pattern: str = "*"):
+    return [p for p in directory.glob(pattern) if p.is_file()]
+
+
+def build_graph(args):
+    nodes = []
+    stages = set(args.stages)
+    raw_events = "sub-*/func/sub-*_task-learn_run-*_events.tsv"
+
+    subjects = sorted(
+        {p.name[4:] for p in args.raw_bids.glob("sub-*") if p.is_dir()}
+        | {p.name[4:] for p in args.fixed_dir.glob("sub-*") if p.is_dir()},
+        key=lambda s: (len(s), s))
+    if args.subjects:
+        subjects = [s for s in subjects if s in args.subjects]
+
+    if 1 in stages:
+        nodes.append(Node(
+            "1:fix_events", [],
+            {"1:fix_events": lambda: (
+                files(args.raw_bids, raw_events) + [SCRIPT_DIR / "1_fix_events.py"],
+                files(args.fixed_dir, raw_events) + [args.report])},
+            lambda stale: ([sys.executable, str(SCRIPT_DIR / "1_fix_events.py"),
+                            "--bids-dir", str(args.raw_bids), "--out-dir", str(args.fixed_dir),
+                            "--report", str(args.report), "--mode", "majority"], {})))
+
+    for subj in subjects:
+        timing = args.timing_root / f"sub-{subj}"
+        if 2 in stages:
+            nodes.append(Node(
+                f"2:{subj}", ["1:fix_events"],
+                {f"2:{subj}": lambda subj=subj, timing=timing: (
+                    files(args.fixed_dir / f"sub-{subj}" / "func", "*_events.tsv")
+                    + [SCRIPT_DIR / "2_generate_timing.py"],
+                    files(timing))},
+                lambda stale, subj=subj: (
+                    [sys.executable, str(SCRIPT_DIR / "2_generate_timing.py"), "--subjects", subj,
+                     "--bids-dir", str(args.fixed_dir), "--timing-root", str(args.timing_root),
+                     "--jobs", "1"], {})))
+        if 3 in stages:
+            stats = args.results_dir / subj / f"{subj}.results.{GLM}"
+            nodes.append(Node(
+                f"3:{subj}", [f"2:{subj}"],
+                {f"3:{subj}": lambda subj=subj, timing=timing, stats=stats: (
+                    files(timing, "*.1D")
+                    + files(args.raw_bids / f"sub-{subj}" / "func", "*_bold.nii.gz")
+                    + files(args.anat_dir / f"sub-{subj}")
+                    + [SCRIPT_DIR / name for name in
+                       ("3_run_glm.sh", "3a_afni_proc_template.sh", "3b_fallback_patch.py",
+                        "3c_glm_scheduler.py")],
+                    files(stats, f"stats.{subj}+tlrc.*"))},
+                lambda stale, subj=subj: (
+                    ["bash", str(SCRIPT_DIR / "3_run_glm.sh")],
+                    {"SUBJECTS_OVERRIDE": subj,
+                     "TIMING_ROOT_OVERRIDE": str(args.timing_root),
+                     "BIDS_DIR_OVERRIDE": str(args.raw_bids)})))
+
+    if 4 in stages:
+        nodes.append(Node(
+            "4:rois", [f"3:{subj}" for subj in subjects],
+            {f"4:{name}": roi_entry(args, name, filename)
+             for name, filename in roi_files() if mask_exists(args.masks_dir, filename)},
+            lambda stale: (
+                [sys.executable, str(SCRIPT_DIR / "4_extract_rois.py"),
+                 "--results-dir", str(args.results_dir), "--masks-dir", str(args.masks_dir),
+                 "--out-dir", str(args.roi_dir), "--log-dir", str(args.log_dir),
+                 "--rois", *[key[2:] for key in stale]], {})))
+    return nodes
+
+
+def roi_files():
+    """ROI table of the stage 4 extractor (its name is not importable)."""
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("extract_rois", SCRIPT_DIR / "4_extract_rois.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.ROI_FILES
+
+
+def roi_entry(args, name, filename):
+    def paths():
+        if filename.endswith("+tlrc"):
+            masks = files(args.masks_dir, filename + ".*")
+        else:
+            masks = [args.masks_dir / filename]
+        stats = files(args.results_dir, f"*/*.results.{GLM}/stats.*+tlrc.*")
+        return stats + masks + [SCRIPT_DIR / "4_extract_rois.py"], [args.roi_dir / f"{name}_betas.csv"]
+    return paths
+
+
+def mask_exists(masks_dir: Path, filename: str) -> bool:
+    if filename.endswith("+tlrc"):
+        return (masks_dir / (filename + ".HEAD")).is_file()
+    return (masks_dir / filename).is_file()
+
+
+def run_node(node, manifest, args):
+    """Runs a node if any of its entries is stale, returns True on success."""
+    states = {}
+    for key, paths in node.entries.items():
+        inputs, outputs = paths()
+        states[key] = {"inputs": manifest.digest(inputs), "outputs": manifest.digest(outputs)}
+    stale = [key for key, state in states.items()
+             if args.force or manifest.nodes.get(key) != state]
+    if not stale:
+        log(f"SKIP {node.name} (up to date)")
+        return True
+    if args.dry_run:
+        log(f"WOULD RUN {node.name}" + (f" ({' '.join(stale)})" if len(stale) > 1 else ""))
+        return True
+
+    argv, env = node.command(stale)
+    log_file = args.log_dir / f"{node.name.replace(':', '_')}.log"
+    log(f"RUN  {node.name} -> {log_file}")
+    start = time.time()
+    with log_file.open("w") as f:
+        rc = subprocess.run(argv, stdout=f, stderr=subprocess.STDOUT,
+                            env={**os.environ, **env}).returncode
+    if rc != 0:
+        log(f"FAIL {node.name} (exit {rc}, see {log_file})")
+        return False
+    for key in stale:
+        inputs, outputs = node.entries[key]()
+        manifest.record(key, {"inputs": manifest.digest(inputs), "outputs": manifest.digest(outputs)})
+    log(f"DONE {node.name} ({time.time() - start:.1f} s)")
+    return True
+
+
+def run_graph(nodes, manifest, args):
+    """Starts every node as soon as all of its dependencies succeeded."""
+    names = {node.name for node in nodes}
+    pending = {node.name: node for node in nodes}
+    done, failed = set(), set()
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        running = {}
+        while pending or running:
+            for name, node in list(pending.items()):
+                deps = [d for d in node.deps if d in names]
+                if any(d in failed for d in deps):
+                    log(f"BLOCKED {name} (dependency failed)")
+                    failed.add(name)
+                    del pending[name]
+                elif all(d in done for d in deps):
+                    running[pool.submit(run_node, node, manifest, args)] = name
+                    del pending[name]
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                (done if future.result() else failed).add(name)
+    return done, failed
+
+
+def main():
+    topdir = Path(os.environ.get("TOPDIR", "/data/projects/STUDIES/LEARN/fMRI"))
+    rsa_dir = topdir / "RSA-learn"
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--stages", nargs="+", type=int, choices=[1, 2, 3, 4], default=[1, 2, 3, 4])
+    ap.add_argument("--subjects", nargs="+", help="Restrict stages 2-4 to these subject IDs")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                    help="Nodes running at the same time")
+    ap.add_argument("--dry-run", action="store_true", help="Only report which nodes would run")
+    ap.add_argument("--force", action="store_true", help="Run all selected nodes")
+    ap.add_argument("--raw-bids", type=Path, default=topdir / "bids")
+    ap.add_argument("--fixed-dir", type=Path, default=rsa_dir / "bids_fixed")
+    ap.add_argument("--report", type=Path, default=rsa_dir / "reports/nopred_fdbk_fix_template.tsv")
+    ap.add_argument("--timing-root", type=Path, default=rsa_dir / "TimingFiles/Fixed2")
+    ap.add_argument("--anat-dir", type=Path, default=topdir / "derivatives/afni/ssw")
+    ap.add_argument("--results-dir", type=Path, default=rsa_dir / "derivatives/afni/IndvlLvlAnalyses")
+    ap.add_argument("--masks-dir", type=Path, default=topdir / "Masks")
+    ap.add_argument("--roi-dir", type=Path, default=rsa_dir / "derivatives/afni/ROI_extractions")
+    ap.add_argument("--manifest", type=Path, default=rsa_dir / "derivatives/pipeline_manifest.json")
+    ap.add_argument("--log-dir", type=Path, default=rsa_dir / "logs/pipeline")
+    args = ap.parse_args()
+
+    args.log_dir.mkdir(parents=True, exist_ok=True)
+    args.manifest.parent.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(args.manifest)
+    nodes = build_graph(args)
+    log(f"Pipeline: {len(nodes)} nodes, stages {' '.join(map(str, sorted(set(args.stages))))}, "
+        f"{args.jobs} parallel")
+    start = time.time()
+    done, failed = run_graph(nodes, manifest, args)
+    manifest.save()
+    log(f"Finished in {time.time() - start:.1f} s: {len(done)} ok, {len(failed)} failed")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
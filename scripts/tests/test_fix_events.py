@@ -0,0 +1,46 @@
+"""Tests for 1_fix_events.py."""
+
+import csv
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parents[1] / "1_fix_events.py"
+spec = importlib.util.spec_from_file_location("fix_events", SCRIPT)
+fix_events = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(fix_events)
+
+ROWS = [
+    ["onset", "duration", "trial", "event"],
+    ["10.0", "2.0", "1", "Mean80_fdkm"],
+    ["20.0", "2.0", "2", "Nice_60_fdkn"],
+]
+
+
+@pytest.fixture(params=["\n", "\r\n"], ids=["lf", "crlf"])
+def bids_dir(tmp_path, request):
+    """Two subjects of one run, the second with a nopred_fdbk trial."""
+    for subj, rows in (("001", ROWS), ("002", ROWS[:2] + [["20.0", "2.0", "2", "nopred_fdbk"]])):
+        func = tmp_path / "bids" / f"sub-{subj}" / "func"
+        func.mkdir(parents=True)
+        text = "".join("\t".join(row) + request.param for row in rows)
+        (func / f"sub-{subj}_task-learn_run-1_events.tsv").write_bytes(text.encode())
+    return tmp_path / "bids"
+
+
+def test_read_events_strips_newlines(bids_dir):
+    tables = [fix_events.read_events(p, bids_dir) for p in fix_events.find_events(bids_dir)]
+    assert tables[0]["header"] == ROWS[0]
+    assert tables[0]["rows"] == ROWS[1:]
+
+
+def test_fix_table_relabels(bids_dir, tmp_path):
+    tables = [fix_events.read_events(p, bids_dir) for p in fix_events.find_events(bids_dir)]
+    template = fix_events.build_template_from_subject(tables, "001")
+    out_dir = tmp_path / "out"
+    report, _, written = fix_events.fix_table(tables[1], None, template, "", out_dir, False)
+    assert written
+    assert report == [["002", 1, "2", "nopred_fdbk", "Nice_60_fdkn", "fixed"]]
+    with (out_dir / tables[1]["rel"]).open(newline="") as f:
+        assert list(csv.reader(f, delimiter="\t")) == ROWS